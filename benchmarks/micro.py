@@ -0,0 +1,242 @@
+"""
+Microbenchmarks for the daemon's hot functions.
+
+Each benchmark times one function in isolation (timeit, best of several
+repeats) and reports microseconds per call. Per-frame benchmarks also report
+their share of the 32 ms frame budget. Results are appended per commit to a
+history file and compared with the previous run.
+
+    python -m benchmarks.micro [-k energy] [--repeat 7] [--json]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import tempfile
+import timeit
+import numpy as np
+from benchmarks.replay import _git_commit, load_history, append_history, _burst, SAMPLE_RATE, FRAME_LENGTH
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+HISTORY_FILE = os.path.join(REPO_DIR, ".benchmarks", "micro_history.jsonl")
+FRAME_BUDGET_US = FRAME_LENGTH / SAMPLE_RATE * 1e6
+TOLERANCE = 0.20
+MIN_CHANGE_US = 0.5
+
+BENCHMARKS = {}
+
+
+def benchmark(name, per_frame=False):
+    """Register `setup(ctx) -> callable`; the callable is what gets timed."""
+    def register(setup):
+        BENCHMARKS[name] = (setup, per_frame)
+        return setup
+    return register
+
+
+# --- BENCHMARKS ---
+@benchmark("frame_energy", per_frame=True)
+def bench_frame_energy(ctx):
+    from dex_daemon import frame_energy
+    pcm = ctx.frame
+    return lambda: frame_energy(pcm)
+
+
+@benchmark("process_frame_wake", per_frame=True)
+def bench_process_frame_wake(ctx):
+    daemon_, pcm = ctx.daemon, ctx.frame
+    def run():
+        daemon_.mode = "WAKE"
+        daemon_.pp.pending = []  # never fires
+        daemon_.process_frame(pcm, 0.0)
+    return run
+
+
+@benchmark("process_frame_listening", per_frame=True)
+def bench_process_frame_listening(ctx):
+    daemon_, pcm = ctx.daemon, ctx.frame
+    def run():
+        daemon_.mode = "LISTENING"
+        daemon_.rec_buffer.clear()
+        daemon_.process_frame(pcm, 0.0)
+    return run
+
+
+@benchmark("compile_key_events")
+def bench_compile_key_events(ctx):
+    from evdev import ecodes
+    from daemon.backends import build_char_map, compile_key_events
+    char_map = build_char_map(ecodes)
+    text = "The quick brown fox jumps over the lazy dog, again and again! "
+    return lambda: compile_key_events(text, char_map, ecodes)
+
+
+@benchmark("match_macro")
+def bench_match_macro(ctx):
+    from dex_daemon import match_macro
+    macros = {f"macro number {i}": "true" for i in range(200)}
+    return lambda: match_macro("Please schedule the review for Thursday.", macros)
+
+
+@benchmark("ipc_status_json")
+def bench_ipc_status_json(ctx):
+    daemon_ = ctx.daemon
+    daemon_.last_text = "the quick brown fox jumps over the lazy dog"
+    return lambda: json.loads(daemon_.status_message().decode())
+
+
+@benchmark("ipc_round_trip")
+def bench_ipc_round_trip(ctx):
+    import dex_daemon
+    request = json.dumps({"cmd": "GET_STATUS"}).encode()
+    def run():
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(dex_daemon.SOCK_FILE)
+            client.sendall(request)
+            json.loads(client.recv(1024).decode())
+    return run
+
+
+@benchmark("pcm_to_float")
+def bench_pcm_to_float(ctx):
+    from dex_daemon import pcm_to_float
+    # A 5 s utterance as the capture thread delivers it
+    frames = [ctx.frame.copy() for _ in range(int(5 * SAMPLE_RATE / FRAME_LENGTH))]
+    return lambda: pcm_to_float(frames)
+
+
+@benchmark("decode_options")
+def bench_decode_options(ctx):
+    # Profile lookup plus the vocabulary prompt (a stat() and a cache hit)
+    daemon_ = ctx.daemon
+    return lambda: daemon_.decode_options(3.0)
+
+
+@benchmark("correct_20k_terms")
+def bench_correct(ctx):
+    from daemon.correction import Corrector
+    rng = np.random.default_rng(0)
+    letters = np.array(list("bcdfghjklmnprstvwz"))
+    terms = ["".join(rng.choice(letters, 6)).capitalize() for _ in range(20000)] + ["Starsilk", "Hyperlane"]
+    corrector = Corrector(terms)
+    return lambda: corrector.correct("The star silk drifted past the hyper lane towards the outer rim.")
+
+
+@benchmark("trim_silence")
+def bench_trim_silence(ctx):
+    from daemon.trim import trim
+    # A 5 s utterance with a long pause and the endpoint silence still attached
+    rng = np.random.default_rng(0)
+    audio = np.concatenate([_burst(rng, 1.5), np.zeros(SAMPLE_RATE * 2, np.int16), _burst(rng, 1.5),
+                            np.zeros(SAMPLE_RATE * 3 // 2, np.int16)]).astype(np.float32) / 32768.0
+    return lambda: trim(audio)
+
+
+# --- HARNESS ---
+class Context:
+    """Shared fixtures: one voiced frame and a simulated daemon with its IPC socket up."""
+
+    def __init__(self):
+        import dex_daemon
+        from daemon.clock import SimClock
+        self.frame = _burst(np.random.default_rng(0), FRAME_LENGTH / SAMPLE_RATE).reshape(-1, 1)
+        self.daemon = dex_daemon.DexDaemon(simulate=True, clock=SimClock())
+        self.daemon.ready.wait(timeout=60)
+        for _ in range(200):
+            if os.path.exists(dex_daemon.SOCK_FILE): break
+            time.sleep(0.01)
+
+    def close(self):
+        self.daemon.cleanup()
+
+
+def time_call(fn, repeat=7):
+    """Best and median microseconds per call."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    runs = [t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    return round(min(runs), 3), round(float(np.median(runs)), 3)
+
+
+def run_benchmarks(names=None, repeat=7):
+    logging.getLogger("DexDaemon").setLevel(logging.WARNING)
+    results = []
+    import dex_daemon
+    with tempfile.TemporaryDirectory() as tmp, dex_daemon.runtime_paths(tmp):
+        ctx = Context()
+        try:
+            for name, (setup, per_frame) in BENCHMARKS.items():
+                if names and not any(n in name for n in names):
+                    continue
+                try:
+                    best, median = time_call(setup(ctx), repeat)
+                except Exception as ex:
+                    results.append({"name": name, "error": repr(ex)})
+                    continue
+                result = {"name": name, "best_us": best, "median_us": median}
+                if per_frame:
+                    result["frame_budget_pct"] = round(median / FRAME_BUDGET_US * 100, 3)
+                results.append(result)
+        finally:
+            ctx.close()
+    return results
+
+
+def compare(results, history, tolerance=TOLERANCE):
+    """Benchmarks whose best time grew by more than `tolerance` since the last run that had them."""
+    regressions = []
+    for result in results:
+        previous = next((r["results"][result["name"]] for r in reversed(history)
+                         if result["name"] in r.get("results", {})), None)
+        if not previous or "best_us" not in previous or "best_us" not in result:
+            continue
+        old, new = previous["best_us"], result["best_us"]
+        if new - old > max(MIN_CHANGE_US, old * tolerance):
+            regressions.append({"name": result["name"], "before": old, "after": new})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the daemon's hot functions.")
+    parser.add_argument("-k", action="append", dest="names", help="Only benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--no-history", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.names, args.repeat)
+    history = load_history(args.history)
+    regressions = compare(results, history, args.tolerance)
+    if not args.no_history:
+        append_history(args.history, {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "host": socket.gethostname(),
+            "results": {r["name"]: r for r in results},
+        })
+
+    if args.json:
+        print(json.dumps({"results": results, "regressions": regressions}, indent=2))
+    else:
+        print(f"{'benchmark':>26}  {'best µs':>10}  {'median µs':>10}  {'% of frame':>10}")
+        for r in results:
+            if "error" in r:
+                print(f"{r['name']:>26}  ERROR {r['error']}")
+            else:
+                print(f"{r['name']:>26}  {r['best_us']:>10}  {r['median_us']:>10}  {str(r.get('frame_budget_pct', '-')):>10}")
+        for r in regressions:
+            print(f"REGRESSION {r['name']}: {r['before']} -> {r['after']} µs")
+
+    failed = any("error" in r for r in results) or (args.fail_on_regression and regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, REPO_DIR)
+    sys.exit(main())
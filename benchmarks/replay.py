@@ -0,0 +1,296 @@
+"""
+Deterministic replay benchmark for the daemon's whole pipeline.
+
+Feeds WAV files (or built-in synthetic scenarios) frame by frame through
+DexDaemon.process_frame on the sim capture/injector/sound backends and a clock
+that skips over silence. Porcupine and Whisper are simulated unless
+--real-porcupine / --real-whisper is given. Each scenario runs in its own process so CPU time and
+peak RSS are per scenario. Results are appended to a history file and compared
+with the previous run to catch regressions between commits.
+
+    python -m benchmarks.replay [corpus_dir] [--real-whisper] [--json]
+
+A corpus is a directory of 16 kHz mono int16 WAVs. An optional sidecar
+<name>.json may hold {"wake_at": [seconds, ...], "transcripts": [...]};
+without "wake_at" the fake wake word fires whenever the daemon is in WAKE.
+"""
+import os
+import sys
+import json
+import time
+import wave
+import socket
+import logging
+import argparse
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+import numpy as np
+from daemon.clock import AcceleratedClock
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+HISTORY_FILE = os.path.join(REPO_DIR, ".benchmarks", "replay_history.jsonl")
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 512
+TOLERANCE = 0.15
+
+# Metrics compared against the previous run, with the smallest change worth reporting
+WATCHED = {
+    "e2e_p50_ms": 5.0,
+    "post_endpoint_p50_ms": 5.0,
+    "post_endpoint_p90_ms": 10.0,
+    "decode_rtf_mean": 0.01,
+    "cpu_seconds": 0.05,
+    "peak_rss_mb": 2.0,
+}
+
+
+class Scenario:
+    def __init__(self, name, pcm, wake_at=None, transcripts=None):
+        self.name = name
+        self.pcm = pcm
+        self.wake_at = wake_at
+        self.transcripts = transcripts or []
+
+    @property
+    def duration(self):
+        return len(self.pcm) / SAMPLE_RATE
+
+
+# --- SCENARIOS ---
+def load_wav(path):
+    with wave.open(path, 'rb') as wav_file:
+        if wav_file.getframerate() != SAMPLE_RATE or wav_file.getnchannels() != 1 or wav_file.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16 kHz mono int16")
+        return np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+
+
+def load_corpus(corpus_dir):
+    scenarios = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if not name.endswith(".wav"):
+            continue
+        path = os.path.join(corpus_dir, name)
+        meta = {}
+        sidecar = path[:-4] + ".json"
+        if os.path.exists(sidecar):
+            with open(sidecar) as f:
+                meta = json.load(f)
+        scenarios.append(Scenario(name[:-4], load_wav(path), meta.get("wake_at"), meta.get("transcripts")))
+    return scenarios
+
+
+def _burst(rng, seconds, amplitude=0.2):
+    """Noise with a syllable-rate envelope: loud enough for the energy VAD, nothing more."""
+    n = int(seconds * SAMPLE_RATE)
+    envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 4 * np.arange(n) / SAMPLE_RATE)
+    return (rng.standard_normal(n) * envelope * amplitude * 32767).clip(-32768, 32767).astype(np.int16)
+
+
+def _silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.int16)
+
+
+def synthetic_scenarios():
+    rng = np.random.default_rng(1234)
+    commands = [_silence(0.5)]
+    for _ in range(5):
+        commands += [_burst(rng, 0.8), _silence(2.5)]
+    dictation = [_silence(0.5)]
+    for _ in range(3):
+        for _ in range(4):
+            dictation += [_burst(rng, 2.4), _silence(0.5)]
+        dictation.append(_silence(2.5))
+    return [
+        Scenario("synthetic-commands", np.concatenate(commands),
+                 transcripts=["open terminal", "next tab", "save file", "undo that", "new line"]),
+        Scenario("synthetic-dictation", np.concatenate(dictation)),
+    ]
+
+
+# --- REPLAY ---
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 1) if values else None
+
+
+def summarize(scenario, traces, cpu_seconds, wall_seconds):
+    e2e, post_endpoint, rtf = [], [], []
+    for trace in traces:
+        stages = trace["stages"]
+        total = trace["durations"].get("total")
+        if total is not None:
+            e2e.append(total)
+        if "endpoint" in stages and "injection_end" in stages:
+            post_endpoint.append(stages["injection_end"] - stages["endpoint"])
+        decode = trace["durations"].get("decode")
+        if decode is not None and trace.get("audio_seconds"):
+            rtf.append(decode / 1000.0 / trace["audio_seconds"])
+    return {
+        "scenario": scenario.name,
+        "audio_seconds": round(scenario.duration, 2),
+        "utterances": len(traces),
+        "e2e_p50_ms": _percentile(e2e, 50),
+        "e2e_p90_ms": _percentile(e2e, 90),
+        "e2e_p99_ms": _percentile(e2e, 99),
+        "post_endpoint_p50_ms": _percentile(post_endpoint, 50),
+        "post_endpoint_p90_ms": _percentile(post_endpoint, 90),
+        "decode_rtf_mean": round(float(np.mean(rtf)), 4) if rtf else None,
+        "cpu_seconds": round(cpu_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "speedup": round(scenario.duration / wall_seconds, 1) if wall_seconds else None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run_scenario(scenario, real_porcupine=False, real_whisper=False, stub_rtf=0.05, verbose=False):
+    """Replay one scenario in this process. Prefer run_isolated() for clean CPU and RSS numbers."""
+    logging.getLogger("DexDaemon").setLevel(logging.INFO if verbose else logging.WARNING)
+    import dex_daemon
+
+    clock = AcceleratedClock()
+    overrides = {}
+    if real_porcupine: overrides["wakeword"] = "porcupine"
+    if real_whisper: overrides["asr"] = "whisper"
+    sim_options = {"wake_at": scenario.wake_at, "transcripts": scenario.transcripts, "rtf": stub_rtf}
+
+    with tempfile.TemporaryDirectory() as tmp, dex_daemon.runtime_paths(tmp):
+        daemon_ = dex_daemon.DexDaemon(simulate=True, backends_override=overrides, clock=clock, sim_options=sim_options)
+        if not daemon_.ready.wait(timeout=120):
+            raise RuntimeError("models did not load")
+        # Trailing silence so the last utterance reaches its endpoint
+        pcm = np.concatenate([scenario.pcm, _silence(dex_daemon.SILENCE_LIMIT + 0.5)])
+        frames = len(pcm) // FRAME_LENGTH
+
+        cpu_start, wall_start = time.process_time(), time.monotonic()
+        for k in range(frames):
+            captured = k * FRAME_LENGTH / SAMPLE_RATE
+            clock.advance_to(captured + FRAME_LENGTH / SAMPLE_RATE)
+            daemon_.process_frame(pcm[k * FRAME_LENGTH:(k + 1) * FRAME_LENGTH].reshape(-1, 1), captured)
+        cpu_seconds = time.process_time() - cpu_start
+        wall_seconds = time.monotonic() - wall_start
+
+        traces = daemon_.traces.recent()
+        daemon_.cleanup()
+    return summarize(scenario, traces, cpu_seconds, wall_seconds)
+
+
+def _child(scenario, options, results):
+    try:
+        results.put(run_scenario(scenario, **options))
+    except Exception as ex:
+        results.put({"scenario": scenario.name, "error": repr(ex)})
+
+
+def run_isolated(scenario, **options):
+    """Replay one scenario in a fresh process so CPU time and RSS don't leak between runs."""
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(scenario, options, results))
+    proc.start()
+    result = results.get()
+    proc.join()
+    return result
+
+
+# --- HISTORY ---
+def _git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except Exception:
+        return "unknown"
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(path, record):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def compare(results, history, tolerance=TOLERANCE):
+    """Regressions against the most recent run of each scenario."""
+    regressions = []
+    for result in results:
+        previous = next((r["results"][result["scenario"]] for r in reversed(history)
+                         if result["scenario"] in r.get("results", {})), None)
+        if not previous:
+            continue
+        for key, floor in WATCHED.items():
+            old, new = previous.get(key), result.get(key)
+            if old is None or new is None:
+                continue
+            if new - old > max(floor, abs(old) * tolerance):
+                regressions.append({"scenario": result["scenario"], "metric": key, "before": old, "after": new})
+    return regressions
+
+
+def record_for(results, options):
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "host": socket.gethostname(),
+        "options": options,
+        "results": {r["scenario"]: r for r in results},
+    }
+
+
+def print_table(results):
+    columns = ["scenario", "utterances", "e2e_p50_ms", "e2e_p90_ms", "post_endpoint_p50_ms",
+               "decode_rtf_mean", "cpu_seconds", "peak_rss_mb", "speedup"]
+    print("  ".join(f"{c:>20}" for c in columns))
+    for result in results:
+        print("  ".join(f"{str(result.get(c, '-')):>20}" for c in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay WAV scenarios through the daemon state machine.")
+    parser.add_argument("corpus", nargs="?", help="Directory of WAV files (default: synthetic scenarios)")
+    parser.add_argument("--real-porcupine", action="store_true")
+    parser.add_argument("--real-whisper", action="store_true")
+    parser.add_argument("--stub-rtf", type=float, default=0.05, help="Simulated decode cost of the stub Whisper")
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--no-history", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    scenarios = load_corpus(args.corpus) if args.corpus else synthetic_scenarios()
+    options = {"real_porcupine": args.real_porcupine, "real_whisper": args.real_whisper,
+               "stub_rtf": args.stub_rtf, "verbose": args.verbose}
+    results = [run_isolated(s, **options) for s in scenarios]
+
+    history = load_history(args.history)
+    regressions = compare([r for r in results if "error" not in r], history, args.tolerance)
+    if not args.no_history:
+        append_history(args.history, record_for(results, options))
+
+    if args.json:
+        print(json.dumps({"results": results, "regressions": regressions}, indent=2))
+    else:
+        print_table(results)
+        for r in results:
+            if "error" in r:
+                print(f"ERROR {r['scenario']}: {r['error']}")
+        for r in regressions:
+            print(f"REGRESSION {r['scenario']} {r['metric']}: {r['before']} -> {r['after']}")
+
+    failed = any("error" in r for r in results) or (args.fail_on_regression and regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, REPO_DIR)
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Soak test: hours of mixed speech and silence through the running daemon.
+
+Streams a generated recording through the sim capture backend on an accelerated
+clock, with the real process_audio thread, scheduler and macro launching. Every
+N utterances it samples RSS, live threads, open fds, zombie children, the audio
+queue and post-endpoint latency (less the simulated decode time, so what is
+left is the daemon's own overhead). After a warm-up, a least-squares trend is
+fitted to each series; the run fails if any of them grows by more than its
+tolerance over the soak.
+
+    python -m benchmarks.soak [--hours 2] [--every 25] [--error-rate 0.02] [--json]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import numpy as np
+from daemon.clock import AcceleratedClock
+from benchmarks.replay import _burst, _silence, SAMPLE_RATE
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+WARMUP = 0.2
+TRANSCRIPTS = ["open terminal", "the quick brown fox jumps over the lazy dog", "new line",
+               "please schedule the review for thursday afternoon", "save file"]
+MACROS = {"open terminal": "true", "save file": "true"}
+
+# Largest growth over the soak that still passes: max(relative * baseline, absolute)
+TOLERANCES = {
+    "rss_mb": (0.10, 8.0),
+    "threads": (0.0, 1.0),
+    "fds": (0.0, 2.0),
+    "zombies": (0.0, 2.0),
+    "queue_depth": (0.0, 16.0),
+    "overhead_ms": (0.5, 5.0),
+}
+
+
+# --- AUDIO ---
+def mixed_stream(hours, seed=7):
+    """Yield int16 chunks, one utterance plus the gap after it, until `hours` of audio."""
+    rng = np.random.default_rng(seed)
+    remaining = int(hours * 3600 * SAMPLE_RATE)
+    yield _silence(0.5)
+    while remaining > 0:
+        parts = []
+        for k in range(rng.integers(1, 4)):
+            if k: parts.append(_silence(rng.uniform(0.2, 0.8)))
+            parts.append(_burst(rng, rng.uniform(0.4, 2.5), amplitude=rng.uniform(0.1, 0.3)))
+        parts.append(_silence(rng.uniform(2.0, 5.0)))
+        chunk = np.concatenate(parts)[:remaining]
+        remaining -= len(chunk)
+        yield chunk
+
+
+# --- SAMPLING ---
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+
+def zombie_children():
+    me, count = os.getpid(), 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # "pid (comm) state ppid ..."; comm may contain spaces
+                state, ppid = f.read().rsplit(")", 1)[1].split()[:2]
+        except OSError:
+            continue
+        if state == "Z" and int(ppid) == me:
+            count += 1
+    return count
+
+
+def sample(daemon_, traces, utterances):
+    latencies, overheads = [], []
+    for t in traces:
+        if "endpoint" in t["stages"] and "injection_end" in t["stages"]:
+            latencies.append(t["stages"]["injection_end"] - t["stages"]["endpoint"])
+            overheads.append(latencies[-1] - (t["durations"]["decode"] or 0.0))
+    return {
+        "utterances": utterances,
+        "audio_seconds": round(daemon_.clock.monotonic(), 1),
+        "rss_mb": round(rss_mb(), 2),
+        "threads": threading.active_count(),
+        "fds": open_fds(),
+        "zombies": zombie_children(),
+        "queue_depth": daemon_.audio_q.qsize(),
+        "latency_ms": round(float(np.median(latencies)), 2) if latencies else None,
+        "overhead_ms": round(float(np.median(overheads)), 2) if overheads else None,
+    }
+
+
+# --- TRENDS ---
+def trend(samples, key, warmup=WARMUP):
+    """Least-squares growth of `key` across the post-warm-up samples, in the metric's own units."""
+    points = [(s["utterances"], s[key]) for s in samples[int(len(samples) * warmup):] if s.get(key) is not None]
+    if len(points) < 3:
+        return None
+    x, y = np.array(points, dtype=float).T
+    if np.ptp(x) == 0:
+        return None
+    slope = np.polyfit(x, y, 1)[0]
+    return {"baseline": round(float(np.median(y[:max(1, len(y) // 4)])), 2),
+            "last": round(float(y[-1]), 2),
+            "growth": round(float(slope * np.ptp(x)), 2)}
+
+
+def check(samples, tolerances=TOLERANCES, warmup=WARMUP):
+    """Per-metric trend and verdict. A metric fails if its fitted growth exceeds its tolerance."""
+    verdicts = {}
+    for key, (relative, absolute) in tolerances.items():
+        result = trend(samples, key, warmup)
+        if result is None:
+            continue
+        result["limit"] = round(max(relative * abs(result["baseline"]), absolute), 2)
+        result["ok"] = result["growth"] <= result["limit"]
+        verdicts[key] = result
+    return verdicts
+
+
+# --- RUN ---
+def run_soak(hours, every=25, stub_rtf=0.05, error_rate=0.02, verbose=False, progress=None):
+    """Soak the daemon in this process and return (samples, stats)."""
+    # Decode errors are injected on purpose and counted in the stats
+    logging.getLogger("DexDaemon").setLevel(logging.INFO if verbose else logging.CRITICAL)
+    import dex_daemon
+    from daemon import metrics
+
+    with tempfile.TemporaryDirectory() as tmp, dex_daemon.runtime_paths(tmp):
+        with open(dex_daemon.CONFIG_PATH, 'w') as f:
+            json.dump({"macros": MACROS}, f)
+
+        errors_before = metrics.TRANSCRIBE_ERRORS.get()
+        dropped_before = metrics.FRAMES_DROPPED.get()
+        sim_options = {"audio": mixed_stream(hours), "transcripts": TRANSCRIPTS, "repeat": True,
+                       "rtf": stub_rtf, "error_rate": error_rate}
+        daemon_ = dex_daemon.DexDaemon(simulate=True, clock=AcceleratedClock(), sim_options=sim_options)
+        daemon_.ready.wait(timeout=60)
+        worker = threading.Thread(target=daemon_.process_audio, daemon=True)
+        wall_start = time.monotonic()
+        worker.start()
+
+        samples, window, last_id, utterances = [], [], 0, 0
+        try:
+            while True:
+                finished = (daemon_.audio_thread.finished.is_set() and daemon_.audio_q.empty()
+                            and daemon_.mode != "PROCESSING")
+                fresh = [t for t in daemon_.traces.recent() if t["id"] > last_id]
+                if fresh:
+                    last_id = fresh[-1]["id"]
+                    window += fresh
+                    utterances += len(fresh)
+                if len(window) >= every or (finished and window):
+                    samples.append(sample(daemon_, window, utterances))
+                    window = []
+                    # The sim backends keep everything they were given; that's the harness, not a leak
+                    daemon_.injector.typed.clear()
+                    daemon_.sound.played.clear()
+                    if progress: progress(samples[-1])
+                if finished:
+                    break
+                time.sleep(0.01)
+        finally:
+            daemon_.cleanup()
+            worker.join(timeout=2)
+
+    stats = {
+        "audio_hours": round(daemon_.clock.monotonic() / 3600, 2),
+        "wall_seconds": round(time.monotonic() - wall_start, 1),
+        "utterances": utterances,
+        "transcribe_errors": metrics.TRANSCRIBE_ERRORS.get() - errors_before,
+        "frames_dropped": metrics.FRAMES_DROPPED.get() - dropped_before,
+        "final_mode": daemon_.mode,
+    }
+    return samples, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak the daemon with hours of simulated audio and check for resource growth.")
+    parser.add_argument("--hours", type=float, default=2.0, help="Hours of audio to stream")
+    parser.add_argument("--every", type=int, default=25, help="Sample every N utterances")
+    parser.add_argument("--stub-rtf", type=float, default=0.05, help="Simulated decode cost of the stub Whisper")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Fraction of decodes that raise")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    def progress(s):
+        if not args.json:
+            print(f"{s['utterances']:>6} utt  {s['audio_seconds'] / 3600:5.2f} h  rss {s['rss_mb']:7.1f} MB  "
+                  f"threads {s['threads']:>3}  fds {s['fds']:>3}  zombies {s['zombies']}  "
+                  f"queue {s['queue_depth']:>3}  latency {s['latency_ms']} ms  overhead {s['overhead_ms']} ms")
+
+    samples, stats = run_soak(args.hours, args.every, args.stub_rtf, args.error_rate, args.verbose, progress)
+    verdicts = check(samples)
+    # Errors are injected on purpose; a daemon that survives them must not be stuck in PROCESSING
+    failed = (not all(v["ok"] for v in verdicts.values())) or stats["final_mode"] == "PROCESSING"
+
+    if args.json:
+        print(json.dumps({"stats": stats, "trends": verdicts, "samples": samples}, indent=2))
+    else:
+        print(json.dumps(stats))
+        for key, v in verdicts.items():
+            print(f"{'ok  ' if v['ok'] else 'FAIL'} {key:>12}: {v['baseline']} -> {v['last']}  "
+                  f"growth {v['growth']} (limit {v['limit']})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, REPO_DIR)
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import logging
+from collections import deque
+from daemon import metrics
+from daemon.calibration import MODEL_SIZES
+from daemon.clock import SYSTEM_CLOCK
+from daemon.refine import cpu_busy
+
+logger = logging.getLogger("DexDaemon")
+
+# Keeps dictation responsive when something else is eating the CPU. Every
+# finished decode feeds a rolling real-time factor; over budget, decoding steps
+# down a level (greedy, then a smaller model) and steps back up once decodes
+# are comfortably fast again, or the machine has gone quiet.
+#
+# config.json:
+#   "admission": {
+#       "budget_rtf": 0.5,          # rolling RTF above which decoding steps down
+#       "fallback_model": "tiny.en",  # default: the next smaller calibration size
+#       "deadline": 2.0,            # wait at most deadline + deadline_rtf x audio seconds
+#       "deadline_rtf": 1.0
+#   }
+# or "admission": false to always decode as configured.
+
+BUDGET_RTF = 0.5
+RECOVER = 0.4         # step back up once the rolling RTF is under this fraction of the budget
+WINDOW = 8            # decodes in the rolling RTF
+MIN_SAMPLES = 2       # decodes at the current level before it is judged
+HOLD_SECONDS = 30.0   # time at a level before stepping back up
+DEADLINE = 2.0
+DEADLINE_RTF = 1.0
+# Least to most degraded; each level includes the ones before it
+LEVELS = ["normal", "greedy", "smaller"]
+GREEDY = {"beam_size": 1, "best_of": 1, "temperature": 0.0}
+
+
+def smaller_model(size, sizes=MODEL_SIZES):
+    """The next smaller model size, or None if `size` is the smallest (or unknown)."""
+    if size not in sizes or sizes.index(size) == 0:
+        return None
+    return sizes[sizes.index(size) - 1]
+
+
+class AdmissionController:
+    """
+    Rolling RTF of recent decodes and the level of degradation it calls for.
+    on_change(previous, level) is called on every switch; greedy decoding is
+    applied by options(), switching models is up to the caller.
+    """
+
+    def __init__(self, budget=BUDGET_RTF, recover=RECOVER, window=WINDOW, hold=HOLD_SECONDS,
+                 deadline=DEADLINE, deadline_rtf=DEADLINE_RTF, levels=LEVELS, on_change=None, clock=SYSTEM_CLOCK):
+        self.budget = budget
+        self.recover = recover
+        self.hold = hold
+        self.deadline_base = deadline
+        self.deadline_rtf = deadline_rtf
+        self.levels = list(levels)
+        self.on_change = on_change
+        self.clock = clock
+        self.level = 0
+        self.samples = deque(maxlen=window)  # (decode seconds, audio seconds) at the current level
+        self.changed = clock.monotonic()
+
+    @property
+    def name(self):
+        return self.levels[self.level]
+
+    def rtf(self):
+        """Decode seconds per audio second over the window, or None without samples."""
+        audio = sum(a for _, a in self.samples)
+        return sum(d for d, _ in self.samples) / audio if audio else None
+
+    def deadline(self, audio_seconds):
+        """How long to wait for the decode of `audio_seconds` of audio."""
+        return self.deadline_base + audio_seconds * self.deadline_rtf
+
+    def options(self, options):
+        """Decode options for the current level (in place)."""
+        if self.level >= self.levels.index("greedy"):
+            options.update(GREEDY)
+        return options
+
+    def observe(self, decode_seconds, audio_seconds):
+        if audio_seconds <= 0:
+            return
+        self.samples.append((decode_seconds, audio_seconds))
+        rtf = self.rtf()
+        if len(self.samples) >= MIN_SAMPLES and rtf > self.budget:
+            self._step(+1, f"RTF {rtf:.2f} over budget {self.budget}")
+        else:
+            self.check()
+
+    def missed(self, waited, audio_seconds):
+        """A decode blew its deadline: step down at once rather than waiting for the window."""
+        self._step(+1, f"missed the {waited:.1f}s deadline for {audio_seconds:.1f}s of audio")
+
+    def check(self):
+        """Step back up if decodes are fast again, or nothing was decoded and the CPU is idle."""
+        if self.level == 0 or self.clock.monotonic() - self.changed < self.hold:
+            return
+        rtf = self.rtf()
+        if len(self.samples) >= MIN_SAMPLES:
+            if rtf < self.budget * self.recover:
+                self._step(-1, f"RTF {rtf:.2f} under {self.budget * self.recover:.2f}")
+        elif not cpu_busy():
+            self._step(-1, "CPU load eased")
+
+    def _step(self, direction, reason):
+        level = self.level + direction
+        if not 0 <= level < len(self.levels):
+            return
+        previous, self.level = self.name, level
+        self.samples.clear()
+        self.changed = self.clock.monotonic()
+        metrics.ADMISSION_SWITCHES.inc(1, "down" if direction > 0 else "up")
+        log = logger.warning if direction > 0 else logger.info
+        log(f"Decoding {previous} -> {self.name}: {reason}")
+        if self.on_change:
+            self.on_change(previous, self.name)
+
+    def status(self):
+        rtf = self.rtf()
+        return {"admission": self.name, "rolling_rtf": None if rtf is None else round(rtf, 3)}
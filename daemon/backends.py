@@ -0,0 +1,465 @@
+import os
+import time
+import wave
+import logging
+import threading
+import subprocess
+import numpy as np
+from daemon import metrics
+from daemon.clock import SYSTEM_CLOCK
+from daemon import scheduling
+
+logger = logging.getLogger("DexDaemon")
+
+# Everything that touches hardware or a heavy model lives behind a named backend, and
+# the real ones import their libraries only when created. A CI box without
+# /dev/uinput, a sound card or a Picovoice key can run the daemon on the "sim" set.
+
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 512
+SOUNDS_DIR = "/home/andrew-dolby/DAO_Linux_Workspace/dex-dictate-v3-repo/assets/sounds"
+
+KINDS = ("capture", "wakeword", "asr", "injector", "sound")
+REGISTRY = {kind: {} for kind in KINDS}
+DEFAULTS = {"capture": "sounddevice", "wakeword": "porcupine", "asr": "whisper", "injector": "uinput", "sound": "paplay"}
+SIMULATED = {"capture": "sim", "wakeword": "sim", "asr": "sim", "injector": "memory", "sound": "null"}
+
+
+def backend(kind, name):
+    """Register a factory (class or function) as backend `name` of `kind`."""
+    def register(factory):
+        REGISTRY[kind][name] = factory
+        return factory
+    return register
+
+
+def create(kind, name, **kwargs):
+    if name not in REGISTRY.get(kind, {}):
+        raise ValueError(f"Unknown {kind} backend '{name}' (available: {', '.join(REGISTRY.get(kind, {}))})")
+    return REGISTRY[kind][name](**kwargs)
+
+
+def select(config, simulate=False, overrides=None):
+    """Backend names per kind: defaults (or the sim set), then config "backends", then overrides."""
+    chosen = dict(SIMULATED if simulate or config.get("simulate") else DEFAULTS)
+    chosen.update(config.get("backends", {}))
+    chosen.update(overrides or {})
+    return chosen
+
+
+def load_pcm(audio):
+    """int16 samples from an array or a 16 kHz mono WAV path. Iterables of chunks pass through."""
+    if audio is None or isinstance(audio, np.ndarray) or not isinstance(audio, str):
+        return audio
+    with wave.open(audio, 'rb') as wav_file:
+        return np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".ogg", ".opus", ".m4a", ".webm")
+
+
+def load_audio(path):
+    """int16 samples at 16 kHz mono from any audio file. 16 kHz mono WAVs are read directly, the rest through PyAV."""
+    if path.lower().endswith(".wav"):
+        with wave.open(path, 'rb') as wav_file:
+            if wav_file.getframerate() == SAMPLE_RATE and wav_file.getnchannels() == 1 and wav_file.getsampwidth() == 2:
+                return np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+    from faster_whisper.audio import decode_audio
+    return (decode_audio(path, sampling_rate=SAMPLE_RATE) * 32767).astype(np.int16)
+
+
+STREAM_SECONDS = 1.0
+
+
+def stream_audio(path, seconds=STREAM_SECONDS):
+    """
+    load_audio() a chunk at a time, so a long file can go into a Recording (and
+    spill) without ever being whole in memory. Chunks from PyAV are its frames.
+    """
+    if path.lower().endswith(".wav"):
+        with wave.open(path, 'rb') as wav_file:
+            if wav_file.getframerate() == SAMPLE_RATE and wav_file.getnchannels() == 1 and wav_file.getsampwidth() == 2:
+                while data := wav_file.readframes(int(seconds * SAMPLE_RATE)):
+                    yield np.frombuffer(data, dtype=np.int16)
+                return
+    import av
+    resampler = av.audio.resampler.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+    with av.open(path, mode="r", metadata_errors="ignore") as container:
+        frames = container.decode(audio=0)
+        while True:
+            try:
+                frame = next(frames)
+            except StopIteration:
+                break
+            except av.error.InvalidDataError:
+                continue  # skip a corrupt frame, as faster-whisper's decode_audio does
+            for resampled in resampler.resample(frame):
+                yield resampled.to_ndarray().reshape(-1)
+        for resampled in resampler.resample(None):
+            yield resampled.to_ndarray().reshape(-1)
+
+
+_children = []
+_children_lock = threading.Lock()
+
+
+def spawn(args, **kwargs):
+    """
+    Popen for fire-and-forget commands (sound cues, macros). Children that have
+    exited are reaped on the next call, so they don't pile up as zombies.
+    """
+    with _children_lock:
+        _children[:] = [p for p in _children if p.poll() is None]
+        proc = subprocess.Popen(args, **kwargs)
+        _children.append(proc)
+    # Don't leave a macro pinned to the audio core it was launched from
+    scheduling.release(proc.pid)
+    return proc
+
+
+def iter_frames(source, tail=0.0):
+    """Split an int16 array, or an iterable of int16 chunks, into FRAME_LENGTH frames."""
+    chunks = [source] if isinstance(source, np.ndarray) else source
+    pending = np.zeros(0, dtype=np.int16)
+    for chunk in chunks:
+        pending = np.concatenate([pending, chunk]) if len(pending) else chunk
+        usable = len(pending) - len(pending) % FRAME_LENGTH
+        for k in range(0, usable, FRAME_LENGTH):
+            yield pending[k:k + FRAME_LENGTH]
+        pending = pending[usable:]
+    for _ in range(int(tail * SAMPLE_RATE) // FRAME_LENGTH):
+        yield np.zeros(FRAME_LENGTH, dtype=np.int16)
+
+
+# --- CAPTURE ---
+@backend("capture", "sounddevice")
+class AudioThread(threading.Thread):
+    def __init__(self, callback, shutdown_event, clock=SYSTEM_CLOCK, thread_setup=None, **kwargs):
+        super().__init__()
+        self.callback = callback
+        self.shutdown_event = shutdown_event
+        self.clock = clock
+        # Runs once on PortAudio's callback thread (e.g. to pin it to the audio core)
+        self.thread_setup = thread_setup
+
+    def run(self):
+        import sounddevice as sd
+        while not self.shutdown_event.is_set():
+            try:
+                device_id = None
+                devices = sd.query_devices()
+                for name in ['pulse', 'pipewire', 'default']:
+                    for i, d in enumerate(devices):
+                        if name in d['name'].lower() and d['max_input_channels'] > 0:
+                            device_id = i
+                            logger.info(f"Selected Audio Device: {d['name']} (Index {i})")
+                            break
+                    if device_id is not None: break
+
+                if device_id is None:
+                    logger.error("No suitable audio device found!")
+                    time.sleep(2)
+                    continue
+
+                with sd.InputStream(samplerate=SAMPLE_RATE, device=device_id, channels=1, dtype='int16',
+                                  blocksize=FRAME_LENGTH, callback=self._audio_callback):
+                    logger.info("Audio Stream Started")
+                    while not self.shutdown_event.is_set():
+                        time.sleep(0.1)
+            except Exception as e:
+                logger.error(f"Audio Stream Error: {e}. Retrying in 2s...")
+                time.sleep(2)
+
+    def _audio_callback(self, indata, frames, time_info, status):
+        if self.thread_setup:
+            setup, self.thread_setup = self.thread_setup, None
+            setup()
+        if status:
+            if status.input_overflow: metrics.AUDIO_OVERFLOWS.inc()
+            logger.warning(f"Audio Status: {status}")
+        # PortAudio stamps the buffer on its own stream clock; shift it onto ours.
+        # Some host APIs leave the ADC time at 0, in which case "now" is the best we have.
+        captured = self.clock.monotonic()
+        if time_info.inputBufferAdcTime > 0:
+            captured -= max(0.0, time_info.currentTime - time_info.inputBufferAdcTime)
+        self.callback((indata.copy(), captured))
+
+    def stop(self):
+        self.running = False
+
+
+@backend("capture", "sim")
+class SimCapture(threading.Thread):
+    """
+    Plays `audio` (int16 array, WAV path, or an iterable of int16 chunks for long
+    streams) as if it came from the mic, followed by `tail` seconds of silence.
+    With `queue_depth` it stays in lockstep with the consumer instead of flooding
+    the queue, which is what lets a SimClock run the state machine faster than
+    real time.
+    """
+
+    def __init__(self, callback, shutdown_event, clock=SYSTEM_CLOCK, audio=None, queue_depth=None, tail=2.0,
+                 thread_setup=None, **kwargs):
+        super().__init__(daemon=True)
+        self.thread_setup = thread_setup
+        self.callback = callback
+        self.shutdown_event = shutdown_event
+        self.clock = clock
+        self.pcm = load_pcm(audio)
+        self.queue_depth = queue_depth
+        self.tail = tail
+        self.finished = threading.Event()
+
+    def run(self):
+        if self.thread_setup:
+            self.thread_setup()
+        if self.pcm is None:
+            self.finished.set()
+            return
+        start = self.clock.monotonic()
+        for k, frame in enumerate(iter_frames(self.pcm, self.tail)):
+            while self.queue_depth and self.queue_depth() > 0 and not self.shutdown_event.is_set():
+                time.sleep(0)
+            if self.shutdown_event.is_set():
+                break
+            captured = start + k * FRAME_LENGTH / SAMPLE_RATE
+            self.clock.sleep(max(0.0, captured + FRAME_LENGTH / SAMPLE_RATE - self.clock.monotonic()))
+            self.callback((frame.reshape(-1, 1), captured))
+        self.finished.set()
+
+
+# --- WAKE WORD ---
+@backend("wakeword", "porcupine")
+def porcupine_wakeword(access_key=None, keywords=('porcupine',), **kwargs):
+    import pvporcupine
+    return pvporcupine.create(access_key=access_key, keywords=list(keywords))
+
+
+@backend("wakeword", "sim")
+class SimWakeWord:
+    """
+    Fires at the scheduled clock times in `wake_at`. With no schedule it fires on
+    every frame, i.e. the daemon is re-armed as soon as it returns to WAKE.
+    """
+    sample_rate = SAMPLE_RATE
+    frame_length = FRAME_LENGTH
+
+    def __init__(self, clock=SYSTEM_CLOCK, wake_at=None, **kwargs):
+        self.clock = clock
+        self.pending = sorted(wake_at) if wake_at is not None else None
+
+    def process(self, pcm):
+        if self.pending is None:
+            return 0
+        if self.pending and self.clock.monotonic() >= self.pending[0]:
+            self.pending.pop(0)
+            return 0
+        return -1
+
+    def delete(self):
+        pass
+
+
+# --- ASR ---
+@backend("asr", "whisper")
+def whisper_asr(model_size="tiny.en", device="cpu", compute_type="int8", cpu_threads=4, **kwargs):
+    from faster_whisper import WhisperModel
+    from faster_whisper.utils import download_model
+    # Resolve the directory ourselves (same lookup WhisperModel does) so an idle
+    # reload can prefetch the files into the page cache
+    model_path = model_size if os.path.isdir(model_size) else download_model(model_size)
+    model = WhisperModel(model_path, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+    model.model_path = model_path
+    return model
+
+
+class SimSegment:
+    def __init__(self, text, start, end):
+        self.text = text
+        self.start = start
+        self.end = end
+        self.seek = 0
+
+
+@backend("asr", "sim")
+class SimWhisper:
+    """
+    Returns scripted `transcripts` in order after a simulated decode of `rtf` x audio
+    length, cycling through them if `repeat` is set. `error_rate` makes that fraction
+    of decodes raise, to exercise error paths.
+    """
+
+    def __init__(self, clock=SYSTEM_CLOCK, transcripts=None, rtf=0.0, repeat=False, error_rate=0.0, seed=0, **kwargs):
+        self.clock = clock
+        self.transcripts = list(transcripts or [])
+        self.repeat = repeat
+        self.rtf = rtf
+        self.error_rate = error_rate
+        self.rng = np.random.default_rng(seed)
+        self.calls = 0
+
+    def transcribe(self, audio, **options):
+        duration = len(audio) / SAMPLE_RATE
+        if self.rtf:
+            self.clock.sleep(duration * self.rtf)
+        if not np.any(audio):
+            return iter([]), None  # silence (e.g. a warm-up) decodes to nothing
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.calls += 1
+            raise RuntimeError("simulated decode failure")
+        if self.transcripts and (self.repeat or self.calls < len(self.transcripts)):
+            text = self.transcripts[self.calls % len(self.transcripts)]
+        else:
+            text = f"simulated utterance {self.calls + 1}"
+        self.calls += 1
+        return iter([SimSegment(text, 0.0, duration)]), None
+
+
+# --- INJECTION ---
+def build_char_map(e):
+    return {
+        'a': (e.KEY_A, 0), 'b': (e.KEY_B, 0), 'c': (e.KEY_C, 0), 'd': (e.KEY_D, 0), 'e': (e.KEY_E, 0),
+        'f': (e.KEY_F, 0), 'g': (e.KEY_G, 0), 'h': (e.KEY_H, 0), 'i': (e.KEY_I, 0), 'j': (e.KEY_J, 0),
+        'k': (e.KEY_K, 0), 'l': (e.KEY_L, 0), 'm': (e.KEY_M, 0), 'n': (e.KEY_N, 0), 'o': (e.KEY_O, 0),
+        'p': (e.KEY_P, 0), 'q': (e.KEY_Q, 0), 'r': (e.KEY_R, 0), 's': (e.KEY_S, 0), 't': (e.KEY_T, 0),
+        'u': (e.KEY_U, 0), 'v': (e.KEY_V, 0), 'w': (e.KEY_W, 0), 'x': (e.KEY_X, 0), 'y': (e.KEY_Y, 0),
+        'z': (e.KEY_Z, 0), ' ': (e.KEY_SPACE, 0), '.': (e.KEY_DOT, 0), ',': (e.KEY_COMMA, 0),
+        '?': (e.KEY_SLASH, 1), '!': (e.KEY_1, 1), '\n': (e.KEY_ENTER, 0)
+    }
+
+
+def compile_key_events(text, char_map, e):
+    """
+    (type, code, value) writes for each typable character of `text`, with None
+    standing for a SYN. Characters missing from `char_map` are skipped.
+    """
+    keystrokes = []
+    for char in text:
+        entry = char_map.get(char.lower())
+        if entry is None:
+            continue
+        k, s = entry
+        shift = char.isupper() or s
+        events = [(e.EV_KEY, e.KEY_LEFTSHIFT, 1)] if shift else []
+        events += [(e.EV_KEY, k, 1), None, (e.EV_KEY, k, 0)]
+        if shift: events.append((e.EV_KEY, e.KEY_LEFTSHIFT, 0))
+        events.append(None)
+        keystrokes.append(events)
+    return keystrokes
+
+
+@backend("injector", "uinput")
+class UInputInjector:
+    """Types through a virtual keyboard, falling back to wl-copy + Ctrl+V, then xdotool."""
+
+    def __init__(self, clock=SYSTEM_CLOCK, **kwargs):
+        self.clock = clock
+        self.ui = None
+        self.e = None
+        self.char_map = {}
+        try:
+            from evdev import UInput, ecodes
+            self.e = ecodes
+            self.char_map = build_char_map(ecodes)
+            self.ui = UInput()
+            logger.info("UInput initialized successfully.")
+        except Exception as ex:
+            logger.warning(f"UInput failed: {ex}. Will use fallback methods.")
+
+    def type_text(self, text):
+        """Type `text` and a space. Returns how many characters actually reached the window."""
+        logger.info(f"Typing: {text}")
+        ui, e = self.ui, self.e
+        if ui:
+            try:
+                # Characters the keymap can't type are skipped, so count what was sent
+                keystrokes = compile_key_events(text + " ", self.char_map, e)
+                for events in keystrokes:
+                    for event in events:
+                        if event is None: ui.syn()
+                        else: ui.write(*event)
+                    self.clock.sleep(0.002)
+                return len(keystrokes)
+            except: pass
+
+        try:
+            subprocess.run(['wl-copy', text + " "], check=True)
+            if ui:
+                ui.write(e.EV_KEY, e.KEY_LEFTCTRL, 1)
+                ui.write(e.EV_KEY, e.KEY_V, 1); ui.syn()
+                ui.write(e.EV_KEY, e.KEY_V, 0)
+                ui.write(e.EV_KEY, e.KEY_LEFTCTRL, 0); ui.syn()
+                return len(text) + 1
+        except: pass
+
+        try:
+            subprocess.run(['xdotool', 'type', text + " "], check=True)
+            return len(text) + 1
+        except: pass
+        return 0
+
+    def erase(self, count):
+        """Backspace over the last `count` typed characters."""
+        logger.info(f"Erasing {count} characters")
+        ui, e = self.ui, self.e
+        if ui:
+            try:
+                for _ in range(count):
+                    ui.write(e.EV_KEY, e.KEY_BACKSPACE, 1)
+                    ui.write(e.EV_KEY, e.KEY_BACKSPACE, 0); ui.syn()
+                    self.clock.sleep(0.002)
+                return
+            except: pass
+
+        try: subprocess.run(['xdotool', 'key', '--repeat', str(count), 'BackSpace'], check=True)
+        except: pass
+
+
+@backend("injector", "memory")
+class MemoryInjector:
+    """Collects typed text instead of sending keystrokes."""
+
+    def __init__(self, **kwargs):
+        self.typed = []
+        self.erased = []
+
+    def type_text(self, text):
+        logger.info(f"Typing (memory): {text}")
+        self.typed.append(text)
+        return len(text) + 1  # as if the trailing space were typed too
+
+    def erase(self, count):
+        self.erased.append(count)
+
+
+# --- SOUND CUES ---
+@backend("sound", "paplay")
+class PaplaySound:
+    # New Audio Protocol: High (Ready), Low (Done), Mid (Transcribed)
+    # Using generated simple sine waves for clarity
+    SOUNDS = {
+        "listening": "high_beep.wav", # High Beep (Ready)
+        "done": "low_beep.wav", # Low Beep (Done Listening)
+        "transcribed": "low_beep.wav", # Low Beep (Done/Transcribed) - Keep simple
+        "reset": "reset_beep.wav" # Reset/Sleep
+    }
+
+    def __init__(self, sounds_dir=SOUNDS_DIR, **kwargs):
+        self.sounds_dir = sounds_dir
+
+    def play(self, sound_type):
+        name = self.SOUNDS.get(sound_type)
+        path = os.path.join(self.sounds_dir, name) if name else None
+        if path and os.path.exists(path):
+            spawn(['paplay', path], stderr=subprocess.DEVNULL)
+
+
+@backend("sound", "null")
+class NullSound:
+    """Records which cues would have played."""
+
+    def __init__(self, **kwargs):
+        self.played = []
+
+    def play(self, sound_type):
+        self.played.append(sound_type)
@@ -0,0 +1,345 @@
+import json
+import time
+import logging
+import threading
+from dataclasses import replace
+from collections import OrderedDict, deque
+import numpy as np
+from daemon.metrics import DECODE_RTF
+from daemon.clock import SYSTEM_CLOCK
+
+logger = logging.getLogger("DexDaemon")
+
+# --- CONFIGURATION ---
+SAMPLE_RATE = 16000
+BATCH_WINDOW = 0.04      # How long to hold a job waiting for other sessions (seconds)
+MAX_BATCH_SIZE = 8
+MAX_CLIP_SECONDS = 30.0  # Whisper's window; longer utterances are decoded on their own
+MIN_CLIP_SAMPLES = SAMPLE_RATE // 10
+
+
+class DecodeJob:
+    """One utterance from one session, plus its decode timings (clock.monotonic() seconds)."""
+
+    def __init__(self, session, audio, options, clock=SYSTEM_CLOCK, decode=None):
+        self.clock = clock
+        self.session = session
+        self.audio = audio
+        self.options = options
+        self.decode = decode  # decode(model, job) instead of a plain transcribe; never batched
+        self.command = None  # set by the command fast path
+        self.key = json.dumps(options, sort_keys=True, default=str)
+        self.duration = len(audio) / SAMPLE_RATE
+        self.submitted = clock.monotonic()
+        self.started = None
+        self.first_segment = None
+        self.finished = None
+        self.batch_size = 0
+        self.segments = []
+        self.text = ""
+        self.error = None
+        self._done = threading.Event()
+
+    def add_segment(self, segment):
+        if self.first_segment is None:
+            self.first_segment = self.clock.monotonic()
+        self.segments.append(segment)
+
+    def finish(self, error=None):
+        self.error = error
+        self.text = " ".join([s.text for s in self.segments]).strip()
+        self.finished = self.clock.monotonic()
+        self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until decoded and return the text. Re-raises decode errors."""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Decode for session '{self.session}' timed out")
+        if self.error:
+            raise self.error
+        return self.text
+
+
+class BatchScheduler(threading.Thread):
+    """
+    Collects utterances from several sessions and decodes them together.
+
+    Each session has its own FIFO. When a job arrives and more than one session is
+    registered, the scheduler waits up to `window` seconds for the others, then
+    takes at most one job per session per round (round-robin, least recently
+    served first) so a chatty session can't starve a quiet one. Jobs only share a
+    batch when their decode options match. With a single session the window is
+    skipped, so the local mic pays no extra latency.
+
+    A session registered with a lower priority (background work) is only served
+    when no higher-priority session has anything queued.
+    """
+
+    def __init__(self, model_provider, window=BATCH_WINDOW, max_batch=MAX_BATCH_SIZE, clock=SYSTEM_CLOCK, thread_setup=None):
+        super().__init__(daemon=True)
+        self.model_provider = model_provider
+        self.thread_setup = thread_setup
+        self.clock = clock
+        self.window = window
+        self.max_batch = max_batch
+        self.sessions = OrderedDict()
+        self.priorities = {}
+        self.cond = threading.Condition()
+        self.running = True
+        self.busy = False  # a batch is being decoded
+        self.decoding = frozenset()  # sessions in that batch
+        self._pipelines = {}
+        self.stats_lock = threading.Lock()
+        self.totals = {"jobs": 0, "batches": 0, "batched_jobs": 0, "audio_seconds": 0.0, "busy_seconds": 0.0}
+
+    # --- Sessions ---
+    def register(self, session, priority=0):
+        with self.cond:
+            self.sessions.setdefault(session, deque())
+            self.priorities[session] = priority
+
+    def unregister(self, session):
+        """Drop a session. Jobs it still had queued fail instead of hanging."""
+        with self.cond:
+            pending = self.sessions.pop(session, deque())
+            self.priorities.pop(session, None)
+        for job in pending:
+            job.finish(RuntimeError(f"Session '{session}' closed"))
+
+    def submit(self, session, audio, decode=None, **options):
+        job = DecodeJob(session, audio, options, self.clock, decode)
+        with self.cond:
+            self.sessions.setdefault(session, deque()).append(job)
+            self.cond.notify()
+        return job
+
+    def submit_many(self, session, audios, **options):
+        """Queue several clips at once, so they can go out in the same batch."""
+        jobs = [DecodeJob(session, audio, options, self.clock) for audio in audios]
+        with self.cond:
+            self.sessions.setdefault(session, deque()).extend(jobs)
+            self.cond.notify()
+        return jobs
+
+    def pending(self):
+        with self.cond:
+            return sum(len(q) for q in self.sessions.values())
+
+    def active(self, session):
+        """True while `session` has jobs queued or in the batch being decoded."""
+        with self.cond:
+            return bool(self.sessions.get(session)) or session in self.decoding
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    # --- Scheduling ---
+    def run(self):
+        if self.thread_setup:
+            self.thread_setup()
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            try:
+                self._decode(batch)
+            except Exception as ex:
+                logger.error(f"Batch Decode Error: {ex}")
+                for job in batch:
+                    if not job.done():
+                        job.finish(ex)
+            finally:
+                with self.cond:
+                    self.busy, self.decoding = False, frozenset()
+
+    def _collect(self):
+        with self.cond:
+            while self.running and not any(self.sessions.values()):
+                self.cond.wait()
+            if not self.running:
+                return None
+
+            # Only sessions of the same priority wait for each other
+            top = max(self.priorities.get(s, 0) for s, q in self.sessions.items() if q)
+            peers = [q for s, q in self.sessions.items() if self.priorities.get(s, 0) == top]
+            if len(peers) > 1:
+                deadline = time.monotonic() + self.window
+                while self.running:
+                    waiting = sum(1 for q in peers if q)
+                    remaining = deadline - time.monotonic()
+                    if waiting >= min(len(peers), self.max_batch) or remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+
+            # The least recently served session with work, of the highest priority waiting,
+            # sets the options for this batch
+            top = max(self.priorities.get(s, 0) for s, q in self.sessions.items() if q)
+            queues = [q for s, q in self.sessions.items() if q and self.priorities.get(s, 0) == top]
+            head = queues[0][0]
+            if head.duration > MAX_CLIP_SECONDS or head.decode:
+                batch = [self.sessions[head.session].popleft()]
+            else:
+                batch = []
+                progress = True
+                while progress and len(batch) < self.max_batch:
+                    progress = False
+                    for queue_ in queues:
+                        if len(batch) >= self.max_batch:
+                            break
+                        if queue_ and queue_[0].key == head.key and queue_[0].duration <= MAX_CLIP_SECONDS:
+                            batch.append(queue_.popleft())
+                            progress = True
+
+            # Served sessions go to the back of the line
+            for job in batch:
+                if job.session in self.sessions:
+                    self.sessions.move_to_end(job.session)
+            # Set before the model is fetched, so an idle unload can't slip in between
+            self.busy = True
+            self.decoding = frozenset(job.session for job in batch)
+            return batch
+
+    # --- Decoding ---
+    def _decode(self, batch):
+        model = self.model_provider()
+        started = self.clock.monotonic()
+        for job in batch:
+            job.started = started
+            job.batch_size = len(batch)
+
+        if len(batch) == 1:
+            (batch[0].decode or decode_sequential)(model, batch[0])
+        elif not supports_batching(model):
+            for job in batch:
+                decode_sequential(model, job)
+        else:
+            decode_batched(self._pipeline(model), batch)
+
+        busy = self.clock.monotonic() - started
+        audio_seconds = sum(j.duration for j in batch)
+        if audio_seconds:
+            DECODE_RTF.observe(busy / audio_seconds)
+        with self.stats_lock:
+            self.totals["jobs"] += len(batch)
+            self.totals["batches"] += 1
+            if len(batch) > 1:
+                self.totals["batched_jobs"] += len(batch)
+            self.totals["audio_seconds"] += audio_seconds
+            self.totals["busy_seconds"] += busy
+
+    def _pipeline(self, model):
+        # One pipeline per loaded model; it only holds a reference to the model
+        key = id(model)
+        if key not in self._pipelines:
+            from faster_whisper import BatchedInferencePipeline
+            self._pipelines = {key: BatchedInferencePipeline(model=model)}
+        return self._pipelines[key]
+
+    def release_pipelines(self):
+        """Forget cached pipelines, e.g. after the model they wrap was swapped out."""
+        self._pipelines = {}
+
+    def stats(self):
+        with self.stats_lock:
+            totals = dict(self.totals)
+        totals["pending"] = self.pending()
+        totals["sessions"] = list(self.sessions.keys())
+        busy = totals["busy_seconds"]
+        totals["throughput"] = round(totals["audio_seconds"] / busy, 2) if busy else 0.0
+        return totals
+
+
+def supports_batching(model):
+    # Only a real faster-whisper model can go through BatchedInferencePipeline
+    return type(model).__module__.startswith("faster_whisper")
+
+
+def decode_sequential(model, job):
+    try:
+        segments, _ = model.transcribe(job.audio, **job.options)
+        for s in segments:
+            job.add_segment(s)
+        job.finish()
+    except Exception as ex:
+        job.finish(ex)
+
+
+def shift(segment, offset):
+    """A copy of a faster-whisper segment (and its words) with its times moved by `offset` seconds."""
+    words = segment.words and [replace(w, start=w.start + offset, end=w.end + offset) for w in segment.words]
+    return replace(segment, start=segment.start + offset, end=segment.end + offset, words=words)
+
+
+def decode_batched(pipeline, jobs):
+    """
+    Decode several utterances in one batched forward pass.
+
+    The utterances are laid end to end and handed to the pipeline as explicit
+    clips, so no VAD runs and each clip is one batch entry. Segments are mapped
+    back to their job through the clip's `seek`, computed the same way the
+    pipeline computes it, and their times moved from the concatenated audio
+    into the job's own.
+    """
+    fps = pipeline.model.frames_per_second
+    chunks, clips, by_seek = [], [], {}
+    offset = 0
+    for job in jobs:
+        audio = job.audio
+        if len(audio) < MIN_CLIP_SAMPLES:
+            audio = np.pad(audio, (0, MIN_CLIP_SAMPLES - len(audio)))
+        start, end = offset / SAMPLE_RATE, (offset + len(audio)) / SAMPLE_RATE
+        clips.append({"start": start, "end": end})
+        by_seek[int(int(start * SAMPLE_RATE) / SAMPLE_RATE * fps)] = (job, start)
+        chunks.append(audio)
+        offset += len(audio)
+
+    options = dict(jobs[0].options)
+    if options.get("initial_prompt") is not None and not isinstance(options["initial_prompt"], str):
+        # The batched pipeline only takes the prompt as text
+        options["initial_prompt"] = pipeline.model.hf_tokenizer.decode(options["initial_prompt"])
+    try:
+        segments, _ = pipeline.transcribe(np.concatenate(chunks), clip_timestamps=clips,
+                                          batch_size=len(jobs), **options)
+        for s in segments:
+            job, start = by_seek.get(s.seek, (None, 0.0))
+            if job is not None:
+                job.add_segment(shift(s, -start))
+    except Exception as ex:
+        for job in jobs:
+            job.finish(ex)
+        return
+    for job in jobs:
+        job.finish()
+
+
+def measure_throughput(model, clips, **options):
+    """
+    Decode `clips` (float32 arrays) sequentially and then as one batch.
+    Returns audio-seconds per wall-second for both, and the speedup.
+    """
+    from faster_whisper import BatchedInferencePipeline
+    audio_seconds = sum(len(c) for c in clips) / SAMPLE_RATE
+
+    t0 = time.monotonic()
+    for clip in clips:
+        decode_sequential(model, DecodeJob("sequential", clip, options))
+    sequential = time.monotonic() - t0
+
+    pipeline = BatchedInferencePipeline(model=model)
+    t0 = time.monotonic()
+    for i in range(0, len(clips), MAX_BATCH_SIZE):
+        decode_batched(pipeline, [DecodeJob(f"s{n}", c, options) for n, c in enumerate(clips[i:i + MAX_BATCH_SIZE])])
+    batched = time.monotonic() - t0
+
+    return {
+        "clips": len(clips),
+        "audio_seconds": round(audio_seconds, 2),
+        "sequential_throughput": round(audio_seconds / sequential, 2),
+        "batched_throughput": round(audio_seconds / batched, 2),
+        "speedup": round(sequential / batched, 2),
+    }
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import wave
+import logging
+import platform
+import numpy as np
+from daemon.scheduling import ALL_CORES
+
+logger = logging.getLogger("DexDaemon")
+
+# Picks the most accurate Whisper setup this CPU can run under a target
+# real-time factor, and remembers it per CPU model so it only runs once.
+
+SAMPLE_RATE = 16000
+CACHE_FILE = os.path.expanduser("~/.cache/dex-dictate/calibration.json")
+CLIP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "calibration.wav")
+TARGET_RTF = 0.3
+REPEATS = 2
+# Least to most accurate
+MODEL_SIZES = ["tiny.en", "base.en", "small.en"]
+# int8_float32 is left out: on CPU it runs the same kernels as int8
+COMPUTE_TYPES = ["int8", "float32"]
+
+
+def cpu_key():
+    """
+    Identifies the hardware a calibration is valid for: CPU model and usable cores.
+    The cores are the process's from before any thread was pinned, so a pinned
+    calibration thread and the main thread agree on the key.
+    """
+    name = platform.processor() or platform.machine()
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    name = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{name} x{len(ALL_CORES)}"
+
+
+def usable_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def downloaded_sizes(sizes=MODEL_SIZES):
+    """The model sizes already in the local cache, so calibrating them downloads nothing."""
+    from faster_whisper.utils import download_model
+    found = []
+    for size in sizes:
+        try:
+            download_model(size, local_files_only=True)
+            found.append(size)
+        except Exception:
+            pass
+    return found
+
+
+def thread_candidates(cores=None):
+    cores = cores or usable_cores()
+    counts = {c for c in (1, 2, 4, 8, 16) if c < cores}
+    counts.add(cores)
+    return sorted(counts)
+
+
+def load_clip(path=CLIP_PATH):
+    """The calibration clip as float32, or None if it isn't there."""
+    if not path or not os.path.exists(path):
+        return None
+    with wave.open(path, 'rb') as wav_file:
+        if wav_file.getframerate() != SAMPLE_RATE or wav_file.getnchannels() != 1 or wav_file.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16 kHz mono int16")
+        pcm = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+    return pcm.astype(np.float32) / 32768.0
+
+
+def synthetic_clip(seconds=8.0, seed=0):
+    """Speech-shaped noise. Good enough for timing when no real clip is installed."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    return (rng.standard_normal(len(t)) * envelope * 0.1).astype(np.float32)
+
+
+# --- MEASUREMENT ---
+def measure(factory, clip, model_size, compute_type, cpu_threads, repeats=REPEATS):
+    """Real-time factor (decode seconds per audio second, best of `repeats`) of one setup."""
+    from daemon.models import warm_up
+    start = time.monotonic()
+    model = factory(model_size=model_size, compute_type=compute_type, cpu_threads=cpu_threads)
+    load_seconds = time.monotonic() - start
+    warm_up(model)
+    best = None
+    for _ in range(repeats):
+        start = time.monotonic()
+        segments, _ = model.transcribe(clip, beam_size=5)
+        for _ in segments:
+            pass
+        elapsed = time.monotonic() - start
+        best = elapsed if best is None else min(best, elapsed)
+    del model
+    return {"model_size": model_size, "compute_type": compute_type, "cpu_threads": cpu_threads,
+            "rtf": round(best / (len(clip) / SAMPLE_RATE), 4), "load_seconds": round(load_seconds, 2)}
+
+
+def calibrate(factory, clip, target_rtf=TARGET_RTF, sizes=MODEL_SIZES, compute_types=COMPUTE_TYPES,
+              threads=None, progress=None):
+    """
+    Walk model sizes and compute types from cheapest to most accurate, timing each
+    at every thread count, and return the most accurate setup whose best RTF meets
+    `target_rtf`. A size whose cheapest compute type already misses the target ends
+    the search, since bigger models won't do better. If nothing meets it, the
+    fastest setup measured wins.
+    """
+    threads = threads or thread_candidates()
+    results, chosen = [], None
+    for size in sizes:
+        size_passed = False
+        for compute_type in compute_types:
+            try:
+                runs = [measure(factory, clip, size, compute_type, n) for n in threads]
+            except Exception as ex:
+                logger.warning(f"Calibration of {size}/{compute_type} failed: {ex}")
+                continue
+            best = min(runs, key=lambda r: r["rtf"])
+            results += runs
+            if progress: progress(best)
+            if best["rtf"] <= target_rtf:
+                chosen, size_passed = best, True
+            elif compute_type == compute_types[0]:
+                break
+        if not size_passed:
+            break
+    if chosen is None and results:
+        chosen = min(results, key=lambda r: r["rtf"])
+    return {"choice": chosen, "target_rtf": target_rtf, "results": results,
+            "measured_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+# --- CACHE ---
+def load_cache(path=CACHE_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def cached_choice(key=None, path=CACHE_FILE):
+    """The calibrated {model_size, compute_type, cpu_threads} for this CPU, or None."""
+    entry = load_cache(path).get(key or cpu_key())
+    return entry.get("choice") if entry else None
+
+
+def save(result, key=None, path=CACHE_FILE):
+    cache = load_cache(path)
+    cache[key or cpu_key()] = result
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(cache, f, indent=2)
@@ -0,0 +1,78 @@
+import time
+import threading
+
+
+class SystemClock:
+    """Wall and monotonic time as the daemon normally sees them."""
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class SimClock:
+    """
+    Virtual time for headless runs. Nothing moves until someone calls advance() or
+    sleep(), so a state-machine test can play an hour of audio in milliseconds.
+    """
+
+    EPOCH = 1_700_000_000.0
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self.lock = threading.Lock()
+
+    def time(self):
+        return self.EPOCH + self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        with self.lock:
+            self.now += max(0.0, seconds)
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+        time.sleep(0)  # still let other threads run
+
+
+class AcceleratedClock(SystemClock):
+    """
+    Real time plus every wait, skipped instead of slept.
+
+    Compute (decoding, state-machine work) still takes real time and shows up
+    in latencies, but pauses between frames cost nothing, so replays and soak
+    runs go as fast as the daemon can process audio.
+    """
+
+    EPOCH = 1_700_000_000.0
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.skipped = 0.0
+        self.lock = threading.Lock()
+
+    def monotonic(self):
+        return time.monotonic() - self.start + self.skipped
+
+    def time(self):
+        return self.EPOCH + self.monotonic()
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.skipped += max(0.0, seconds)
+
+    def advance_to(self, t):
+        with self.lock:
+            now = self.monotonic()
+            if t > now:
+                self.skipped += t - now
+
+
+SYSTEM_CLOCK = SystemClock()
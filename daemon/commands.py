@@ -0,0 +1,96 @@
+import logging
+import numpy as np
+from daemon import metrics
+from daemon.batching import decode_sequential
+from daemon.recording import Segment
+
+logger = logging.getLogger("DexDaemon")
+
+# Fast path for spoken commands. Instead of an open-vocabulary decode, a short
+# utterance is scored against the macro triggers alone: one encoder pass, then
+# every trigger is forced through the decoder (CTranslate2's align(), which
+# returns the probability of each given token) and the likeliest one wins if
+# it is both probable and clearly ahead of the rest. Anything else falls back
+# to the normal decode on the same model call.
+#
+# config.json: "commands": {"max_seconds": 2.0, "threshold": 0.5, "margin": 0.7}, or false.
+
+COMMAND_SECONDS = 2.0
+THRESHOLD = 0.5  # geometric mean probability of the trigger's tokens, end of text included
+MARGIN = 0.7     # lead in mean log-probability over the next-best trigger (about 2x)
+# Both are starting points: check them on real speech with tests/test_commands.py (DEX_WHISPER_MODEL)
+
+
+def variants(trigger):
+    """How Whisper would write a spoken trigger: capitalised, with and without a full stop."""
+    text = trigger.strip()
+    spoken = text[:1].upper() + text[1:]
+    return list(dict.fromkeys([f" {spoken}.", f" {spoken}", f" {text}"]))
+
+
+def supports_scoring(model):
+    # Only a real faster-whisper model exposes the encoder and CTranslate2's align()
+    return hasattr(getattr(model, "model", None), "align") and hasattr(model, "feature_extractor")
+
+
+class CommandSpotter:
+    """Scores short utterances against a closed set of triggers; decode() plugs into the scheduler."""
+
+    def __init__(self, triggers, threshold=THRESHOLD, margin=MARGIN):
+        self.triggers = [t for t in triggers if t.strip()]
+        self.threshold = threshold
+        self.margin = margin
+        self._cache = (None, None)  # (tokenizer, (start sequence, [(trigger, token ids)]))
+
+    def candidates(self, model):
+        """Start sequence and tokenized trigger variants, tokenized once per loaded model."""
+        tokenizer = model.hf_tokenizer
+        if self._cache[0] is not tokenizer:
+            from faster_whisper.tokenizer import Tokenizer
+            whisper = Tokenizer(tokenizer, model.model.is_multilingual, task="transcribe", language="en")
+            # align() adds <|notimestamps|> after the start sequence and the end of text after
+            # the tokens, and scores that end of text too: a trigger that only starts the sentence loses
+            sequences = [(trigger, whisper.encode(text)) for trigger in self.triggers for text in variants(trigger)]
+            self._cache = (tokenizer, (list(whisper.sot_sequence), sequences))
+        return self._cache[1]
+
+    def score(self, model, audio):
+        """[(trigger, mean token log-probability)] for each trigger, best first."""
+        from faster_whisper.audio import pad_or_trim
+        start, sequences = self.candidates(model)
+        features = model.feature_extractor(audio)
+        frames = features.shape[-1] - 1
+        encoder_output = model.encode(pad_or_trim(features[:, :frames]))
+        results = model.model.align(encoder_output, start, [ids for _, ids in sequences], frames)
+        best = {}
+        for (trigger, _), result in zip(sequences, results):
+            score = float(np.mean(np.log(np.maximum(result.text_token_probs, 1e-10))))
+            best[trigger] = max(score, best.get(trigger, -np.inf))
+        return sorted(best.items(), key=lambda item: item[1], reverse=True)
+
+    def spot(self, model, audio):
+        """(trigger, confidence) if the utterance is confidently one trigger, else (None, confidence)."""
+        scores = self.score(model, audio)
+        trigger, score = scores[0]
+        confidence = float(np.exp(score))
+        runner_up = scores[1][1] if len(scores) > 1 else -np.inf
+        if confidence >= self.threshold and score - runner_up >= self.margin:
+            return trigger, confidence
+        return None, confidence
+
+    def decode(self, model, job):
+        """Scheduler decode function: the trigger if spotted, else a full decode of the same job."""
+        if self.triggers and supports_scoring(model):
+            try:
+                trigger, confidence = self.spot(model, job.audio)
+            except Exception as ex:
+                logger.warning(f"Command scoring failed, decoding normally: {ex}")
+                trigger, confidence = None, None
+            job.command = {"trigger": trigger, "confidence": None if confidence is None else round(confidence, 3)}
+            if trigger is not None:
+                metrics.COMMANDS.inc(1, "spotted")
+                job.add_segment(Segment(trigger, 0.0, job.duration))
+                job.finish()
+                return
+            metrics.COMMANDS.inc(1, "fallback")
+        decode_sequential(model, job)
@@ -0,0 +1,100 @@
+import re
+import logging
+from functools import lru_cache
+from difflib import SequenceMatcher
+
+logger = logging.getLogger("DexDaemon")
+
+# Post-ASR correction: rewrites words that sound like a vocabulary term or a
+# macro trigger into that term ("star silk" -> "Starsilk"). Terms are indexed
+# by phonetic key, and a transcript is looked up one word n-gram at a time, so
+# the cost per word doesn't depend on how many terms there are. A spelling
+# similarity score then decides whether a phonetic match is close enough. A
+# match that differs only in case is left as written: macro triggers are
+# indexed too, and "Open terminal and..." must keep its capital.
+
+MAX_NGRAM = 3
+THRESHOLD = 0.82  # "Dextor" -> "Dexter" (0.83) passes, "nails" -> "Niles" (0.80) doesn't
+MIN_KEY = 2
+WORD = re.compile(r"[A-Za-z][A-Za-z']*")
+
+# (pattern, replacement), applied in order to the lowercased word
+_RULES = [(re.compile(p), r) for p, r in [
+    (r"^(kn|gn|pn|wr|ps)", lambda m: m.group(1)[1]),
+    (r"^x", "s"), (r"^wh", "w"), (r"mb$", "m"),
+    (r"'", ""), (r"ph", "f"), (r"ck", "k"), (r"sch", "sk"), (r"tch", "ch"),
+    (r"dg(?=[eiy])", "j"), (r"gh(?![aeiou])", ""), (r"g(?=[eiy])", "j"),
+    (r"c(?=[eiy])", "s"), (r"(sh|ch|ti(?=[ao]))", "x"), (r"th", "0"),
+    (r"c", "k"), (r"q", "k"), (r"x", "ks"), (r"v", "f"), (r"z", "s"),
+    (r"[wy](?![aeiou])", ""), (r"h(?![aeiou])", ""), (r"[aeiouy]", ""),
+    (r"(.)\1+", r"\1"),
+]]
+
+
+@lru_cache(maxsize=65536)
+def phonetic_key(word):
+    """Metaphone-style consonant skeleton of one word: "Starsilk" -> "strslk"."""
+    key = word.lower()
+    for pattern, replacement in _RULES:
+        key = pattern.sub(replacement, key)
+    return key
+
+
+def _letters(text):
+    return re.sub(r"[^a-z]", "", text.lower())
+
+
+class Corrector:
+    """
+    Phonetic index over `terms` (vocabulary terms and macro triggers). A term of
+    several words (or hyphenated parts) is keyed by its parts' keys joined, so
+    it is found whether Whisper writes it as one word or several.
+    """
+
+    def __init__(self, terms=(), threshold=THRESHOLD, max_ngram=MAX_NGRAM):
+        self.threshold = threshold
+        self.max_ngram = max_ngram
+        self.index = {}
+        for term in terms:
+            parts = WORD.findall(term)
+            key = "".join(phonetic_key(p) for p in parts)
+            if len(key) >= MIN_KEY:
+                self.index.setdefault(key, []).append((term, _letters(term)))
+
+    def __len__(self):
+        return sum(len(terms) for terms in self.index.values())
+
+    def correct(self, text):
+        """(corrected text, [{"from", "to", "score"}])."""
+        if not self.index:
+            return text, []
+        words = list(WORD.finditer(text))
+        keys = [phonetic_key(w.group()) for w in words]
+        out, corrections, pos, i = [], [], 0, 0
+        while i < len(words):
+            match = None
+            # Longest n-gram first; only words separated by spaces or hyphens can merge
+            for n in range(min(self.max_ngram, len(words) - i), 0, -1):
+                j = i + n - 1
+                if any(text[words[k].end():words[k + 1].start()].strip(" -") for k in range(i, j)):
+                    continue
+                candidates = self.index.get("".join(keys[i:j + 1]))
+                if not candidates:
+                    continue
+                surface = text[words[i].start():words[j].end()]
+                letters = _letters(surface)
+                score, term = max((SequenceMatcher(None, letters, t).ratio(), term) for term, t in candidates)
+                if score >= self.threshold and surface.lower() != term.lower():
+                    match = (j, surface, term, score)
+                    break
+            if match is None:
+                i += 1
+                continue
+            j, surface, term, score = match
+            out.append(text[pos:words[i].start()] + term)
+            pos = words[j].end()
+            corrections.append({"from": surface, "to": term, "score": round(score, 3)})
+            logger.info(f"Corrected {surface!r} -> {term!r} (score {score:.2f})")
+            i = j + 1
+        out.append(text[pos:])
+        return "".join(out), corrections
@@ -0,0 +1,57 @@
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger("DexDaemon")
+
+HISTORY_LIMIT = 500
+
+
+class History:
+    """
+    history.json as the GUI's history window reads it: a list of
+    {"timestamp", "text"} entries, newest first. Entries written by the daemon
+    also carry the utterance id so a later pass can correct them in place.
+    """
+
+    def __init__(self, path, limit=HISTORY_LIMIT):
+        self.path = path
+        self.limit = limit
+        self.lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save(self, entries):
+        tmp = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, 'w') as f:
+                json.dump(entries[:self.limit], f)
+            os.replace(tmp, self.path)
+        except OSError as ex:
+            logger.warning(f"History write failed ({self.path}): {ex}")
+
+    def add(self, text, **extra):
+        entry = {"timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "text": text, **extra}
+        with self.lock:
+            self._save([entry] + self._load())
+        return entry
+
+    def update(self, entry_id, text, **extra):
+        """Replace the text of entry `entry_id`, keeping the old one as "draft". False if it's gone."""
+        with self.lock:
+            entries = self._load()
+            for entry in entries:
+                if entry.get("id") == entry_id:
+                    entry.setdefault("draft", entry["text"])
+                    entry.update(text=text, **extra)
+                    self._save(entries)
+                    return True
+        return False
@@ -0,0 +1,174 @@
+import os
+import logging
+import threading
+import socketserver
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("DexDaemon")
+
+# Recording is lock-free on purpose. Metrics are written from several threads
+# (audio, scheduler, delivery, IPC), so two racing increments can lose one and a
+# scrape can be off by one; render() copies the values first (one C-level copy
+# under the GIL) so a label appearing mid-scrape cannot break the iteration.
+
+
+class Counter:
+    def __init__(self, name, help_text, label=None):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.values = {None: 0} if label is None else {}
+
+    def inc(self, amount=1, label_value=None):
+        self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def get(self, label_value=None):
+        return self.values.get(label_value, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_value, value in sorted(dict(self.values).items(), key=lambda kv: str(kv[0])):
+            escaped = str(label_value).replace("\\", "\\\\").replace('"', '\\"')
+            suffix = "" if label_value is None else f'{{{self.label}="{escaped}"}}'
+            lines.append(f"{self.name}{suffix} {value}")
+        return lines
+
+
+class Gauge:
+    """Reads its value from a callback at scrape time, so it costs nothing to keep current."""
+
+    def __init__(self, name, help_text, fn=None):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def render(self):
+        value = self.value
+        if self.fn:
+            try:
+                value = self.fn()
+            except Exception:
+                value = float("nan")
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Histogram:
+    """Fixed buckets; observe() is one bisect and two adds."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        counts = list(self.counts)
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {cumulative}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, label=None):
+        return self._add(Counter(name, help_text, label))
+
+    def gauge(self, name, help_text, fn=None):
+        return self._add(Gauge(name, help_text, fn))
+
+    def histogram(self, name, help_text, buckets):
+        return self._add(Histogram(name, help_text, buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def find(self, name):
+        return next((m for m in self.metrics if m.name == name), None)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# --- DAEMON METRICS ---
+REGISTRY = Registry()
+FRAMES_PROCESSED = REGISTRY.counter("dex_frames_processed_total", "Audio frames taken off the capture queue.")
+AUDIO_OVERFLOWS = REGISTRY.counter("dex_audio_overflows_total", "Capture callbacks that reported an input overflow (dropped frames).")
+FRAMES_DROPPED = REGISTRY.counter("dex_frames_dropped_total", "Captured frames dropped because the processing queue was full.")
+QUEUE_DEPTH = REGISTRY.gauge("dex_audio_queue_depth", "Frames waiting in the capture queue.")
+WAKE_DETECTIONS = REGISTRY.counter("dex_wake_detections_total", "Wake word detections.")
+UTTERANCES = REGISTRY.counter("dex_utterances_total", "Utterances sent for decoding.")
+TRANSCRIBE_ERRORS = REGISTRY.counter("dex_transcribe_errors_total", "Utterances whose decode or injection raised.")
+REFINEMENTS = REGISTRY.counter("dex_refinements_total", "Second-pass decodes by outcome.", label="outcome")
+DEADLINE_MISSES = REGISTRY.counter("dex_decode_deadline_misses_total", "Utterances whose decode outlasted its deadline.")
+ADMISSION_SWITCHES = REGISTRY.counter("dex_admission_switches_total", "Decode level changes under load.", label="direction")
+COMMANDS = REGISTRY.counter("dex_command_fast_path_total", "Short utterances scored against macro triggers, by outcome.", label="outcome")
+MACRO_EXECUTIONS = REGISTRY.counter("dex_macro_executions_total", "Macros launched from a transcript.")
+IPC_REQUESTS = REGISTRY.counter("dex_ipc_requests_total", "IPC requests by command.", label="cmd")
+DECODE_RTF = REGISTRY.histogram("dex_decode_rtf", "Decode wall time divided by audio duration, per batch.",
+                                [0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 4.0])
+INJECTION_CPS = REGISTRY.histogram("dex_injection_chars_per_second", "Typing speed of text injection.",
+                                   [25, 50, 100, 200, 400, 800, 1600])
+
+
+# --- EXPOSITION ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) pair
+        return str(self.client_address)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def start_metrics_server(port=None, sock_path=None):
+    """Serve REGISTRY as Prometheus text on 127.0.0.1:port or a Unix socket. Returns the server."""
+    if port:
+        server = ThreadingHTTPServer(("127.0.0.1", int(port)), _MetricsHandler)
+        where = f"127.0.0.1:{port}"
+    else:
+        if os.path.exists(sock_path): os.remove(sock_path)
+        server = _UnixHTTPServer(sock_path, _MetricsHandler)
+        where = sock_path
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Metrics on {where}")
+    return server
@@ -0,0 +1,189 @@
+import os
+import gc
+import time
+import logging
+import threading
+import numpy as np
+from daemon.clock import SYSTEM_CLOCK
+
+logger = logging.getLogger("DexDaemon")
+
+SAMPLE_RATE = 16000
+WARMUP_SECONDS = 1.0
+IDLE_MINUTES = 30
+
+
+def warm_up(model, seconds=WARMUP_SECONDS):
+    """
+    Decode a short silent buffer so the first real utterance doesn't pay for lazy
+    initialisation (weight paging, thread pools, the first encoder pass).
+    Returns the time it took.
+    """
+    start = time.monotonic()
+    segments, _ = model.transcribe(np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32), beam_size=1)
+    for _ in segments:
+        pass
+    return time.monotonic() - start
+
+
+def prefetch(model_dir):
+    """
+    Ask the kernel to pull the model files into the page cache. Page cache is
+    reclaimable, so this costs nothing while the machine has memory to spare and
+    turns a reload into a copy from RAM instead of a read from disk.
+    """
+    if not model_dir or not os.path.isdir(model_dir) or not hasattr(os, "posix_fadvise"):
+        return
+    for name in os.listdir(model_dir):
+        path = os.path.join(model_dir, name)
+        if not os.path.isfile(path):
+            continue
+        try:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+
+
+class ModelManager:
+    """
+    Owns the Whisper model. get() hands out the current one; swap() builds and
+    warms a replacement on the side and only then puts it in place, so a failed
+    load leaves the old model serving. A decode already running keeps its own
+    reference and finishes on the old model; the next one gets the new model.
+
+    After `idle_timeout` seconds without a decode, check_idle() releases the
+    weights and the state goes "cold". The next get() (or wake(), which starts
+    it early) loads them again.
+    """
+
+    def __init__(self, factory, size, clock=SYSTEM_CLOCK, idle_timeout=IDLE_MINUTES * 60, busy=None, thread_setup=None):
+        self.factory = factory  # size -> model
+        self.size = size
+        self.clock = clock
+        self.idle_timeout = idle_timeout
+        self.busy = busy or (lambda: False)  # True while a decode holds the model
+        self.thread_setup = thread_setup  # run first on the background reload thread
+        self.model = None
+        self.state = "loading"
+        self.pending = None
+        self.error = None
+        self.last_used = clock.monotonic()
+        self.lock = threading.Lock()
+        self.on_release = []  # called after a model is dropped, to clear caches that point at it
+
+    def get(self):
+        """The current model, reloaded first if it went cold."""
+        with self.lock:
+            self.last_used = self.clock.monotonic()
+            if self.state == "cold":
+                self._reload()
+            return self.model
+
+    def load(self):
+        """Initial load. Raises on failure; there is nothing to fall back to."""
+        try:
+            model = self.factory(self.size)
+            logger.info(f"Whisper {self.size} warm-up took {warm_up(model):.2f}s")
+        except Exception as ex:
+            self.state, self.error = "failed", f"{self.size}: {ex}"
+            raise
+        with self.lock:
+            self.model, self.state, self.error = model, "ready", None
+            self.last_used = self.clock.monotonic()
+
+    def reserve(self, size):
+        """Mark `size` as loading; False if another load already is. Lets a caller claim the swap before threading it."""
+        with self.lock:
+            if self.pending:
+                return False
+            self.pending = size
+            return True
+
+    def swap(self, size, reserved=False):
+        """Load `size`, warm it up and swap it in. Returns False (old model kept) if that fails."""
+        if not reserved and not self.reserve(size):
+            raise RuntimeError(f"Already loading {self.pending}")
+        start = time.monotonic()
+        try:
+            model = self.factory(size)
+            warm_up(model)
+        except Exception as ex:
+            logger.error(f"Loading Whisper {size} failed, keeping {self.size}: {ex}")
+            with self.lock:
+                self.pending, self.error = None, f"{size}: {ex}"
+            return False
+        with self.lock:
+            old, self.model = self.model, model
+            previous, self.size = self.size, size
+            self.pending, self.error, self.state = None, None, "ready"
+            self.last_used = self.clock.monotonic()
+        self._release(old)
+        logger.info(f"Swapped Whisper {previous} -> {size} in {time.monotonic() - start:.2f}s")
+        return True
+
+    # --- Idle unloading ---
+    def check_idle(self):
+        """Unload if idle for `idle_timeout`. Cheap enough to call on every frame."""
+        if not self.idle_timeout or self.state != "ready" or self.pending:
+            return False
+        if self.clock.monotonic() - self.last_used < self.idle_timeout:
+            return False
+        with self.lock:
+            # get() takes the same lock, so nothing can pick the model up while it goes
+            if self.state != "ready" or self.busy() or self.clock.monotonic() - self.last_used < self.idle_timeout:
+                return False
+            self._unload()
+        return True
+
+    def wake(self):
+        """Start reloading a cold model in the background, e.g. as soon as the wake word fires."""
+        if self.state == "cold":
+            threading.Thread(target=self._background_reload, daemon=True).start()
+
+    def _background_reload(self):
+        if self.thread_setup:
+            self.thread_setup()
+        self.get()
+
+    def _unload(self):
+        inner = getattr(self.model, "model", None)
+        if hasattr(inner, "unload_model"):
+            # CTranslate2 frees the weights but keeps the runtime context, and
+            # WhisperModel keeps its tokenizer and feature extractor
+            inner.unload_model()
+        else:
+            model, self.model = self.model, None
+            self._release(model)
+        self.state = "cold"
+        logger.info(f"Whisper {self.size} unloaded after {self.idle_timeout / 60:.0f} min idle")
+
+    def _reload(self):
+        start = time.monotonic()
+        self.state = "loading"
+        try:
+            prefetch(getattr(self.model, "model_path", None))
+            inner = getattr(self.model, "model", None)
+            if hasattr(inner, "load_model"):
+                inner.load_model()
+            else:
+                self.model = self.factory(self.size)
+        except Exception:
+            self.state = "cold"
+            raise
+        self.state = "ready"
+        logger.info(f"Whisper {self.size} reloaded in {time.monotonic() - start:.2f}s")
+
+    def _release(self, model):
+        for release in self.on_release:
+            release()
+        del model
+        gc.collect()
+
+    def status(self):
+        # No lock: a reload holds it, and the GUI must still get an answer
+        return {"model": self.size, "model_state": self.state,
+                "model_pending": self.pending, "model_error": self.error}
@@ -0,0 +1,37 @@
+# Named sets of decode options. "auto" isn't a profile of its own: it picks one
+# by utterance length, so a two-word command decodes greedily while long
+# dictation gets beam search and temperature fallback.
+
+PROFILES = {
+    "instant": {"beam_size": 1, "best_of": 1, "temperature": 0.0,
+                "without_timestamps": True, "condition_on_previous_text": False},
+    "balanced": {"beam_size": 3, "best_of": 3, "temperature": [0.0, 0.4, 0.8],
+                 "without_timestamps": True, "condition_on_previous_text": False},
+    "accurate": {"beam_size": 5, "best_of": 5, "temperature": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+                 "without_timestamps": False, "condition_on_previous_text": True},
+}
+AUTO = "auto"
+# (longest utterance in seconds, profile), checked in order
+AUTO_THRESHOLDS = [(2.0, "instant"), (8.0, "balanced"), (float("inf"), "accurate")]
+
+
+def available(custom=None):
+    """Built-in profiles with config.json "profiles" merged over them."""
+    profiles = {name: dict(options) for name, options in PROFILES.items()}
+    for name, options in (custom or {}).items():
+        profiles[name] = dict(profiles.get(name, {}), **options)
+    return profiles
+
+
+def by_length(duration, thresholds=AUTO_THRESHOLDS):
+    for limit, name in thresholds:
+        if duration <= limit:
+            return name
+    return thresholds[-1][1]
+
+
+def resolve(name, duration, profiles=PROFILES, thresholds=AUTO_THRESHOLDS):
+    """(profile name, decode options) for an utterance of `duration` seconds."""
+    if name == AUTO or name not in profiles:
+        name = by_length(duration, thresholds)
+    return name, dict(profiles[name])
@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+
+logger = logging.getLogger("DexDaemon")
+
+# Nothing in this module runs until a PROFILE_START / MEMTRACE_START arrives over IPC:
+# no sampler thread, no tracemalloc hooks. Leaving it in production costs nothing.
+
+DEFAULT_RATE = 100    # Stack samples per second
+MAX_DEPTH = 64
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class SamplingProfiler(threading.Thread):
+    """Samples every thread's Python stack at `rate` Hz and folds them into collapsed stacks."""
+
+    def __init__(self, rate=DEFAULT_RATE):
+        super().__init__(daemon=True, name="dex-profiler")
+        self.interval = 1.0 / max(1, min(int(rate), 1000))
+        self.stacks = Counter()
+        self.samples = 0
+        self.stop_event = threading.Event()
+        self.started_at = time.monotonic()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self, path):
+        """Stop sampling and write the collapsed stacks (flamegraph.pl / speedscope format)."""
+        self.stop_event.set()
+        self.join(timeout=2)
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return {"path": path, "samples": self.samples, "stacks": len(self.stacks),
+                "seconds": round(time.monotonic() - self.started_at, 2)}
+
+
+class MemoryTracer:
+    """tracemalloc between start() and stop(), reported as a snapshot diff."""
+
+    def __init__(self, frames=10):
+        self.frames = frames
+        self.baseline = None
+
+    def start(self):
+        tracemalloc.start(self.frames)
+        self.baseline = tracemalloc.take_snapshot()
+
+    def stop(self, path, top=50):
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = snapshot.compare_to(self.baseline, "lineno")
+        with open(path, 'w') as f:
+            f.write(f"Traced memory: current={current / 1024:.1f} KiB peak={peak / 1024:.1f} KiB\n")
+            f.write(f"Top {top} allocation changes since start:\n")
+            for stat in stats[:top]:
+                f.write(f"{stat}\n")
+        growth = sum(stat.size_diff for stat in stats)
+        return {"path": path, "size_diff": growth, "peak": peak}
+
+
+class Profilers:
+    """The daemon's handle on the on-demand profilers. At most one of each runs at a time."""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.lock = threading.Lock()
+        self.sampler = None
+        self.memory = None
+
+    def _path(self, kind, ext):
+        return os.path.join(self.out_dir, f"dex-{kind}-{time.strftime('%Y%m%d-%H%M%S')}.{ext}")
+
+    def start_sampling(self, rate=DEFAULT_RATE):
+        with self.lock:
+            if self.sampler:
+                return {"error": "sampling profiler already running"}
+            self.sampler = SamplingProfiler(rate)
+            self.sampler.start()
+        logger.info(f"Sampling profiler started ({rate} Hz)")
+        return {"status": "started", "rate": rate}
+
+    def stop_sampling(self):
+        with self.lock:
+            sampler, self.sampler = self.sampler, None
+        if not sampler:
+            return {"error": "sampling profiler not running"}
+        result = sampler.stop(self._path("profile", "folded"))
+        logger.info(f"Sampling profiler stopped: {result}")
+        return result
+
+    def start_memory(self, frames=10):
+        with self.lock:
+            if self.memory or tracemalloc.is_tracing():
+                return {"error": "tracemalloc already running"}
+            self.memory = MemoryTracer(frames)
+            self.memory.start()
+        logger.info("tracemalloc started")
+        return {"status": "started"}
+
+    def stop_memory(self):
+        with self.lock:
+            memory, self.memory = self.memory, None
+        if not memory:
+            return {"error": "tracemalloc not running"}
+        result = memory.stop(self._path("memory", "txt"))
+        logger.info(f"tracemalloc stopped: {result}")
+        return result
@@ -0,0 +1,206 @@
+import os
+import re
+import logging
+import time
+import tempfile
+from collections import deque
+import numpy as np
+
+logger = logging.getLogger("DexDaemon")
+
+# The utterance being recorded, with bounded memory. Up to `memory_seconds` of
+# int16 frames stay in RAM; past that the oldest half goes to an unlinked temp
+# file on tmpfs (XDG_RUNTIME_DIR or /dev/shm), read back through a memmap. Long
+# recordings are decoded a window at a time, so no float copy of the whole
+# thing is ever made.
+
+SAMPLE_RATE = 16000
+FRAME = 512
+MEMORY_SECONDS = 60.0
+WINDOW_SECONDS = 30.0   # Whisper's own window; longer recordings are decoded in pieces
+SPLIT_SEARCH = 5.0      # a window ends at the quietest frame in its last few seconds
+OVERLAP = 1.0           # when that frame is still speech, the next window starts this much earlier
+PAUSE_ENERGY = 0.005    # frame RMS below which a cut counts as falling in a pause
+PARALLEL = 8            # windows in flight at once; the scheduler batches them into one decode
+MAX_OVERLAP_WORDS = 8
+
+
+def spill_dir():
+    for path in (os.environ.get("XDG_RUNTIME_DIR"), f"/run/user/{os.getuid()}", "/dev/shm"):
+        if path and os.path.isdir(path) and os.access(path, os.W_OK):
+            return path
+    return None  # tempfile's default
+
+
+class Recording:
+    def __init__(self, memory_seconds=MEMORY_SECONDS, directory=None):
+        self.limit = int(memory_seconds * SAMPLE_RATE)
+        self.directory = directory
+        self.frames = []
+        self.in_memory = 0
+        self.spilled = 0
+        self.file = None
+
+    def __len__(self):
+        """Samples recorded."""
+        return self.spilled + self.in_memory
+
+    @property
+    def seconds(self):
+        return len(self) / SAMPLE_RATE
+
+    def append(self, pcm):
+        self.frames.append(pcm)
+        self.in_memory += len(pcm)
+        if self.in_memory > self.limit:
+            # At least one chunk, or a whole file appended at once would never spill
+            self._spill(max(1, len(self.frames) // 2))
+
+    def _spill(self, count):
+        if self.file is None:
+            self.file = tempfile.TemporaryFile(prefix="dex-recording-", dir=self.directory or spill_dir())
+            logger.info(f"Recording longer than {self.limit / SAMPLE_RATE:.0f}s; spilling to {self.file.name}")
+        old, self.frames = self.frames[:count], self.frames[count:]
+        data = np.concatenate(old).astype(np.int16, copy=False).reshape(-1)
+        self.file.write(data.tobytes())
+        self.spilled += len(data)
+        self.in_memory -= len(data)
+
+    def read(self, start, end):
+        """int16 samples [start, end), from the spill file and memory as needed."""
+        parts = []
+        if start < self.spilled:
+            self.file.flush()
+            spilled = np.memmap(self.file, dtype=np.int16, mode="r", shape=(self.spilled,))
+            parts.append(np.array(spilled[start:min(end, self.spilled)]))
+            del spilled
+        if end > self.spilled and self.frames:
+            memory = np.concatenate(self.frames).reshape(-1)
+            parts.append(memory[max(start - self.spilled, 0):end - self.spilled])
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int16)
+
+    def to_float(self):
+        return self.read(0, len(self)).astype(np.float32) / 32768.0
+
+    def windows(self, seconds=WINDOW_SECONDS, search=SPLIT_SEARCH, overlap=OVERLAP):
+        """
+        Yield (offset seconds, float32 window, overlap seconds). Each window ends at
+        the quietest frame near its end; if that is still speech, the next one
+        starts `overlap` seconds earlier and repeats it.
+        """
+        size, search = int(seconds * SAMPLE_RATE), int(search * SAMPLE_RATE)
+        start, repeated = 0, 0
+        while start < len(self):
+            end = min(start + size, len(self))
+            chunk = self.read(start, end)
+            step = len(chunk)
+            if end < len(self) and len(chunk) > search:
+                tail = chunk[-search:].astype(np.float32) / 32768.0
+                n = len(tail) // FRAME
+                energy = np.sqrt(np.mean(tail[:n * FRAME].reshape(n, FRAME) ** 2, axis=1))
+                quietest = int(np.argmin(energy))
+                cut = len(chunk) - search + quietest * FRAME + FRAME // 2
+                chunk, step = chunk[:cut], cut
+                if energy[quietest] >= PAUSE_ENERGY:
+                    step = max(cut - int(overlap * SAMPLE_RATE), 1)
+            yield start / SAMPLE_RATE, chunk.astype(np.float32) / 32768.0, repeated / SAMPLE_RATE
+            repeated = len(chunk) - step
+            start += step
+
+    def clear(self):
+        self.frames, self.in_memory, self.spilled = [], 0, 0
+        if self.file is not None:
+            self.file.close()  # unlinked already; closing frees it
+            self.file = None
+
+
+def _norm(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch(previous, text, max_words=MAX_OVERLAP_WORDS):
+    """The words of `text` minus any prefix that repeats the end of `previous` (a word list)."""
+    words = text.split()
+    for n in range(min(max_words, len(previous), len(words)), 0, -1):
+        if [_norm(w) for w in previous[-n:]] == [_norm(w) for w in words[:n]]:
+            return words[n:]
+    return words
+
+
+class WindowedJob:
+    """
+    Decodes a long Recording in windows. `submit(audios) -> [(job, time map)]`
+    queues up to `parallel` windows at a time, which the scheduler decodes as
+    one batch; results are waited on in order in the caller's thread and
+    stitched, dropping words repeated across an overlap. Looks like a finished
+    DecodeJob afterwards; segment times are in the recording's time.
+
+    A timed-out wait() keeps its progress and the recording; waiting again
+    picks up at the window it stopped on.
+    """
+
+    def __init__(self, recording, submit, clock, parallel=PARALLEL, window_seconds=WINDOW_SECONDS):
+        self.recording = recording
+        self.submit = submit
+        self.clock = clock
+        self.parallel = parallel
+        self.window_seconds = window_seconds
+        self.audio = None
+        self.duration = recording.seconds
+        self.submitted = clock.monotonic()
+        self.started = self.first_segment = self.finished = None
+        self.batch_size = 1
+        self.segments = []
+        self.text = ""
+        self.words = []
+        self.windows = None
+        self.pending = deque()  # (offset, overlap, job, time map) submitted but not yet stitched
+
+    def wait(self, timeout=None):
+        """The stitched text. `timeout` covers every window still to come, not each one."""
+        if self.finished is not None:
+            return self.text
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self.windows is None:
+            self.windows = self.recording.windows(self.window_seconds)
+        try:
+            while True:
+                if not self.pending:
+                    # Only `parallel` windows exist as float32 at a time
+                    group = [w for _, w in zip(range(self.parallel), self.windows)]
+                    if not group:
+                        break
+                    submitted = self.submit([audio for _, audio, _ in group])
+                    self.pending.extend((offset, overlap, job, time_map)
+                                        for (offset, _, overlap), (job, time_map) in zip(group, submitted))
+                while self.pending:
+                    offset, overlap, job, time_map = self.pending[0]
+                    text = job.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+                    self.pending.popleft()
+                    if self.started is None:
+                        self.started, self.first_segment = job.started, job.first_segment
+                    for s in job.segments:
+                        start, end = time_map.to_original(s.start), time_map.to_original(s.end)
+                        if end > overlap:  # segments inside the overlap were kept from the last window
+                            self.segments.append(Segment(s.text, offset + start, offset + end))
+                    if text:
+                        self.words += stitch(self.words, text) if overlap else text.split()
+        except TimeoutError:
+            raise  # still decoding; wait() again to resume
+        except Exception:
+            self._close()
+            raise
+        self._close()
+        self.text = " ".join(self.words)
+        return self.text
+
+    def _close(self):
+        self.recording.clear()
+        self.finished = self.clock.monotonic()
+
+
+class Segment:
+    def __init__(self, text, start, end):
+        self.text = text
+        self.start = start
+        self.end = end
@@ -0,0 +1,115 @@
+import os
+import logging
+import threading
+from collections import deque
+from daemon import metrics
+from daemon.batching import DecodeJob, decode_sequential
+from daemon.clock import SYSTEM_CLOCK
+from daemon.scheduling import ALL_CORES
+
+logger = logging.getLogger("DexDaemon")
+
+# Second pass: the first model types immediately, then the same audio is decoded
+# again by a larger one when the CPU has cycles to spare.
+
+QUEUE_LIMIT = 4          # beyond this the oldest waiting utterance is dropped
+MAX_SECONDS = 15.0       # longer utterances already got the accurate profile
+BUSY_LOAD = 0.75         # 1-minute load average per core above which refinement is skipped
+IDLE_POLL = 5.0
+
+
+def cpu_busy(threshold=BUSY_LOAD):
+    # Per core of the machine, not of the calling thread: the audio thread is pinned to one
+    try:
+        return os.getloadavg()[0] / len(ALL_CORES) > threshold
+    except OSError:
+        return False
+
+
+class Refiner(threading.Thread):
+    """
+    Re-decodes submitted utterances with the model in `models` (a ModelManager,
+    loaded on first use) and calls `on_refined(item, text)` when the result
+    differs from the draft. Runs at the lowest priority and gives up on an
+    utterance whenever `busy()` says the first pass or the machine needs the CPU.
+    `options` is a dict of decode options, or options(model) -> dict.
+    """
+
+    def __init__(self, models, on_refined, busy=None, options=None, max_seconds=MAX_SECONDS,
+                 busy_load=BUSY_LOAD, thread_setup=None, clock=SYSTEM_CLOCK):
+        super().__init__(daemon=True)
+        self.models = models
+        self.on_refined = on_refined
+        self.busy = busy or (lambda: False)
+        self.options = options or {"beam_size": 5}
+        self.max_seconds = max_seconds
+        self.busy_load = busy_load
+        self.thread_setup = thread_setup
+        self.clock = clock
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.running = True
+
+    def should_skip(self):
+        return self.busy() or cpu_busy(self.busy_load)
+
+    def submit(self, item):
+        """Queue {"id", "audio", "draft", ...} for refinement. False if it was skipped outright."""
+        if len(item["audio"]) / 16000 > self.max_seconds:
+            metrics.REFINEMENTS.inc(1, "skipped_long")
+            return False
+        with self.cond:
+            if len(self.queue) >= QUEUE_LIMIT:
+                self.queue.popleft()
+                metrics.REFINEMENTS.inc(1, "dropped")
+            self.queue.append(item)
+            self.cond.notify()
+        return True
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    def run(self):
+        if self.thread_setup:
+            self.thread_setup()
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (OSError, AttributeError):
+            pass
+        while True:
+            with self.cond:
+                if self.running and not self.queue:
+                    self.cond.wait(IDLE_POLL)
+                if not self.running:
+                    return
+                item = self.queue.popleft() if self.queue else None
+            if item is None:
+                if self.models.model is not None:
+                    self.models.check_idle()
+                continue
+            self.refine(item)
+
+    def refine(self, item):
+        if self.should_skip():
+            metrics.REFINEMENTS.inc(1, "skipped_busy")
+            return
+        try:
+            if self.models.model is None and self.models.state == "loading":
+                self.models.load()
+            model = self.models.get()
+            options = self.options(model) if callable(self.options) else self.options
+            job = DecodeJob("refine", item["audio"], options, self.clock)
+            decode_sequential(model, job)
+            text = job.wait()
+        except Exception as ex:
+            logger.warning(f"Refinement failed: {ex}")
+            metrics.REFINEMENTS.inc(1, "error")
+            return
+        if not text or text.strip() == item["draft"].strip():
+            metrics.REFINEMENTS.inc(1, "unchanged")
+            return
+        metrics.REFINEMENTS.inc(1, "refined")
+        logger.info(f"Refined: {item['draft']!r} -> {text!r}")
+        self.on_refined(item, text)
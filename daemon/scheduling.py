@@ -0,0 +1,102 @@
+import os
+import logging
+import threading
+
+logger = logging.getLogger("DexDaemon")
+
+# Keeps audio capture and wake-word work off the cores Whisper is decoding on.
+# Every call affects only the calling thread: on Linux sched_setaffinity,
+# sched_setscheduler and setpriority all take a thread id. Threads started
+# afterwards (CTranslate2's workers) inherit the setting of the thread that
+# creates them, which is why models are loaded from a "decode" thread.
+# Anything started from an audio thread that isn't audio work (sound cues,
+# macros, a model reload) has to be moved off again; see release().
+#
+# config.json:
+#   "cpu_scheduling": {
+#       "audio_cores": [3],          # default: the last usable core
+#       "decode_cores": [0, 1, 2],   # default: every other core
+#       "audio_policy": "rr",        # "rr" (SCHED_RR, needs rtprio) or "nice"
+#       "audio_nice": -10,           # used for "nice" and as the SCHED_RR fallback
+#       "decode_nice": 5
+#   }
+
+RR_PRIORITY = 10
+
+
+def usable_cores():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+# Before any thread was pinned
+ALL_CORES = usable_cores()
+
+
+def release(pid=0):
+    """Let a child process (or the calling thread, pid 0) run on every core again."""
+    try:
+        os.sched_setaffinity(pid, ALL_CORES)
+    except (OSError, AttributeError):
+        pass
+
+
+class CpuPlan:
+    """Per-role core sets and priorities; apply(role) moves the calling thread onto them."""
+
+    def __init__(self, config=None, cores=None):
+        self.enabled = config is not None
+        config = config or {}
+        cores = cores or usable_cores()
+        self.roles = {}
+        if len(cores) > 1:
+            audio = [c for c in config.get("audio_cores", cores[-1:]) if c in cores] or cores[-1:]
+            decode = [c for c in config.get("decode_cores", [c for c in cores if c not in audio]) if c in cores] or cores
+        else:
+            audio = decode = cores
+        self.roles["audio"] = {"cores": audio, "policy": config.get("audio_policy", "rr"), "nice": config.get("audio_nice", -10)}
+        self.roles["decode"] = {"cores": decode, "policy": "nice", "nice": config.get("decode_nice", 5)}
+        self.applied = {}
+        self.lock = threading.Lock()
+
+    def apply(self, role):
+        """Pin and prioritise the calling thread for `role`. Never raises; what happened is in status()."""
+        if not self.enabled or role not in self.roles:
+            return None
+        plan = self.roles[role]
+        tid = threading.get_native_id()
+        result = {"thread": threading.current_thread().name, "cores": None, "policy": None, "nice": None}
+        try:
+            os.sched_setaffinity(0, plan["cores"])
+            result["cores"] = plan["cores"]
+        except (OSError, AttributeError) as ex:
+            result["error"] = f"affinity: {ex}"
+        if plan["policy"] == "rr":
+            try:
+                # RESET_ON_FORK: threads and processes started from here go back to normal scheduling
+                os.sched_setscheduler(0, os.SCHED_RR | os.SCHED_RESET_ON_FORK, os.sched_param(RR_PRIORITY))
+                result["policy"] = "SCHED_RR"
+            except (OSError, AttributeError):
+                pass  # no rtprio allowance; fall back to nice
+        if result["policy"] is None:
+            try:
+                os.setpriority(os.PRIO_PROCESS, tid, plan["nice"])
+                result["policy"], result["nice"] = "nice", plan["nice"]
+            except (OSError, AttributeError) as ex:
+                # Raising priority needs CAP_SYS_NICE or an RLIMIT_NICE allowance
+                result["policy"], result["nice"] = "default", os.getpriority(os.PRIO_PROCESS, tid)
+                result.setdefault("error", f"priority: {ex}")
+        with self.lock:
+            first = role not in self.applied
+            self.applied.setdefault(role, {})[tid] = result
+        if first:
+            logger.info(f"CPU plan {role}: cores {result['cores']}, {result['policy']}"
+                        + (f" (nice {result['nice']})" if result["nice"] is not None else ""))
+        return result
+
+    def status(self):
+        with self.lock:
+            applied = {role: list(threads.values()) for role, threads in self.applied.items()}
+        return {"enabled": self.enabled, "roles": self.roles, "applied": applied}
@@ -0,0 +1,100 @@
+import json
+import time
+import logging
+import threading
+from collections import deque
+from daemon.clock import SYSTEM_CLOCK
+
+logger = logging.getLogger("DexDaemon")
+
+TRACE_CAPACITY = 200
+
+# Pipeline stages in the order they happen. All are clock.monotonic() values.
+STAGES = [
+    "speech_onset",    # capture time of the first voiced frame
+    "speech_end",      # capture time of the last voiced frame
+    "endpoint",        # silence limit reached, utterance closed
+    "queued",          # handed to the decode scheduler
+    "whisper_start",   # scheduler picked it up
+    "first_segment",
+    "decode_end",
+    "macro_match",     # macro lookup finished
+    "injection_end",   # text typed or macro launched
+]
+
+
+class UtteranceTrace:
+    """Timestamps for one utterance from first voiced frame to injected text."""
+
+    _ids = 0
+    _ids_lock = threading.Lock()
+
+    def __init__(self, clock=SYSTEM_CLOCK):
+        with UtteranceTrace._ids_lock:
+            UtteranceTrace._ids += 1
+            self.id = UtteranceTrace._ids
+        self.clock = clock
+        self.wall_time = clock.time()
+        self.stamps = {}
+        self.info = {}
+
+    def mark(self, stage, at=None):
+        self.stamps[stage] = self.clock.monotonic() if at is None else at
+
+    def add_job(self, job):
+        """Copy the scheduler's timings off a finished DecodeJob."""
+        self.mark("queued", job.submitted)
+        if job.started is not None: self.mark("whisper_start", job.started)
+        if job.first_segment is not None: self.mark("first_segment", job.first_segment)
+        if job.finished is not None: self.mark("decode_end", job.finished)
+        self.info["audio_seconds"] = round(job.duration, 3)
+        self.info["batch_size"] = job.batch_size
+
+    def span(self, start, end):
+        if start in self.stamps and end in self.stamps:
+            return round((self.stamps[end] - self.stamps[start]) * 1000, 1)
+        return None
+
+    def to_dict(self):
+        origin = self.stamps.get("speech_onset", min(self.stamps.values(), default=0.0))
+        return {
+            "id": self.id,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.wall_time)),
+            # Stage times in ms since speech onset
+            "stages": {s: round((self.stamps[s] - origin) * 1000, 1) for s in STAGES if s in self.stamps},
+            "durations": {
+                "endpoint_wait": self.span("speech_end", "endpoint"),
+                "queue_wait": self.span("queued", "whisper_start"),
+                "decode": self.span("whisper_start", "decode_end"),
+                "inject": self.span("macro_match", "injection_end"),
+                "total": self.span("speech_end", "injection_end"),
+            },
+            **self.info,
+        }
+
+
+class TraceStore:
+    """Keeps the last `capacity` traces in memory and optionally appends them to a JSONL file."""
+
+    def __init__(self, capacity=TRACE_CAPACITY, path=None):
+        self.traces = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+        self.path = path
+
+    def add(self, trace):
+        record = trace.to_dict()
+        with self.lock:
+            self.traces.append(record)
+        logger.debug(f"Trace {record['id']}: {record['durations']}")
+        if self.path:
+            try:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as ex:
+                logger.warning(f"Trace write failed ({self.path}): {ex}")
+        return record
+
+    def recent(self, limit=None):
+        with self.lock:
+            traces = list(self.traces)
+        return traces[-limit:] if limit else traces
@@ -0,0 +1,64 @@
+import numpy as np
+
+# Decode cost grows with audio length, and silence costs as much as speech.
+# Before decoding, leading and trailing silence is cut and every pause longer
+# than MAX_GAP is shortened to MAX_GAP, all on per-frame energies in one pass.
+# The TimeMap maps times in the trimmed audio back to the recording.
+
+SAMPLE_RATE = 16000
+FRAME = 512
+THRESHOLD = 0.005
+MAX_GAP = 0.3   # longest pause left in, seconds; Whisper still sees a word break
+PADDING = 0.1   # silence kept before the first and after the last voiced frame
+
+
+def frame_energies(audio, frame=FRAME):
+    """RMS per frame of float audio in -1..1 (a trailing partial frame counts as one)."""
+    n = -(-len(audio) // frame)
+    padded = np.zeros(n * frame, dtype=np.float32)
+    padded[:len(audio)] = audio
+    frames = padded.reshape(n, frame)
+    return np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame)
+
+
+class TimeMap:
+    """Kept spans as (trimmed start, recording start, length) seconds, in order."""
+
+    def __init__(self, spans):
+        self.spans = spans
+        self._trimmed = np.array([s[0] for s in spans]) if spans else np.zeros(1)
+
+    def to_original(self, t):
+        if not self.spans:
+            return t
+        i = max(int(np.searchsorted(self._trimmed, t, side="right")) - 1, 0)
+        trimmed_start, start, length = self.spans[i]
+        return start + min(t - trimmed_start, length)
+
+
+def trim(audio, threshold=THRESHOLD, max_gap=MAX_GAP, padding=PADDING, frame=FRAME):
+    """(trimmed audio, TimeMap). Audio without a voiced frame comes back unchanged."""
+    voiced = frame_energies(audio, frame) > threshold
+    if not voiced.any():
+        return audio, TimeMap([(0.0, 0.0, len(audio) / SAMPLE_RATE)])
+    seconds = frame / SAMPLE_RATE
+    pad, gap = int(round(padding / seconds)), int(round(max_gap / seconds))
+    idx = np.flatnonzero(voiced)
+    keep = np.zeros(len(voiced), dtype=bool)
+    keep[max(idx[0] - pad, 0):idx[-1] + pad + 1] = True
+    # Silent runs between voiced frames: keep half the allowed gap at each end
+    starts, ends = idx[:-1][np.diff(idx) > 1] + 1, idx[1:][np.diff(idx) > 1]
+    long_ = ends - starts > gap
+    for s, e in zip(starts[long_] + gap // 2, ends[long_] - (gap - gap // 2)):
+        keep[s:e] = False
+
+    # Kept frame runs -> sample spans
+    edges = np.diff(np.concatenate(([0], keep.astype(np.int8), [0])))
+    run_starts, run_ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    spans, pieces, offset = [], [], 0
+    for s, e in zip(run_starts * frame, np.minimum(run_ends * frame, len(audio))):
+        s, e = int(s), int(e)
+        spans.append((offset / SAMPLE_RATE, s / SAMPLE_RATE, (e - s) / SAMPLE_RATE))
+        pieces.append(audio[s:e])
+        offset += e - s
+    return np.concatenate(pieces), TimeMap(spans)
@@ -0,0 +1,122 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger("DexDaemon")
+
+# vocabulary.json biases Whisper towards domain terms through the decoder prompt:
+#   {"terms": ["Starsilk", "Shard-God", ...], "style": "Fiction, Sci-Fi", "max_tokens": 120}
+# Terms are listed in priority order; the ones that don't fit the token budget
+# are left out. Whisper itself caps the prompt at half its context (223 tokens).
+
+REPO_VOCABULARY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "vocabulary.json")
+MAX_PROMPT_TOKENS = 223
+DEFAULT_TOKENS = 120
+CHARS_PER_TOKEN = 3  # conservative estimate for when no tokenizer is at hand
+
+
+def build_prompt(terms, style="", budget=DEFAULT_TOKENS, count=None):
+    """
+    "style. term, term, ..." with as many terms as fit in `budget` tokens.
+    `count(text)` returns the token count of a prompt; without it, it's estimated.
+    """
+    count = count or (lambda text: -(-len(text) // CHARS_PER_TOKEN))
+    head = style.strip().rstrip(".") + ". " if style.strip() else ""
+    prompt = head.strip()
+    for n in range(1, len(terms) + 1):
+        candidate = head + ", ".join(terms[:n]) + "."
+        if count(candidate) > budget:
+            break
+        prompt = candidate
+    return prompt
+
+
+class Vocabulary:
+    """
+    vocabulary.json, reloaded when its mtime changes. prompt(tokenizer) returns
+    the prompt as token ids (faster-whisper skips encoding them), computed once
+    per file version and tokenizer.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.terms = []
+        self.style = ""
+        self.budget = DEFAULT_TOKENS
+        self.version = 0  # bumped on every reload
+        self._cache = {}
+
+    def refresh(self):
+        """Reload if the file changed. One stat() when it didn't."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        self.version += 1
+        self._cache = {}
+        self.terms, self.style, self.budget = [], "", DEFAULT_TOKENS
+        if mtime is None:
+            return True
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.terms = [t for t in data.get("terms", []) if isinstance(t, str) and t.strip()]
+            self.style = data.get("style", "")
+            self.budget = min(int(data.get("max_tokens", DEFAULT_TOKENS)), MAX_PROMPT_TOKENS)
+            logger.info(f"Loaded {len(self.terms)} vocabulary terms from {self.path}")
+        except (OSError, ValueError, TypeError) as ex:
+            logger.error(f"Vocabulary Load Error ({self.path}): {ex}")
+        return True
+
+    def prompt(self, tokenizer=None):
+        """Token ids if a tokenizers.Tokenizer is given, else the text; None without terms."""
+        if not self.terms and not self.style:
+            return None
+        if tokenizer is None:
+            if "text" not in self._cache:
+                self._cache["text"] = build_prompt(self.terms, self.style, self.budget)
+            return self._cache["text"]
+        cached = self._cache.get("tokens")
+        if cached is None or cached[0] is not tokenizer:
+            # faster-whisper prefixes string prompts with a space before encoding; match it
+            encode = lambda text: tokenizer.encode(" " + text, add_special_tokens=False).ids
+            text = build_prompt(self.terms, self.style, self.budget, count=lambda text: len(encode(text)))
+            self._cache["tokens"] = cached = (tokenizer, encode(text))
+        return cached[1]
+
+    def hotwords(self):
+        if not self.terms:
+            return None
+        if "hotwords" not in self._cache:
+            self._cache["hotwords"] = build_prompt(self.terms, budget=self.budget)
+        return self._cache["hotwords"]
+
+
+def find(config, config_path):
+    """config.json's "vocabulary_file", else vocabulary.json beside config.json, else the repo's."""
+    if "vocabulary_file" in config:
+        return os.path.expanduser(config["vocabulary_file"])
+    path = os.path.join(os.path.dirname(config_path), "vocabulary.json")
+    return path if os.path.exists(path) else REPO_VOCABULARY
+
+
+def apply(options, vocabulary, tokenizer=None):
+    """
+    Bias decode `options` in place as the profile's "vocabulary" option says:
+    "prompt" (default), "hotwords", or false for none.
+    """
+    bias = options.pop("vocabulary", "prompt")
+    if not bias:
+        return options
+    vocabulary.refresh()
+    if bias == "hotwords":
+        hotwords = vocabulary.hotwords()
+        if hotwords: options["hotwords"] = hotwords
+    else:
+        prompt = vocabulary.prompt(tokenizer)
+        if prompt: options["initial_prompt"] = prompt
+    return options
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import errno
+import ctypes
+import ctypes.util
+import select
+import struct
+import hashlib
+import logging
+import threading
+from daemon.backends import AUDIO_EXTENSIONS
+
+logger = logging.getLogger("DexDaemon")
+
+# Watch-folder ingestion: audio files dropped into a directory are transcribed
+# in the background, and the transcript is written next to each file as
+# <name>.txt. Files are tracked by content hash, so a restart or a renamed copy
+# doesn't transcribe the same memo twice.
+
+LEDGER_FILE = os.path.expanduser("~/.cache/dex-dictate/watched.json")
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT = struct.Struct("iIII")
+POLL_SECONDS = 5.0  # rescan interval when inotify isn't available
+
+
+class Inotify:
+    """Just enough of inotify(7) through libc: one watch, names of files closed after writing or moved in."""
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {path}")
+
+    def read(self, timeout):
+        """Names of files that changed, waiting up to `timeout` seconds for the first."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except OSError as ex:
+            if ex.errno == errno.EAGAIN:
+                return []
+            raise
+        names, offset = [], 0
+        while offset < len(data):
+            _, _, _, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            names.append(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FolderWatcher(threading.Thread):
+    """
+    Feeds new audio files in `directory` to `transcribe(path) -> text`, one at a
+    time at the lowest CPU priority, writes <file>.txt beside each and calls
+    `on_transcript(path, text, digest)`. Files already in the folder at start
+    are picked up too, unless their hash is in the ledger.
+    """
+
+    def __init__(self, directory, transcribe, on_transcript=None, ledger=LEDGER_FILE, shutdown_event=None):
+        super().__init__(daemon=True)
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.transcribe = transcribe
+        self.on_transcript = on_transcript
+        self.ledger_path = ledger
+        self.ledger = self._load_ledger()
+        self.shutdown_event = shutdown_event or threading.Event()
+        self.processed = 0
+
+    def _load_ledger(self):
+        try:
+            with open(self.ledger_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_ledger(self):
+        os.makedirs(os.path.dirname(self.ledger_path), exist_ok=True)
+        tmp = self.ledger_path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.ledger, f, indent=1)
+        os.replace(tmp, self.ledger_path)
+
+    def wanted(self, name):
+        return name.lower().endswith(AUDIO_EXTENSIONS) and not name.startswith(".")
+
+    def run(self):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (OSError, AttributeError):
+            pass
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            inotify = Inotify(self.directory)
+        except (OSError, AttributeError) as ex:
+            logger.warning(f"inotify unavailable ({ex}); rescanning {self.directory} every {POLL_SECONDS:.0f}s")
+            inotify = None
+        logger.info(f"Watching {self.directory} for audio files")
+        # Whatever arrived while the daemon was down
+        self.scan()
+        try:
+            while not self.shutdown_event.is_set():
+                if inotify is None:
+                    self.shutdown_event.wait(POLL_SECONDS)
+                    self.scan()
+                    continue
+                for name in inotify.read(timeout=0.5):
+                    if self.wanted(name):
+                        self.ingest(os.path.join(self.directory, name))
+        finally:
+            if inotify: inotify.close()
+
+    def scan(self):
+        for name in sorted(os.listdir(self.directory)):
+            if self.shutdown_event.is_set():
+                return
+            if self.wanted(name):
+                self.ingest(os.path.join(self.directory, name))
+
+    def ingest(self, path):
+        """Transcribe `path` unless its content was done before. Returns the transcript or None."""
+        try:
+            digest = content_hash(path)
+        except OSError:
+            return None  # gone again
+        if digest in self.ledger:
+            return None
+        start = time.monotonic()
+        try:
+            text = self.transcribe(path)
+        except Exception as ex:
+            logger.error(f"Watch folder: {os.path.basename(path)} failed: {ex}")
+            return None
+        with open(os.path.splitext(path)[0] + ".txt", 'w') as f:
+            f.write(text + "\n")
+        self.ledger[digest] = {"path": path, "at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        self._save_ledger()
+        self.processed += 1
+        logger.info(f"Watch folder: transcribed {os.path.basename(path)} in {time.monotonic() - start:.1f}s")
+        if self.on_transcript:
+            self.on_transcript(path, text, digest)
+        return text
@@ -0,0 +1,199 @@
+"""
+Offline batch transcription.
+
+Transcribes a directory or glob of audio files with a pool of worker
+processes, each loading the model once. Audio goes through the same silence
+trimming, decode profiles, vocabulary prompt and correction as live dictation,
+so results match what the daemon would have typed. Results are streamed to a
+JSONL file, one line per file; rerunning with the same output skips files that
+are already in it.
+
+    dex-batch ~/memos --out memos.jsonl [--workers 4] [--model small.en]
+"""
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import dex_daemon
+from daemon import backends, profiles, trim, vocabulary
+from daemon.batching import DecodeJob, decode_sequential
+from daemon.correction import Corrector, THRESHOLD
+from daemon.recording import Recording, WINDOW_SECONDS, stitch
+from daemon.scheduling import usable_cores
+
+SAMPLE_RATE = 16000
+
+logger = logging.getLogger("DexDaemon")
+
+
+# --- INPUT ---
+def find_files(patterns):
+    """Audio files under directories, matching globs, or named directly; sorted, no repeats."""
+    found = set()
+    for pattern in patterns:
+        pattern = os.path.expanduser(pattern)
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                found.update(os.path.join(root, n) for n in names if n.lower().endswith(backends.AUDIO_EXTENSIONS))
+        else:
+            found.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+    return sorted(os.path.abspath(p) for p in found)
+
+
+def load_done(path):
+    """Files already transcribed without error in an earlier run's output."""
+    done = set()
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by the interruption
+                if "error" not in entry:
+                    done.add(entry["path"])
+    except OSError:
+        pass
+    return done
+
+
+# --- TRANSCRIPTION ---
+class Transcriber:
+    """The live pipeline minus the microphone: trim, profile, vocabulary, decode, correct."""
+
+    def __init__(self, config, asr="whisper", model_size=None, profile=None, cpu_threads=None, **asr_options):
+        self.config = config
+        self.profiles = profiles.available(config.get("profiles"))
+        self.profile = profile or config.get("decode_profile", profiles.AUTO)
+        self.vocabulary = vocabulary.Vocabulary(vocabulary.find(config, dex_daemon.CONFIG_PATH))
+        self.vocabulary.refresh()
+        correction = config.get("correction", {})
+        self.corrector = None if correction is False else Corrector(
+            self.vocabulary.terms + list(config.get("macros", {})), correction.get("threshold", THRESHOLD))
+        self.model = backends.create("asr", asr, model_size=model_size or config.get("model_size", dex_daemon.MODEL_SIZE),
+                                     device="cpu", compute_type=config.get("compute_type", "int8"),
+                                     cpu_threads=cpu_threads or config.get("cpu_threads", 4), **asr_options)
+
+    def decode(self, audio, duration=None):
+        """(text, seconds decoded, profile). The profile goes by `duration`, else the trimmed length, as live."""
+        audio, _ = trim.trim(audio, dex_daemon.VAD_THRESHOLD, frame=dex_daemon.FRAME_LENGTH)
+        name, options = profiles.resolve(self.profile, duration or len(audio) / SAMPLE_RATE, self.profiles)
+        vocabulary.apply(options, self.vocabulary, getattr(self.model, "hf_tokenizer", None))
+        job = DecodeJob("batch", audio, options)
+        decode_sequential(self.model, job)
+        return job.wait(), len(audio) / SAMPLE_RATE, name
+
+    def transcribe(self, path):
+        start = time.monotonic()
+        # Streamed in, so past the memory bound a long file is only on disk, never in memory as well
+        recording = Recording()
+        for chunk in backends.stream_audio(path):
+            recording.append(chunk)
+        duration = recording.seconds
+        words, kept, profile = [], 0.0, None
+        # Long files in the same pause-aligned, overlapping windows as long dictation
+        for _, window, overlap in recording.windows(WINDOW_SECONDS):
+            text, seconds, profile = self.decode(window, duration if duration > WINDOW_SECONDS else None)
+            kept += seconds
+            words += stitch(words, text) if overlap else text.split()
+        text, corrections = self.corrector.correct(" ".join(words)) if self.corrector else (" ".join(words), [])
+        elapsed = time.monotonic() - start
+        result = {"path": path, "text": text, "audio_seconds": round(duration, 2),
+                  "trimmed_seconds": round(duration - kept, 2), "profile": profile,
+                  "decode_seconds": round(elapsed, 2), "rtf": round(elapsed / duration, 3) if duration else None}
+        if corrections: result["corrections"] = corrections
+        return result
+
+
+_worker = None
+
+
+def _init_worker(settings):
+    global _worker
+    logging.getLogger("DexDaemon").setLevel(logging.WARNING)
+    _worker = Transcriber(**settings)
+
+
+def _transcribe(path):
+    try:
+        return _worker.transcribe(path)
+    except Exception as ex:
+        return {"path": path, "error": repr(ex)}
+
+
+def run(files, out, workers, settings, progress=None):
+    """Transcribe `files` into the JSONL file `out`, skipping ones it already has. Returns totals."""
+    done = load_done(out)
+    todo = [f for f in files if f not in done]
+    totals = {"files": len(files), "skipped": len(files) - len(todo), "transcribed": 0, "errors": 0,
+              "audio_seconds": 0.0, "wall_seconds": 0.0}
+    start = time.monotonic()
+    if todo:
+        # spawn: workers must not inherit CTranslate2 or audio threads from this process
+        context = multiprocessing.get_context("spawn")
+        with open(out, 'a') as f, ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                                      initargs=(settings,)) as pool:
+            for future in as_completed([pool.submit(_transcribe, path) for path in todo]):
+                result = future.result()
+                f.write(json.dumps(result) + "\n")
+                f.flush()  # every finished file survives an interruption
+                if "error" in result:
+                    totals["errors"] += 1
+                else:
+                    totals["transcribed"] += 1
+                    totals["audio_seconds"] += result["audio_seconds"]
+                if progress: progress(result)
+    totals["wall_seconds"] = round(time.monotonic() - start, 2)
+    totals["audio_seconds"] = round(totals["audio_seconds"], 2)
+    # Audio hours per wall hour
+    totals["throughput"] = round(totals["audio_seconds"] / totals["wall_seconds"], 2) if totals["wall_seconds"] else 0.0
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe audio files offline with the daemon's pipeline.")
+    parser.add_argument("inputs", nargs="+", help="Audio files, directories or globs")
+    parser.add_argument("--out", default="transcripts.jsonl", help="JSONL output; rerunning resumes it")
+    parser.add_argument("--workers", type=int, default=max(1, len(usable_cores()) // 2),
+                        help="Worker processes, each with its own model")
+    parser.add_argument("--model", help="Whisper model size (default: config.json's, else tiny.en)")
+    parser.add_argument("--profile", help="Decode profile (default: config.json's decode_profile)")
+    parser.add_argument("--backend", default="whisper", help="ASR backend (sim for a dry run)")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    config = {}
+    if os.path.exists(dex_daemon.CONFIG_PATH):
+        with open(dex_daemon.CONFIG_PATH) as f:
+            config = json.load(f)
+    files = find_files(args.inputs)
+    if not files:
+        print("No audio files found", file=sys.stderr)
+        return 1
+    settings = {"config": config, "asr": args.backend, "model_size": args.model, "profile": args.profile,
+                # Split the cores between workers instead of oversubscribing them
+                "cpu_threads": max(1, len(usable_cores()) // args.workers)}
+
+    def progress(result):
+        if args.quiet:
+            return
+        if "error" in result:
+            print(f"ERROR {result['path']}: {result['error']}", file=sys.stderr)
+        else:
+            print(f"{result['audio_seconds']:>8.1f}s  RTF {result['rtf']}  {result['path']}", file=sys.stderr)
+
+    totals = run(files, args.out, args.workers, settings, progress)
+    print(json.dumps(totals))
+    print(f"{totals['audio_seconds'] / 3600:.2f} audio hours in {totals['wall_seconds'] / 3600:.3f} wall hours: "
+          f"{totals['throughput']} audio-hours per wall-hour", file=sys.stderr)
+    return 1 if totals["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
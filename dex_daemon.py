@@ -5,120 +5,96 @@ import json
 import queue
 import socket
 import struct
+import argparse
 import threading
 import logging
 import subprocess
+import contextlib
 import numpy as np
-import sounddevice as sd
-import pvporcupine
-from faster_whisper import WhisperModel
-from evdev import UInput, ecodes as e
+from daemon.batching import BatchScheduler
+from daemon.tracing import UtteranceTrace, TraceStore
+from daemon import metrics
+from daemon import backends
+from daemon.clock import SYSTEM_CLOCK, SimClock
+from daemon.profiling import Profilers
+from daemon.models import ModelManager, IDLE_MINUTES
+from daemon import calibration
+from daemon.scheduling import CpuPlan
+from daemon import profiles
+from daemon.history import History
+from daemon.refine import Refiner
+from daemon import vocabulary
+from daemon.correction import Corrector, THRESHOLD
+from daemon import trim
+from daemon.recording import Recording, WindowedJob, WINDOW_SECONDS
+from daemon.watch import FolderWatcher
+from daemon import admission
+from daemon import commands
 
 # --- CONFIGURATION ---
 SAMPLE_RATE = 16000
 FRAME_LENGTH = 512
 VAD_THRESHOLD = 0.005
 SILENCE_LIMIT = 1.5
-SOCK_FILE = f"/run/user/{os.getuid()}/dex3.sock"
+WATCH_WINDOW = 10.0  # watch-folder files are decoded in short windows so live dictation never waits long
+FOCUS_PAUSE = 0.7  # FOCUS mode: a pause this long ends a segment, and dictation goes on
+AUDIO_QUEUE_FRAMES = 320  # ~10 s of audio; beyond that frames are dropped, not buffered forever
+RUNTIME_DIR = os.environ.get("XDG_RUNTIME_DIR", f"/run/user/{os.getuid()}")
+SOCK_FILE = os.path.join(RUNTIME_DIR, "dex3.sock")
+METRICS_SOCK = os.path.join(RUNTIME_DIR, "dex3-metrics.sock")
+LOCK_FILE = "/tmp/dex_daemon.lock"
+CONFIG_PATH = os.path.expanduser("~/.config/dex-dictate/config.json")
 MODEL_SIZE = "tiny.en"
 ACCESS_KEY = os.environ.get("PICOVOICE_ACCESS_KEY", "CpyLypXl9zpcJzppA6W70VwqTDr2+d2XYa6AhExQYPryoIwbt2h6DA==")
 
+@contextlib.contextmanager
+def runtime_paths(directory):
+    """Put the sockets, lock file and config in `directory` (tests, benchmarks); restored on exit."""
+    global RUNTIME_DIR, SOCK_FILE, METRICS_SOCK, LOCK_FILE, CONFIG_PATH
+    saved = RUNTIME_DIR, SOCK_FILE, METRICS_SOCK, LOCK_FILE, CONFIG_PATH
+    RUNTIME_DIR = directory
+    SOCK_FILE = os.path.join(directory, "dex3.sock")
+    METRICS_SOCK = os.path.join(directory, "dex3-metrics.sock")
+    LOCK_FILE = os.path.join(directory, "dex_daemon.lock")
+    CONFIG_PATH = os.path.join(directory, "config.json")
+    try:
+        yield directory
+    finally:
+        RUNTIME_DIR, SOCK_FILE, METRICS_SOCK, LOCK_FILE, CONFIG_PATH = saved
+
 # --- LOGGING ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("DexDaemon")
 
-# --- INPUT SIMULATION ---
-try:
-    ui = UInput()
-    logger.info("UInput initialized successfully.")
-except Exception as ex:
-    logger.warning(f"UInput failed: {ex}. Will use fallback methods.")
-    ui = None
-
-CHAR_MAP = {
-    'a': (e.KEY_A, 0), 'b': (e.KEY_B, 0), 'c': (e.KEY_C, 0), 'd': (e.KEY_D, 0), 'e': (e.KEY_E, 0),
-    'f': (e.KEY_F, 0), 'g': (e.KEY_G, 0), 'h': (e.KEY_H, 0), 'i': (e.KEY_I, 0), 'j': (e.KEY_J, 0),
-    'k': (e.KEY_K, 0), 'l': (e.KEY_L, 0), 'm': (e.KEY_M, 0), 'n': (e.KEY_N, 0), 'o': (e.KEY_O, 0),
-    'p': (e.KEY_P, 0), 'q': (e.KEY_Q, 0), 'r': (e.KEY_R, 0), 's': (e.KEY_S, 0), 't': (e.KEY_T, 0),
-    'u': (e.KEY_U, 0), 'v': (e.KEY_V, 0), 'w': (e.KEY_W, 0), 'x': (e.KEY_X, 0), 'y': (e.KEY_Y, 0),
-    'z': (e.KEY_Z, 0), ' ': (e.KEY_SPACE, 0), '.': (e.KEY_DOT, 0), ',': (e.KEY_COMMA, 0),
-    '?': (e.KEY_SLASH, 1), '!': (e.KEY_1, 1), '\n': (e.KEY_ENTER, 0)
-}
-
-def type_text(text):
-    logger.info(f"Typing: {text}")
-    if ui:
-        try:
-            for char in text + " ":
-                if char.lower() in CHAR_MAP:
-                    k, s = CHAR_MAP[char.lower()]
-                    if char.isupper() or s: ui.write(e.EV_KEY, e.KEY_LEFTSHIFT, 1)
-                    ui.write(e.EV_KEY, k, 1); ui.syn()
-                    ui.write(e.EV_KEY, k, 0)
-                    if char.isupper() or s: ui.write(e.EV_KEY, e.KEY_LEFTSHIFT, 0)
-                    ui.syn(); time.sleep(0.002)
-            return
-        except: pass
+# --- HOT PATH HELPERS ---
+# Kept as plain functions so benchmarks/micro.py can time exactly what the daemon runs.
+def frame_energy(pcm):
+    """RMS of an int16 frame, scaled to 0..1."""
+    return np.sqrt(np.mean(pcm.astype(float)**2)) / 32768.0
 
-    try:
-        subprocess.run(['wl-copy', text + " "], check=True)
-        if ui:
-            ui.write(e.EV_KEY, e.KEY_LEFTCTRL, 1)
-            ui.write(e.EV_KEY, e.KEY_V, 1); ui.syn()
-            ui.write(e.EV_KEY, e.KEY_V, 0)
-            ui.write(e.EV_KEY, e.KEY_LEFTCTRL, 0); ui.syn()
-            return
-    except: pass
-    
-    try: subprocess.run(['xdotool', 'type', text + " "], check=True)
-    except: pass
-
-# --- AUDIO THREAD ---
-class AudioThread(threading.Thread):
-    def __init__(self, callback, shutdown_event):
-        super().__init__()
-        self.callback = callback
-        self.shutdown_event = shutdown_event
-
-    def run(self):
-        while not self.shutdown_event.is_set():
-            try:
-                device_id = None
-                devices = sd.query_devices()
-                for name in ['pulse', 'pipewire', 'default']:
-                    for i, d in enumerate(devices):
-                        if name in d['name'].lower() and d['max_input_channels'] > 0:
-                            device_id = i
-                            logger.info(f"Selected Audio Device: {d['name']} (Index {i})")
-                            break
-                    if device_id is not None: break
-                
-                if device_id is None:
-                    logger.error("No suitable audio device found!")
-                    time.sleep(2)
-                    continue
 
-                with sd.InputStream(samplerate=SAMPLE_RATE, device=device_id, channels=1, dtype='int16', 
-                                  blocksize=FRAME_LENGTH, callback=self._audio_callback):
-                    logger.info("Audio Stream Started")
-                    while not self.shutdown_event.is_set():
-                        time.sleep(0.1)
-            except Exception as e:
-                logger.error(f"Audio Stream Error: {e}. Retrying in 2s...")
-                time.sleep(2)
+def pcm_to_float(frames):
+    """Captured int16 frames as one float32 array in -1..1, as Whisper expects."""
+    return np.concatenate(frames).flatten().astype(np.float32) / 32768.0
+
 
-    def _audio_callback(self, indata, frames, time, status):
-        if status: logger.warning(f"Audio Status: {status}")
-        self.callback(indata.copy())
+def match_macro(text, macros):
+    """The macro command for a transcript, or None."""
+    return macros.get(text.lower().strip().rstrip('.').rstrip('!'))
 
-    def stop(self):
-        self.running = False
 
 # --- DAEMON CLASS ---
 class DexDaemon:
-    def __init__(self):
+    def __init__(self, simulate=False, backends_override=None, clock=None, sim_options=None, watch_folder=None):
+        """
+        simulate: use the in-memory backend set (no mic, uinput, Porcupine or Whisper).
+        backends_override: {kind: name} applied on top of config.json's "backends".
+        clock: SYSTEM_CLOCK by default; a SimClock runs the state machine in virtual time.
+        sim_options: extra keyword arguments for the sim backends (audio, transcripts, wake_at, rtf).
+        watch_folder: transcribe audio files dropped here (overrides config.json's "watch_folder").
+        """
         # Singleton Check
-        self.lock_file = "/tmp/dex_daemon.lock"
+        self.lock_file = LOCK_FILE
         if os.path.exists(self.lock_file):
             try:
                 pid = int(open(self.lock_file).read())
@@ -129,112 +105,591 @@ class DexDaemon:
                 pass # Stale lock
         with open(self.lock_file, 'w') as f: f.write(str(os.getpid()))
 
-        self.mode = "WAKE"
+        self.started = time.monotonic()
+        self.clock = clock or SYSTEM_CLOCK
+        # LOADING until the models are in; frames are dropped and the GUI can say so
+        self.mode = "LOADING"
         self.config_mode = "WAKE"
-        self.audio_q = queue.Queue()
-        self.rec_buffer = []
+        self.ready = threading.Event()
+        self.pp = None
+        self.audio_q = queue.Queue(maxsize=AUDIO_QUEUE_FRAMES)
+        self.rec_buffer = Recording()
         self.silence_start = None
+        self.trace = None
+        self.focused_app = None
+        self.focus_serial = 0  # bumped on every focus change, so segments know if their field still has focus
+        self.onset_focus = 0  # focus_serial when the current segment's speech began
+        self.segments = queue.Queue()  # FOCUS mode: (trace, job, time map, focus serial), in spoken order
+        self.last_injection = None  # (utterance id, clock time, app, characters typed) of the last typed text
+        self.refined_id = None
+        self.inject_lock = threading.Lock()
+        self.shutdown_event = threading.Event()
+
+        self.load_config()
+        self.watch_folder = watch_folder or self.config.get("watch_folder")
+        self.watcher = None
+        self.rec_buffer = self.new_recording()
+        self.sim_options = dict(self.config.get("sim", {}), **(sim_options or {}))
+        self.backend_names = backends.select(self.config, simulate, backends_override)
+        self.cpu = CpuPlan(self.config.get("cpu_scheduling"))
+        # Defaults, then this CPU's calibration, then anything pinned in config.json
+        self.asr_settings = {"model_size": MODEL_SIZE, "compute_type": "int8", "cpu_threads": 4}
+        if self.backend_names["asr"] == "whisper":
+            self.asr_settings.update(calibration.cached_choice() or {})
+        self.asr_settings.update({k: self.config[k] for k in self.asr_settings if k in self.config})
+        self.models = ModelManager(self.create_whisper, self.asr_settings["model_size"], clock=self.clock,
+                                   idle_timeout=self.config.get("model_idle_minutes", IDLE_MINUTES) * 60,
+                                   busy=lambda: self.scheduler.busy or self.scheduler.pending() > 0,
+                                   thread_setup=lambda: self.cpu.apply("decode"))
         
-        logger.info("Loading Porcupine...")
-        self.pp = pvporcupine.create(access_key=ACCESS_KEY, keywords=['porcupine'])
-        logger.info("Loading Whisper...")
-        # Optimize for low-resource: Limit threads
-        self.whisper = WhisperModel(MODEL_SIZE, device="cpu", compute_type="int8", cpu_threads=4)
-        
-        self.load_macros()
+        self.injector = self.create_backend("injector")
+        self.sound = self.create_backend("sound")
+        # All decodes go through the scheduler so other sessions can share the model
+        self.scheduler = BatchScheduler(self.models.get, clock=self.clock, thread_setup=lambda: self.cpu.apply("decode"))
+        self.models.on_release.append(self.scheduler.release_pipelines)
+        self.scheduler.register("mic")
+        # Below the mic: only decoded when no dictation is queued
+        self.scheduler.register("watch", priority=-1)
+        self.scheduler.start()
+        self.history = History(os.path.join(os.path.dirname(CONFIG_PATH), "history.json"))
+        self.admission = self.create_admission()
+        self.full_size = None  # the model to go back to after a load-induced downgrade
+        self.refiner = self.create_refiner()
         
-        self.shutdown_event = threading.Event()
-        self.audio_thread = AudioThread(self.audio_q.put, self.shutdown_event)
-        self.audio_thread.start()
+        self.traces = TraceStore(path=self.config.get("trace_file"))
+        self.profilers = Profilers(RUNTIME_DIR)
+        metrics.QUEUE_DEPTH.fn = self.audio_q.qsize
+        try:
+            metrics.start_metrics_server(self.config.get("metrics_port"), METRICS_SOCK)
+        except OSError as ex:
+            logger.warning(f"Metrics server failed: {ex}")
         
+        # Socket and capture first, so the GUI sees LOADING instead of OFFLINE
         threading.Thread(target=self.ipc_loop, daemon=True).start()
+        self.audio_thread = self.create_backend("capture", callback=self.enqueue_frame,
+                                                shutdown_event=self.shutdown_event, queue_depth=self.audio_q.qsize,
+                                                thread_setup=lambda: self.cpu.apply("audio"))
+        self.audio_thread.start()
+        threading.Thread(target=self.deliver_segments, daemon=True).start()
+        threading.Thread(target=self.load_models, daemon=True).start()
+
+    def load_models(self):
+        """Load Porcupine and Whisper, warm Whisper up, then leave LOADING."""
+        # Whisper's worker threads inherit this thread's cores and priority
+        self.cpu.apply("decode")
+        try:
+            logger.info("Loading Porcupine...")
+            self.pp = self.create_backend("wakeword", access_key=ACCESS_KEY)
+            logger.info("Loading Whisper...")
+            self.models.load()
+        except Exception as e:
+            logger.error(f"Model Load Error: {e}")
+            self.mode = "ERROR"
+            return
+        self.ready.set()
+        self.set_mode(self.config_mode)
+        logger.info(f"Daemon ready (time-to-ready {time.monotonic() - self.started:.2f}s)")
+        if self.watch_folder:
+            self.watcher = FolderWatcher(self.watch_folder, self.transcribe_file, self.on_watched,
+                                         shutdown_event=self.shutdown_event)
+            self.watcher.start()
+        if (self.backend_names["asr"] == "whisper" and self.config.get("auto_calibrate", True)
+                and calibration.cached_choice() is None):
+            threading.Thread(target=self.first_run_calibration, daemon=True).start()
+
+    def first_run_calibration(self, automatic=True):
+        """
+        Calibrate at the lowest priority while the defaults serve, then switch to
+        the result. Only models already downloaded are tried; `--calibrate` or the
+        CALIBRATE IPC command measures every size.
+        """
+        self.cpu.apply("decode")
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (OSError, AttributeError):
+            pass
+        sizes = calibration.downloaded_sizes() if automatic else calibration.MODEL_SIZES
+        if not sizes:
+            return
+        logger.info(f"Calibrating {', '.join(sizes)} for this CPU in the background...")
+        clip = calibration.load_clip()
+        result = calibration.calibrate(self.calibration_factory, clip if clip is not None else calibration.synthetic_clip(),
+                                       sizes=sizes)
+        if not result["choice"]:
+            return
+        calibration.save(result)
+        choice = {k: result["choice"][k] for k in ("model_size", "compute_type", "cpu_threads")}
+        logger.info(f"Calibrated: {choice} (RTF {result['choice']['rtf']})")
+        pinned = {k: self.config[k] for k in choice if k in self.config}
+        choice.update(pinned)
+        if choice != self.asr_settings:
+            if not self.models.reserve(choice["model_size"]):
+                logger.warning(f"Not switching to the calibrated settings: already loading {self.models.pending}")
+                return
+            previous, self.asr_settings = self.asr_settings, choice
+            if not self.models.swap(choice["model_size"], reserved=True):
+                self.asr_settings = previous
+
+    def calibration_factory(self, **settings):
+        return backends.create("asr", "whisper", device="cpu", **settings)
+
+    def create_backend(self, kind, **kwargs):
+        name = self.backend_names[kind]
+        logger.info(f"Backend {kind}: {name}")
+        options = dict(self.sim_options, **kwargs)
+        return backends.create(kind, name, clock=self.clock, **options)
+
+    def create_whisper(self, model_size):
+        return self.create_backend("asr", model_size=model_size, device="cpu", compute_type=self.asr_settings["compute_type"],
+                                   cpu_threads=self.asr_settings["cpu_threads"])
+
+    def set_model(self, model_size):
+        """Swap Whisper for `model_size` in the background; the current model serves until it's ready."""
+        if self.mode == "ERROR":
+            # The startup load failed, so there is nothing to swap: load again, with this size
+            self.models.size = self.asr_settings["model_size"] = model_size
+            self.mode = "LOADING"
+            threading.Thread(target=self.load_models, daemon=True).start()
+            return {"ok": True, "loading": model_size}
+        if not self.ready.is_set():
+            return {"ok": False, "error": "Still loading"}
+        if model_size == self.models.size and not self.models.pending:
+            return {"ok": True, "model": model_size}
+        # Claimed here, not on the thread, so a second SET_MODEL right behind this one is refused
+        if not self.models.reserve(model_size):
+            return {"ok": False, "error": f"Already loading {self.models.pending}"}
+        threading.Thread(target=self.swap_model, args=(model_size, True), daemon=True).start()
+        return {"ok": True, "loading": model_size}
+
+    def swap_model(self, model_size, chosen=False):
+        """Swap thread for a load already reserved; `chosen` swaps also become the configured size."""
+        self.cpu.apply("decode")
+        if self.models.swap(model_size, reserved=True) and chosen:
+            self.asr_settings["model_size"] = model_size
+            self.full_size = None  # the user's choice, not a load-induced downgrade to undo
+
+    def create_admission(self):
+        """Decode deadline and load-driven downgrades, unless config.json has "admission": false."""
+        settings = self.config.get("admission", {})
+        if settings is False:
+            return None
+        levels = admission.LEVELS
+        if not (settings.get("fallback_model") or admission.smaller_model(self.models.size)):
+            levels = levels[:-1]  # already on the smallest model
+        return admission.AdmissionController(
+            budget=settings.get("budget_rtf", admission.BUDGET_RTF), deadline=settings.get("deadline", admission.DEADLINE),
+            deadline_rtf=settings.get("deadline_rtf", admission.DEADLINE_RTF), levels=levels,
+            on_change=self.on_admission, clock=self.clock)
+
+    def on_admission(self, previous, level):
+        """Swap to the fallback model on the way down to "smaller", and back on the way up."""
+        if level == "smaller":
+            size = self.config.get("admission", {}).get("fallback_model") or admission.smaller_model(self.models.size)
+            if not size or size == self.models.size:
+                return
+            self.full_size = self.models.size
+        elif previous == "smaller" and self.full_size:
+            size, self.full_size = self.full_size, None
+        else:
+            return
+        if not self.models.reserve(size):
+            logger.warning(f"Not switching to Whisper {size}: already loading {self.models.pending}")
+            return
+        threading.Thread(target=self.swap_model, args=(size,), daemon=True).start()
+
+    def transcribe_file(self, path):
+        """
+        Watch folder: decode an audio file through the scheduler's low-priority
+        session, a short window at a time, pausing while an utterance is decoded.
+        """
+        # Past the live memory bound the rest spills to disk, as a long dictation would
+        recording = self.new_recording()
+        for chunk in backends.stream_audio(path):
+            recording.append(chunk)
+        _, options = self.decode_options(recording.seconds)
+
+        def submit(audios):
+            # Not on LISTENING: a FOCUS session can stay in it for as long as a text field has focus
+            while (self.mode == "PROCESSING" or self.scheduler.active("mic")) and not self.shutdown_event.is_set():
+                self.shutdown_event.wait(0.1)
+            trimmed = [trim.trim(audio, VAD_THRESHOLD, frame=FRAME_LENGTH) for audio in audios]
+            return [(self.scheduler.submit("watch", audio, **options), time_map) for audio, time_map in trimmed]
+
+        text = WindowedJob(recording, submit, self.clock, parallel=1, window_seconds=WATCH_WINDOW).wait()
+        return self.correct(text)[0]
+
+    def on_watched(self, path, text, digest):
+        self.history.add(text, id=f"watch:{digest[:16]}", source=path)
+
+    def create_refiner(self):
+        """
+        The second pass, if config.json has a "refine" section:
+            "refine": {"model_size": "small.en", "max_seconds": 15, "busy_load": 0.75, "fix_typed": false}
+        """
+        settings = self.config.get("refine")
+        if not settings:
+            return None
+        size = settings.get("model_size", "small.en")
+        models = ModelManager(self.create_whisper, size, clock=self.clock,
+                              idle_timeout=self.config.get("model_idle_minutes", IDLE_MINUTES) * 60)
+        refiner = Refiner(models, self.on_refined,
+                          busy=lambda: self.scheduler.busy or self.scheduler.pending() > 0,
+                          options=self.refine_options,
+                          max_seconds=settings.get("max_seconds", 15.0), busy_load=settings.get("busy_load", 0.75),
+                          thread_setup=lambda: self.cpu.apply("decode"), clock=self.clock)
+        refiner.start()
+        logger.info(f"Refining transcripts with Whisper {size} when the CPU is idle")
+        return refiner
+
+    def refine_options(self, model):
+        """The accurate profile, biased with the vocabulary like the first pass, for the refine model's tokenizer."""
+        options = dict(self.profiles.get("accurate", {}))
+        return vocabulary.apply(options, self.vocabulary, getattr(model, "hf_tokenizer", None))
+
+    def on_refined(self, item, text):
+        """Refiner callback: correct history and, if allowed, the text that was typed."""
+        text, _ = self.correct(text)
+        if text == item["draft"]:
+            return
+        self.history.update(item["id"], text)
+        self.last_text, self.refined_id = text, item["id"]
+        if not self.config.get("refine", {}).get("fix_typed"):
+            return
+        with self.inject_lock:
+            # Only while nothing was typed since and the same window still has focus
+            if self.last_injection != (item["id"], item["typed_at"], item["app"], item["typed"]):
+                return
+            if self.clock.monotonic() - item["typed_at"] > self.config["refine"].get("fix_within", 10.0):
+                return
+            # Only what was typed: the keymap may have skipped some of the draft
+            self.injector.erase(item["typed"])
+            typed = self.injector.type_text(text)
+            self.last_injection = (item["id"], self.clock.monotonic(), self.focused_app, typed)
 
     def cleanup(self):
         if os.path.exists(self.lock_file): os.remove(self.lock_file)
         self.shutdown_event.set()
+        self.scheduler.stop()
+        if self.refiner: self.refiner.stop()
         self.audio_thread.join(timeout=2)
 
-    def load_macros(self):
+    def load_config(self):
+        self.config = {}
         self.macros = {}
         try:
-            config_path = os.path.expanduser("~/.config/dex-dictate/config.json")
-            if os.path.exists(config_path):
-                with open(config_path, 'r') as f:
-                    config = json.load(f)
-                    self.macros = config.get("macros", {})
+            if os.path.exists(CONFIG_PATH):
+                with open(CONFIG_PATH, 'r') as f:
+                    self.config = json.load(f)
+                    self.macros = self.config.get("macros", {})
                     logger.info(f"Loaded {len(self.macros)} macros.")
         except Exception as e:
-            logger.error(f"Macro Load Error: {e}")
+            logger.error(f"Config Load Error: {e}")
+        self.profiles = profiles.available(self.config.get("profiles"))
+        self.profile = self.config.get("decode_profile", profiles.AUTO)
+        self.app_profiles = self.config.get("app_profiles", {})
+        self.vocabulary = vocabulary.Vocabulary(vocabulary.find(self.config, CONFIG_PATH))
+        self.corrector, self.corrector_key = None, None
+        self.spotter = None
+
+    def decode_options(self, duration):
+        """Profile for this utterance: the focused app's, else the selected one ("auto" goes by length)."""
+        name = self.app_profiles.get(self.focused_app, self.profile)
+        name, options = profiles.resolve(name, duration, self.profiles)
+        if self.admission:
+            self.admission.options(options)
+        return name, vocabulary.apply(options, self.vocabulary, getattr(self.models.model, "hf_tokenizer", None))
+
+    def correct(self, text):
+        """
+        Rewrite near-misses of vocabulary terms and macro triggers. The index is
+        rebuilt only when vocabulary.json or the macros change.
+        "correction": {"threshold": 0.82}, or false to turn it off.
+        """
+        settings = self.config.get("correction", {})
+        if settings is False:
+            return text, []
+        self.vocabulary.refresh()
+        key = (self.vocabulary.version, id(self.macros))
+        if key != self.corrector_key:
+            self.corrector = Corrector(self.vocabulary.terms + list(self.macros), settings.get("threshold", THRESHOLD))
+            self.corrector_key = key
+        return self.corrector.correct(text)
+
+    def command_spotter(self, duration):
+        """
+        The macro-trigger fast path for an utterance this short, or None.
+        "commands": {"max_seconds": 2.0, "threshold": 0.5, "margin": 0.7}, or false to turn it off.
+        """
+        settings = self.config.get("commands", {})
+        if settings is False or not self.macros or duration > settings.get("max_seconds", commands.COMMAND_SECONDS):
+            return None
+        if self.spotter is None:  # load_config() drops it when the macros change
+            self.spotter = commands.CommandSpotter(self.macros, settings.get("threshold", commands.THRESHOLD),
+                                                   settings.get("margin", commands.MARGIN))
+        return self.spotter
+
+    def set_profile(self, name):
+        if name != profiles.AUTO and name not in self.profiles:
+            return {"ok": False, "error": f"Unknown profile '{name}' (available: {', '.join([profiles.AUTO, *self.profiles])})"}
+        self.profile = name
+        logger.info(f"Decode profile: {name}")
+        return {"ok": True, "profile": name}
+
+    def new_recording(self):
+        return Recording(self.config.get("record_memory_seconds", 60.0))
+
+    def enqueue_frame(self, item):
+        """Capture callback. Never blocks the audio thread: a full queue drops the frame."""
+        try:
+            self.audio_q.put_nowait(item)
+        except queue.Full:
+            metrics.FRAMES_DROPPED.inc()
 
     def process_audio(self):
         logger.info("Daemon Ready. Waiting for audio...")
-        while True:
+        # The wake word runs here, so it shares the capture thread's core and priority
+        self.cpu.apply("audio")
+        while not self.shutdown_event.is_set():
             try:
                 # Non-blocking get with timeout to allow loop to breathe
                 try:
-                    pcm = self.audio_q.get(timeout=0.05)
+                    pcm, captured = self.audio_q.get(timeout=0.05)
                 except queue.Empty:
                     continue
-
-                # Optimize: Only calc energy if needed (LISTENING mode) or periodically
-                energy = 0.0
-                if self.mode == "LISTENING" or int(time.time() * 10) % 5 == 0:
-                     energy = np.sqrt(np.mean(pcm.astype(float)**2)) / 32768.0
-                
-                # Debug Energy occasionally
-                if int(time.time()) % 5 == 0 and int(time.time() * 10) % 10 == 0:
-                    logger.debug(f"Energy: {energy:.4f}")
-
-                if self.mode == "WAKE":
-                    idx = self.pp.process(pcm.flatten())
-                    if idx >= 0:
-                        logger.info("Wake Word Detected!")
-                        self.set_mode("LISTENING")
-                        self.play_sound("listening")
-
-                elif self.mode == "LISTENING":
-                    if energy > VAD_THRESHOLD:
-                        self.rec_buffer.append(pcm)
-                        self.silence_start = None
-                    else:
-                        if self.silence_start is None:
-                            self.silence_start = time.time()
-                        elif time.time() - self.silence_start > SILENCE_LIMIT:
-                            if len(self.rec_buffer) > 0:
-                                self.transcribe()
-                            else:
-                                self.set_mode("WAKE")
-                                self.play_sound("sleeping")
-
+                self.process_frame(pcm, captured)
             except Exception as e:
                 logger.error(f"Processing Error: {e}")
 
+    def process_frame(self, pcm, captured):
+        """Run one captured frame through the state machine."""
+        metrics.FRAMES_PROCESSED.inc()
+        if self.mode in ("LOADING", "ERROR"):
+            return
+
+        # Optimize: Only calc energy if needed (LISTENING mode) or periodically
+        energy = 0.0
+        now = self.clock.time()
+        if self.mode == "LISTENING" or int(now * 10) % 5 == 0:
+             energy = frame_energy(pcm)
+        
+        # Debug Energy occasionally
+        if int(now) % 5 == 0 and int(now * 10) % 10 == 0:
+            logger.debug(f"Energy: {energy:.4f}")
+
+        if self.mode in ("WAKE", "FOCUS", "MANUAL") and self.admission:
+            self.admission.check()
+
+        if self.mode == "FOCUS":
+            self.models.check_idle()
+            if self.rec_buffer:
+                # Focus went away mid-segment; decode what was said
+                self.end_segment()
+
+        elif self.mode == "WAKE":
+            self.models.check_idle()
+            idx = self.pp.process(pcm.flatten())
+            if idx >= 0:
+                logger.info("Wake Word Detected!")
+                metrics.WAKE_DETECTIONS.inc()
+                self.set_mode("LISTENING")
+                self.play_sound("listening")
+
+        elif self.mode == "LISTENING":
+            if energy > VAD_THRESHOLD:
+                if not self.rec_buffer:
+                    self.trace = UtteranceTrace(self.clock)
+                    self.trace.mark("speech_onset", captured)
+                    self.trace.info["xruns"] = metrics.AUDIO_OVERFLOWS.get()
+                    self.onset_focus = self.focus_serial
+                self.trace.mark("speech_end", captured + len(pcm) / SAMPLE_RATE)
+                self.rec_buffer.append(pcm)
+                self.silence_start = None
+            else:
+                if self.rec_buffer:
+                    # Pauses are recorded too and shortened by trim.trim() before decoding
+                    self.rec_buffer.append(pcm)
+                continuous = self.config_mode == "FOCUS"
+                if self.silence_start is None:
+                    self.silence_start = now
+                elif now - self.silence_start > (FOCUS_PAUSE if continuous else SILENCE_LIMIT):
+                    if continuous:
+                        # Keep listening while the field has focus; only the segment ends
+                        if self.rec_buffer:
+                            self.end_segment()
+                    elif self.rec_buffer:
+                        self.transcribe()
+                    else:
+                        self.set_mode("WAKE")
+                        self.play_sound("sleeping")
+
     def transcribe(self):
+        """End of a dictation: decode, inject, and wait for it before listening again."""
+        trace, recording = self.take_utterance()
         self.set_mode("PROCESSING")
         self.play_sound("done") # "I'm Done" Beep
         
-        audio_data = np.concatenate(self.rec_buffer).flatten().astype(np.float32) / 32768.0
-        self.rec_buffer = []
+        # Whatever fails below, the daemon must go back to its configured mode;
+        # otherwise it sits in PROCESSING and ignores the mic until restarted.
+        try:
+            job, time_map = self.submit_utterance(trace, recording)
+            delivered = self.deliver(trace, job, time_map)
+        except Exception as e:
+            logger.error(f"Transcription Error: {e}")
+            metrics.TRANSCRIBE_ERRORS.inc()
+            trace.info["error"] = repr(e)
+        else:
+            if delivered: self.play_sound("transcribed")
+        finally:
+            self.finish_trace(trace)
+            self.set_mode(self.config_mode)
+
+    def end_segment(self):
+        """
+        FOCUS mode: queue the segment that just ended for decoding and return at
+        once, so capture goes on while it decodes. deliver_segments() injects the
+        results in order.
+        """
+        trace, recording = self.take_utterance()
+        try:
+            job, time_map = self.submit_utterance(trace, recording)
+        except Exception as e:
+            logger.error(f"Transcription Error: {e}")
+            metrics.TRANSCRIBE_ERRORS.inc()
+            trace.info["error"] = repr(e)
+            self.finish_trace(trace)
+            return
+        self.segments.put((trace, job, time_map, self.onset_focus))
+
+    def deliver_segments(self):
+        while not self.shutdown_event.is_set():
+            try:
+                trace, job, time_map, serial = self.segments.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                self.deliver(trace, job, time_map, serial)
+            except Exception as e:
+                logger.error(f"Transcription Error: {e}")
+                metrics.TRANSCRIBE_ERRORS.inc()
+                trace.info["error"] = repr(e)
+            finally:
+                self.finish_trace(trace)
+
+    def take_utterance(self):
+        """The finished Recording, with its trace; a fresh one takes its place."""
+        trace = self.trace or UtteranceTrace(self.clock)
+        self.trace = None
+        trace.mark("endpoint")
+        metrics.UTTERANCES.inc()
+        recording, self.rec_buffer = self.rec_buffer, self.new_recording()
         self.silence_start = None
-        
-        segments, _ = self.whisper.transcribe(audio_data, beam_size=5)
-        text = " ".join([s.text for s in segments]).strip()
-        
+        return trace, recording
+
+    def submit_utterance(self, trace, recording):
+        """Queue the decode of a Recording. Returns (job, time map)."""
+        if recording.seconds > WINDOW_SECONDS:
+            # Decoded in windows, batched, when the job is waited on; its times are already the recording's
+            trace.info["profile"], options = self.decode_options(recording.seconds)
+            return WindowedJob(recording, lambda audios: self.submit_windows(trace, audios, options),
+                               self.clock), trim.TimeMap([])
+        audio_data = recording.to_float() if recording.spilled else pcm_to_float(recording.frames)
+        recording.clear()
+        audio_data, time_map = self.trim_audio(trace, audio_data)
+        duration = len(audio_data) / SAMPLE_RATE
+        trace.info["profile"], options = self.decode_options(duration)
+        spotter = self.command_spotter(duration)
+        return self.scheduler.submit("mic", audio_data, decode=spotter and spotter.decode, **options), time_map
+
+    def submit_windows(self, trace, audios, options):
+        trimmed = [self.trim_audio(trace, audio) for audio in audios]
+        jobs = self.scheduler.submit_many("mic", [audio for audio, _ in trimmed], **options)
+        return [(job, time_map) for job, (_, time_map) in zip(jobs, trimmed)]
+
+    def trim_audio(self, trace, audio_data):
+        recorded = len(audio_data) / SAMPLE_RATE
+        audio_data, time_map = trim.trim(audio_data, VAD_THRESHOLD, frame=FRAME_LENGTH)
+        trace.info["trimmed_seconds"] = round(trace.info.get("trimmed_seconds", 0.0) + recorded
+                                              - len(audio_data) / SAMPLE_RATE, 3)
+        return audio_data, time_map
+
+    def deliver(self, trace, job, time_map, focus_serial=None):
+        """
+        Wait for the decode, then run the macro or type the text. With a
+        `focus_serial` (FOCUS mode), text is only typed if the same field still
+        has focus; otherwise it goes to history only. Returns False if the
+        decode missed its deadline.
+        """
+        deadline = self.admission.deadline(job.duration) if self.admission else None
+        try:
+            text = job.wait(deadline)
+        except TimeoutError:
+            # Give the user the mic back; the text still lands in history when it's done
+            metrics.DEADLINE_MISSES.inc()
+            trace.info["deadline_missed"] = round(deadline, 2)
+            self.admission.missed(deadline, job.duration)
+            trace.info["action"] = "late"
+            logger.warning(f"Decode of {job.duration:.1f}s of audio missed its {deadline:.1f}s deadline; "
+                           "its text will go to history")
+            threading.Thread(target=self.deliver_late, args=(trace.id, job), daemon=True).start()
+            return False
+        trace.add_job(job)
+        if getattr(job, "command", None): trace.info["command"] = job.command
+        if self.admission and job.started is not None:
+            self.admission.observe(job.finished - job.started, job.duration)
+        trace.info["admission"] = self.admission.name if self.admission else None
+        # Segment times in the recording, not the trimmed audio
+        trace.info["segments"] = [[round(time_map.to_original(s.start), 2), round(time_map.to_original(s.end), 2)]
+                                  for s in job.segments]
+        if not text:
+            return True
+        text, corrections = self.correct(text)
+        if corrections: trace.info["corrections"] = corrections
+        logger.info(f"Transcribed: {text}")
+        self.last_text = text
+
+        # Macro Check
+        cmd = match_macro(text, self.macros)
+        trace.mark("macro_match")
+        if cmd is not None:
+            logger.info(f"Executing Macro: {cmd}")
+            backends.spawn(cmd, shell=True)
+            metrics.MACRO_EXECUTIONS.inc()
+            trace.info["action"] = "macro"
+        elif focus_serial is not None and focus_serial != self.focus_serial:
+            logger.info("Focus moved since this segment was spoken; not typing it")
+            trace.info["action"] = "unfocused"
+        else:
+            with self.inject_lock:
+                typed = self.injector.type_text(text)
+                self.last_injection = (trace.id, self.clock.monotonic(), self.focused_app, typed)
+            trace.info["action"] = "typed"
+        trace.mark("injection_end")
+        typing_time = trace.stamps["injection_end"] - trace.stamps["macro_match"]
+        if trace.info["action"] == "typed" and typing_time > 0:
+            metrics.INJECTION_CPS.observe(len(text) / typing_time)
+        trace.info["chars"] = len(text)
+        self.history.add(text, id=trace.id)
+        if self.refiner and trace.info["action"] == "typed" and job.audio is not None:
+            typed_at, app, typed = self.last_injection[1:]
+            self.refiner.submit({"id": trace.id, "audio": job.audio, "draft": text,
+                                 "typed_at": typed_at, "app": app, "typed": typed})
+        return True
+
+    def deliver_late(self, utterance_id, job):
+        try:
+            text = job.wait()
+        except Exception as e:
+            logger.error(f"Late decode failed: {e}")
+            return
         if text:
-            logger.info(f"Transcribed: {text}")
-            self.last_text = text
-            
-            # Macro Check
-            lower_text = text.lower().strip().rstrip('.').rstrip('!')
-            if lower_text in self.macros:
-                cmd = self.macros[lower_text]
-                logger.info(f"Executing Macro: {cmd}")
-                subprocess.Popen(cmd, shell=True)
-            else:
-                type_text(text)
-        
-        self.set_mode(self.config_mode)
-        self.play_sound("transcribed")
+            text, _ = self.correct(text)
+            logger.info(f"Transcribed after its deadline (history only): {text}")
+            self.history.add(text, id=utterance_id, late=True)
+
+    def finish_trace(self, trace):
+        # Overflows between speech onset and injection, i.e. including the decode
+        trace.info["xruns"] = metrics.AUDIO_OVERFLOWS.get() - trace.info.get("xruns", metrics.AUDIO_OVERFLOWS.get())
+        self.traces.add(trace)
 
     def reset_state(self, keep_config=False):
         """Clean State Machine Reset"""
@@ -242,14 +697,25 @@ class DexDaemon:
         self.mode = "WAKE"
         if not keep_config:
             self.config_mode = "WAKE"
-        self.rec_buffer = []
+        self.rec_buffer.clear()
         self.silence_start = None
+        self.trace = None
         self.send_ipc_update()
         self.play_sound("sleeping")
         if not keep_config:
             self.play_sound("reset") # Hard reset sound
 
     def set_mode(self, mode):
+        # Until the models are loaded only the configured mode can change
+        if not self.ready.is_set():
+            if mode in ["WAKE", "MANUAL", "FOCUS"]:
+                self.config_mode = mode
+            logger.info(f"Still loading; will start in {self.config_mode}")
+            self.send_ipc_update()
+            return
+        if mode == "LISTENING":
+            # Reload an idle-unloaded model while the user is still talking
+            self.models.wake()
         # If setting a primary mode, update config_mode
         if mode in ["WAKE", "MANUAL", "FOCUS"]:
             self.config_mode = mode
@@ -263,25 +729,14 @@ class DexDaemon:
         # self.play_sound("sleeping") # Removed, sounds are now handled more explicitly
 
     def play_sound(self, sound_type):
-        # New Audio Protocol: High (Ready), Low (Done), Mid (Transcribed)
-        # Using generated simple sine waves for clarity
-        base_path = "/home/andrew-dolby/DAO_Linux_Workspace/dex-dictate-v3-repo/assets/sounds"
-        sounds = {
-            "listening": os.path.join(base_path, "high_beep.wav"), # High Beep (Ready)
-            "done": os.path.join(base_path, "low_beep.wav"), # Low Beep (Done Listening)
-            "transcribed": os.path.join(base_path, "low_beep.wav"), # Low Beep (Done/Transcribed) - Keep simple
-            "reset": os.path.join(base_path, "reset_beep.wav") # Reset/Sleep
-        }
-        path = sounds.get(sound_type)
-        if path and os.path.exists(path):
-            subprocess.Popen(['paplay', path], stderr=subprocess.DEVNULL)
+        self.sound.play(sound_type)
 
     def ipc_loop(self):
         if os.path.exists(SOCK_FILE): os.remove(SOCK_FILE)
         server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         server.bind(SOCK_FILE)
         server.listen(1)
-        logger.info(f"IPC Listening on {SOCK_FILE}")
+        logger.info(f"IPC Listening on {SOCK_FILE} (time-to-socket {time.monotonic() - self.started:.2f}s)")
         
         while True:
             conn, _ = server.accept()
@@ -290,6 +745,7 @@ class DexDaemon:
                 if not data: continue
                 
                 cmd = json.loads(data)
+                metrics.IPC_REQUESTS.inc(1, cmd.get('cmd'))
                 if cmd['cmd'] == "SET_MODE":
                     self.set_mode(cmd['mode'])
                 elif cmd['cmd'] == "GET_STATUS":
@@ -313,17 +769,38 @@ class DexDaemon:
                 elif cmd['cmd'] == "FOCUS_STATE": # New command for focus events
                     pass # self.handle_focus(cmd['state'])
                 elif cmd['cmd'] == "FOCUS_GAINED":
-                    pass # self.handle_focus("GAINED")
+                    self.focused_app = cmd.get('app')
+                    self.focus_serial += 1
+                    self.handle_focus("GAINED")
                 elif cmd['cmd'] == "FOCUS_LOST":
-                    pass
-                    # On focus lost, we don't just set mode, we ensure a clean reset if we were listening
-                    # if self.mode == "LISTENING":
-                    #     # Soft reset: Stop listening, but keep FOCUS config if active
-                    #     self.reset_state(keep_config=(self.config_mode == "FOCUS"))
-                    #     if self.config_mode == "FOCUS":
-                    #          self.set_mode("FOCUS") # Explicitly set back to FOCUS state
-                    # else:
-                    #     self.handle_focus("LOST")
+                    self.focused_app = None
+                    self.focus_serial += 1
+                    self.handle_focus("LOST")
+                elif cmd['cmd'] == "GET_TRACES":
+                    conn.sendall(json.dumps(self.traces.recent(cmd.get('limit'))).encode())
+                elif cmd['cmd'] == "RELOAD_CONFIG":
+                    self.load_config()
+                    self.traces.path = self.config.get("trace_file")
+                elif cmd['cmd'] == "PROFILE_START":
+                    conn.send(json.dumps(self.profilers.start_sampling(cmd.get('rate', 100))).encode())
+                elif cmd['cmd'] == "PROFILE_STOP":
+                    conn.send(json.dumps(self.profilers.stop_sampling()).encode())
+                elif cmd['cmd'] == "MEMTRACE_START":
+                    conn.send(json.dumps(self.profilers.start_memory(cmd.get('frames', 10))).encode())
+                elif cmd['cmd'] == "MEMTRACE_STOP":
+                    conn.send(json.dumps(self.profilers.stop_memory()).encode())
+                elif cmd['cmd'] == "SET_PROFILE":
+                    conn.send(json.dumps(self.set_profile(cmd['profile'])).encode())
+                elif cmd['cmd'] == "SET_MODEL":
+                    conn.send(json.dumps(self.set_model(cmd['model'])).encode())
+                elif cmd['cmd'] == "GET_SCHEDULING":
+                    conn.send(json.dumps(dict(self.cpu.status(), xruns=metrics.AUDIO_OVERFLOWS.get(),
+                                              frames_dropped=metrics.FRAMES_DROPPED.get())).encode())
+                elif cmd['cmd'] == "CALIBRATE":
+                    # Every model size, downloading what's missing; minutes of CPU
+                    threading.Thread(target=self.first_run_calibration, args=(False,), daemon=True).start()
+                elif cmd['cmd'] == "GET_BATCH_STATS":
+                    conn.send(json.dumps(self.scheduler.stats()).encode())
                 elif cmd['cmd'] == "STOP":
                     logger.info("Received STOP command. Shutting down...")
                     self.cleanup()
@@ -334,30 +811,71 @@ class DexDaemon:
                 conn.close()
 
     def handle_focus(self, state):
-        # Only act if user selected FOCUS mode
-        # NIGHTTIME STABILIZATION: FOCUS MODE DISABLED
-        pass
-        # if getattr(self, 'config_mode', 'WAKE') == "FOCUS":
-        #     if state == "GAINED":
-        #         logger.info("Focus Gained -> LISTENING")
-        #         self.set_mode("LISTENING")
-        #         self.play_sound("listening")
-        #     elif state == "LOST":
-        #         logger.info("Focus Lost -> FOCUS (Idle)")
-        #         self.set_mode("FOCUS")
-        #         self.play_sound("sleeping")
+        """FOCUS mode: listen continuously while a text field has focus."""
+        if self.config_mode != "FOCUS" or not self.ready.is_set():
+            return
+        if state == "GAINED" and self.mode == "FOCUS":
+            logger.info("Focus Gained -> LISTENING")
+            self.set_mode("LISTENING")
+            self.play_sound("listening")
+        elif state == "LOST" and self.mode == "LISTENING":
+            # The audio thread decodes any half-finished segment when it sees FOCUS
+            logger.info("Focus Lost -> FOCUS (Idle)")
+            self.set_mode("FOCUS")
+            self.play_sound("sleeping")
 
-    def send_ipc_update(self, conn=None):
-        msg = json.dumps({
+    def status_message(self):
+        return json.dumps({
             "status": self.mode,
             "config_mode": getattr(self, 'config_mode', 'WAKE'),
-            "last_text": getattr(self, 'last_text', "")
+            "last_text": getattr(self, 'last_text', ""),
+            "profile": self.profile,
+            "refined_id": self.refined_id,
+            **(self.admission.status() if self.admission else {}),
+            **self.models.status(),
         }).encode()
+
+    def send_ipc_update(self, conn=None):
+        msg = self.status_message()
         if conn:
             conn.send(msg)
         else:
             pass
 
-if __name__ == "__main__":
-    daemon = DexDaemon()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dex Dictate daemon")
+    parser.add_argument("--simulate", action="store_true",
+                        help="Run headless on in-memory backends (no mic, uinput, Porcupine or Whisper)")
+    parser.add_argument("--backend", action="append", default=[], metavar="KIND=NAME",
+                        help=f"Override one backend; kinds: {', '.join(backends.KINDS)}")
+    parser.add_argument("--sim-clock", action="store_true", help="Run on virtual time (with --simulate)")
+    parser.add_argument("--sim-audio", help="WAV file for the sim capture backend")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="Benchmark Whisper setups on this CPU, cache the best one and exit")
+    parser.add_argument("--target-rtf", type=float, default=calibration.TARGET_RTF,
+                        help="Slowest acceptable decode time per second of audio (with --calibrate)")
+    parser.add_argument("--clip", default=calibration.CLIP_PATH, help="16 kHz mono WAV to calibrate on")
+    parser.add_argument("--watch", metavar="DIR", help="Also transcribe audio files dropped into DIR")
+    args = parser.parse_args(argv)
+
+    if args.calibrate:
+        clip = calibration.load_clip(args.clip)
+        if clip is None:
+            logger.warning(f"{args.clip} not found; timing on synthetic audio")
+            clip = calibration.synthetic_clip()
+        factory = lambda **settings: backends.create("asr", "whisper", device="cpu", **settings)
+        result = calibration.calibrate(factory, clip, args.target_rtf, progress=lambda r: print(json.dumps(r)))
+        if not result["choice"]:
+            sys.exit("Calibration failed: no setup could be measured")
+        calibration.save(result)
+        print(f"{calibration.cpu_key()}: {json.dumps(result['choice'])}")
+        return
+
+    overrides = dict(item.split("=", 1) for item in args.backend)
+    sim_options = {"audio": args.sim_audio} if args.sim_audio else None
+    daemon = DexDaemon(simulate=args.simulate, backends_override=overrides,
+                       clock=SimClock() if args.sim_clock else None, sim_options=sim_options, watch_folder=args.watch)
     daemon.process_audio()
+
+if __name__ == "__main__":
+    main()
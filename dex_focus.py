@@ -40,7 +40,7 @@ def on_focus_changed(event):
         
         if role in TEXT_ROLES:
             print(f"Focused: {acc.get_name()} ({role})")
-            send_cmd("FOCUS_GAINED")
+            send_cmd("FOCUS_GAINED", app=app_name(acc))
         else:
             print(f"Focus Lost: {acc.get_name()} ({role})")
             send_cmd("FOCUS_LOST")
@@ -48,12 +48,21 @@ def on_focus_changed(event):
     except Exception as e:
         print(f"Focus Error: {e}")
 
-def send_cmd(cmd, mode=None):
+def app_name(acc):
+    # Lets the daemon pick a per-application decode profile
+    try:
+        app = acc.get_application()
+        return app.get_name() if app else None
+    except:
+        return None
+
+def send_cmd(cmd, mode=None, app=None):
     try:
         client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         client.connect(SOCK_FILE)
         msg = {"cmd": cmd}
         if mode: msg["mode"] = mode
+        if app: msg["app"] = app
         client.send(json.dumps(msg).encode())
         client.close()
     except: pass
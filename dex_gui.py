@@ -171,6 +171,20 @@ class DexGUI:
         except Exception as e:
             return None
 
+    def get_status(self):
+        """The daemon's GET_STATUS reply as a dict, or None if it doesn't answer."""
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.settimeout(1.0)
+                client.connect(SOCK_PATH)
+                client.sendall(json.dumps({"cmd": "GET_STATUS"}).encode())
+                chunks = []
+                while chunk := client.recv(4096):
+                    chunks.append(chunk)
+            return json.loads(b"".join(chunks).decode())
+        except Exception:
+            return None
+
     def set_mode(self):
         mode = self.mode_var.get()
         self.log(f"Setting Mode: {mode}")
@@ -203,20 +217,25 @@ class DexGUI:
         
         # Aggressive Connect Logic
         while not self.stop_event.is_set():
-            resp = self.send_cmd("PING")
+            resp = self.get_status()
             
-            if resp and resp.startswith("PONG"):
+            if resp:
                 if not self.connected:
                     self.connected = True
                     self.log("✅ Daemon Connected!")
                     # Sync initial state
                     self.set_mode()
                 
-                # Parse Status (PONG:REC or PONG:IDLE)
-                parts = resp.split(":")
-                status = parts[1] if len(parts) > 1 else "IDLE"
+                # Daemon mode; LOADING and ERROR mean it is up, so no restart
+                status = resp.get("status", "IDLE")
                 
-                if status == "REC":
+                if status == "LOADING":
+                    self.recording = False
+                    self.root.after(0, self.set_led, STATUS_YELLOW)
+                elif status == "ERROR":
+                    self.recording = False
+                    self.root.after(0, self.set_led, STATUS_RED)
+                elif status == "LISTENING":
                     self.recording = True
                     # Flash Effect
                     cur_col = self.status_canvas.itemcget(self.led, "fill")
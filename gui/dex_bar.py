@@ -131,6 +131,9 @@ class DexBar(QWidget):
             if extra == "REC":
                 text = "RECORDING"
                 color = "#FF4444"
+            elif extra in ("LOADING", "ERROR"):
+                text = Strings.STATUS_LOADING if extra == "LOADING" else extra
+                color = "#FFAA00" if extra == "LOADING" else "#FF0000"
             else:
                 text = "IDLE"
                 color = self.state_manager.get_config("accent", "#00C8FF")
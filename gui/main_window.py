@@ -333,7 +333,9 @@ class MainWindow(QMainWindow):
                     color = self.current_accent
                     if hasattr(self, 'topbar'):
                         # Only show IDLE if not processing
-                        if getattr(self, 'last_asr_state', 'idle') in ['idle', 'listening', 'silence']:
+                        if extra in ("LOADING", "ERROR"):
+                            self.topbar.update_status(Strings.STATUS_LOADING if extra == "LOADING" else extra, color)
+                        elif extra != "PROCESSING":
                             self.topbar.update_status(Strings.STATUS_IDLE, color)
                     self.tray_icon.setIcon(QIcon.fromTheme("audio-input-microphone"))
                 
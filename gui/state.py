@@ -5,6 +5,24 @@ import socket
 
 SOCK_FILE = f"/run/user/{os.getuid()}/dex3.sock"
 
+
+def query_daemon(cmd="GET_STATUS", timeout=0.5, sock_path=SOCK_FILE):
+    """Send one JSON command and return the JSON reply, read until the daemon closes the connection."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(sock_path)
+        client.sendall(json.dumps({"cmd": cmd}).encode())
+        chunks = []
+        while chunk := client.recv(4096):
+            chunks.append(chunk)
+    return json.loads(b"".join(chunks).decode())
+
+
+def status_extra(mode):
+    """The daemon's mode as the widgets show it: "REC" while listening, otherwise the mode itself (LOADING, ERROR...)."""
+    return "REC" if mode == "LISTENING" else mode
+
+
 class StateManager(QObject):
     # Signals
     status_changed = Signal(str, str) # state, extra
@@ -40,16 +58,10 @@ class StateManager(QObject):
 
     def poll_daemon(self):
         try:
-            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            client.settimeout(0.05)
-            client.connect(SOCK_FILE)
-            client.send(json.dumps({"cmd": "GET_STATUS"}).encode())
-            data = client.recv(1024).decode()
-            client.close()
-            
-            if data:
-                resp = json.loads(data)
-                self.set_status("CONNECTED", resp.get("status", "IDLE"))
+            resp = query_daemon("GET_STATUS", timeout=0.2)
+            if resp:
+                # LOADING and ERROR come through here too: the daemon answers while models load
+                self.set_status("CONNECTED", status_extra(resp.get("status", "IDLE")))
                 
                 # Sync Mode (User Preference)
                 config_mode = resp.get("config_mode", "WAKE")
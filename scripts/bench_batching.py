@@ -0,0 +1,32 @@
+import os
+import sys
+import json
+import wave
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from daemon.batching import measure_throughput, SAMPLE_RATE
+
+# Usage: python scripts/bench_batching.py [model] clip1.wav clip2.wav ...
+# Clips must be 16 kHz mono 16-bit, the same format the daemon records.
+
+def load_wav(path):
+    with wave.open(path, 'rb') as wav_file:
+        if wav_file.getframerate() != SAMPLE_RATE or wav_file.getnchannels() != 1 or wav_file.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16 kHz mono int16")
+        pcm = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+    return pcm.astype(np.float32) / 32768.0
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    model_size = "tiny.en"
+    if args and not args[0].endswith(".wav"):
+        model_size = args.pop(0)
+    if not args:
+        print("Usage: bench_batching.py [model] clip.wav ...")
+        sys.exit(1)
+
+    from faster_whisper import WhisperModel
+    model = WhisperModel(model_size, device="cpu", compute_type="int8", cpu_threads=4)
+    clips = [load_wav(p) for p in args]
+    print(json.dumps(measure_throughput(model, clips, beam_size=5), indent=2))
@@ -40,6 +40,7 @@ class Strings:
     STATUS_CONNECTED = "CONNECTED"
     STATUS_THINKING = "THINKING"
     STATUS_WRITING = "WRITING"
+    STATUS_LOADING = "LOADING MODELS"
     
     # --- HEADERS ---
     HDR_OP_MODE = "OPERATION MODE"
@@ -0,0 +1,132 @@
+import unittest
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+from unittest import mock
+import numpy as np
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.clock import SimClock
+from daemon import admission, metrics
+
+
+class TestAdmission(unittest.TestCase):
+    def test_steps_down_over_budget_and_back_when_fast(self):
+        clock, changes = SimClock(), []
+        downs = metrics.ADMISSION_SWITCHES.get("down")
+        controller = admission.AdmissionController(budget=0.5, hold=30.0, clock=clock,
+                                                   on_change=lambda previous, level: changes.append(level))
+        options = {"beam_size": 5, "best_of": 5, "temperature": [0.0, 0.2]}
+        controller.observe(0.3, 1.0)
+        controller.observe(0.9, 1.0)  # rolling 0.6: over budget
+        self.assertEqual(controller.name, "greedy")
+        self.assertEqual(controller.options(dict(options))["beam_size"], 1)
+        controller.missed(2.0, 1.0)
+        self.assertEqual(controller.name, "smaller")
+        controller.missed(2.0, 1.0)  # nothing below the smallest level
+        self.assertEqual(metrics.ADMISSION_SWITCHES.get("down"), downs + 2)
+
+        # Fast again, but not for long enough yet
+        controller.observe(0.1, 1.0)
+        controller.observe(0.1, 1.0)
+        self.assertEqual(controller.name, "smaller")
+        clock.advance(30.0)
+        controller.observe(0.1, 1.0)
+        self.assertEqual(controller.name, "greedy")
+        clock.advance(30.0)
+        controller.observe(0.1, 1.0)
+        controller.observe(0.1, 1.0)
+        self.assertEqual(changes, ["greedy", "smaller", "greedy", "normal"])
+        self.assertEqual(controller.options(dict(options)), options)
+        self.assertEqual(admission.smaller_model("small.en"), "base.en")
+        self.assertIsNone(admission.smaller_model("tiny.en"))
+
+    def test_idle_check_from_a_pinned_thread_uses_every_core(self):
+        clock = SimClock()
+        controller = admission.AdmissionController(hold=30.0, clock=clock)
+        controller.missed(2.0, 1.0)
+        clock.advance(30.0)
+
+        def check():
+            # As on the audio thread with cpu_scheduling on
+            try:
+                os.sched_setaffinity(0, [min(os.sched_getaffinity(0))])
+            except (OSError, AttributeError):
+                pass
+            controller.check()
+
+        # Load 2 on 4 cores is quiet, though it would be busy for the one core the thread runs on
+        with mock.patch("daemon.refine.ALL_CORES", [0, 1, 2, 3]), mock.patch("os.getloadavg", return_value=(2.0, 2.0, 2.0)):
+            thread = threading.Thread(target=check)
+            thread.start()
+            thread.join()
+        self.assertEqual(controller.name, "normal")
+
+    def test_deadline_gives_the_mic_back(self):
+        import dex_daemon
+        misses, errors = metrics.DEADLINE_MISSES.get(), metrics.TRANSCRIBE_ERRORS.get()
+        with tempfile.TemporaryDirectory() as tmp, dex_daemon.runtime_paths(tmp):
+            with open(dex_daemon.CONFIG_PATH, 'w') as f:
+                json.dump({"admission": {"deadline": 0.1, "deadline_rtf": 0.0}}, f)
+            # Real time: each second of audio takes half a second to "decode"
+            daemon = dex_daemon.DexDaemon(simulate=True, sim_options={"transcripts": ["slow going"], "rtf": 0.5})
+            try:
+                self.assertTrue(daemon.ready.wait(timeout=5))
+                daemon.set_mode("LISTENING")
+                pcm = (np.random.default_rng(0).standard_normal(16000) * 6000).astype(np.int16)
+                started = time.monotonic()
+                daemon.rec_buffer.append(pcm.reshape(-1, 1))
+                daemon.transcribe()
+                waited = time.monotonic() - started
+                for _ in range(200):
+                    if daemon.history._load(): break
+                    time.sleep(0.01)
+                history = daemon.history._load()
+                status = json.loads(daemon.status_message())
+            finally:
+                daemon.cleanup()
+        self.assertLess(waited, 0.45)
+        self.assertEqual(daemon.mode, "WAKE")
+        self.assertEqual(daemon.injector.typed, [])
+        self.assertEqual(metrics.DEADLINE_MISSES.get(), misses + 1)
+        self.assertEqual(metrics.TRANSCRIBE_ERRORS.get(), errors)  # a miss is not an error
+        self.assertEqual(daemon.traces.recent()[-1]["deadline_missed"], 0.1)
+        self.assertNotIn("error", daemon.traces.recent()[-1])
+        self.assertEqual(history[0]["text"], "slow going")
+        self.assertTrue(history[0]["late"])
+        # tiny.en has nothing smaller, so greedy is as far down as it goes
+        self.assertEqual(status["admission"], "greedy")
+
+
+    def test_long_dictation_that_misses_its_deadline_reaches_history(self):
+        import dex_daemon
+        with tempfile.TemporaryDirectory() as tmp, dex_daemon.runtime_paths(tmp):
+            with open(dex_daemon.CONFIG_PATH, 'w') as f:
+                json.dump({"admission": {"deadline": 0.05, "deadline_rtf": 0.0}}, f)
+            daemon = dex_daemon.DexDaemon(simulate=True, sim_options={"transcripts": ["first half", "second half"],
+                                                                      "rtf": 0.01})
+            try:
+                self.assertTrue(daemon.ready.wait(timeout=5))
+                daemon.set_mode("LISTENING")
+                # Longer than one window, so it is decoded as a WindowedJob
+                pcm = (np.random.default_rng(0).standard_normal(35 * 16000) * 6000).astype(np.int16)
+                daemon.rec_buffer.append(pcm.reshape(-1, 1))
+                daemon.transcribe()
+                for _ in range(300):
+                    if daemon.history._load(): break
+                    time.sleep(0.01)
+                history = daemon.history._load()
+            finally:
+                daemon.cleanup()
+        self.assertEqual(daemon.traces.recent()[-1]["action"], "late")
+        self.assertEqual(history[0]["text"], "first half second half")
+        self.assertTrue(history[0]["late"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import sys
+import os
+import json
+import wave
+import tempfile
+import numpy as np
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import dex_batch
+
+
+def write_wav(path, seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    pcm = np.concatenate([np.zeros(8000, np.int16), (rng.standard_normal(int(seconds * 16000)) * 3000).astype(np.int16)])
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(pcm.tobytes())
+
+
+class TestBatch(unittest.TestCase):
+    def test_pool_streams_jsonl_and_resumes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            memos = os.path.join(tmp, "memos")
+            os.makedirs(os.path.join(memos, "older"))
+            for n, name in enumerate(["a.wav", "b.wav", "older/c.wav"]):
+                write_wav(os.path.join(memos, name), 1.0 + n, seed=n)
+            out = os.path.join(tmp, "out.jsonl")
+            files = dex_batch.find_files([memos])
+            self.assertEqual([os.path.basename(f) for f in files], ["a.wav", "b.wav", "c.wav"])
+            settings = {"config": {}, "asr": "sim", "transcripts": ["the star silk rises"], "repeat": True}
+
+            totals = dex_batch.run(files[:2], out, 2, settings)
+            self.assertEqual((totals["transcribed"], totals["skipped"]), (2, 0))
+            # Interrupted after two files: the rerun only does the third
+            totals = dex_batch.run(files, out, 2, settings)
+            self.assertEqual((totals["transcribed"], totals["skipped"]), (1, 2))
+            self.assertGreater(totals["throughput"], 0)
+
+            with open(out) as f:
+                results = [json.loads(line) for line in f]
+        self.assertEqual(sorted(r["path"] for r in results), files)
+        # Same trimming and correction as live dictation
+        self.assertEqual(results[0]["text"], "the Starsilk rises")
+        self.assertGreaterEqual(results[0]["trimmed_seconds"], 0.3)
+
+
+if __name__ == '__main__':
+    unittest.main()
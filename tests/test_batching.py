@@ -0,0 +1,126 @@
+import unittest
+import sys
+import os
+import time
+import numpy as np
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.batching import BatchScheduler
+
+
+class FakeSegment:
+    def __init__(self, text):
+        self.text = text
+
+
+class TestBatchScheduler(unittest.TestCase):
+    def make_scheduler(self, **kwargs):
+        scheduler = BatchScheduler(lambda: None, **kwargs)
+        batches = []
+        # Record batch composition instead of running Whisper
+        def record(batch):
+            batches.append([job.session for job in batch])
+            for job in batch:
+                job.add_segment(FakeSegment(str(len(job.audio))))
+                job.finish()
+        scheduler._decode = record
+        return scheduler, batches
+
+    def test_single_session_skips_window(self):
+        scheduler, _ = self.make_scheduler(window=5.0)
+        scheduler.register("mic")
+        scheduler.start()
+        try:
+            t0 = time.monotonic()
+            text = scheduler.submit("mic", np.zeros(1600, dtype=np.float32)).wait(timeout=2)
+            self.assertEqual(text, "1600")
+            self.assertLess(time.monotonic() - t0, 1.0)
+        finally:
+            scheduler.stop()
+
+    def test_round_robin_across_sessions(self):
+        scheduler, batches = self.make_scheduler(window=0.01, max_batch=2)
+        for name in ("a", "b"):
+            scheduler.register(name)
+        # A busy session queues three jobs before the quiet one submits
+        jobs = [scheduler.submit("a", np.zeros(1600, dtype=np.float32)) for _ in range(3)]
+        jobs.append(scheduler.submit("b", np.zeros(1600, dtype=np.float32)))
+        scheduler.start()
+        try:
+            for job in jobs:
+                job.wait(timeout=2)
+        finally:
+            scheduler.stop()
+        self.assertEqual(batches[0], ["a", "b"])
+
+    def test_submit_many_goes_out_as_one_batch(self):
+        scheduler, batches = self.make_scheduler()
+        scheduler.register("mic")
+        scheduler.start()
+        try:
+            jobs = scheduler.submit_many("mic", [np.zeros(n, dtype=np.float32) for n in (1600, 3200, 4800)])
+            self.assertEqual([job.wait(timeout=2) for job in jobs], ["1600", "3200", "4800"])
+        finally:
+            scheduler.stop()
+        self.assertEqual(batches, [["mic", "mic", "mic"]])
+
+    def test_low_priority_session_waits_for_higher(self):
+        scheduler, batches = self.make_scheduler(window=0.01)
+        scheduler.register("mic")
+        scheduler.register("watch", priority=-1)
+        jobs = [scheduler.submit("watch", np.zeros(1600, dtype=np.float32)) for _ in range(2)]
+        jobs.append(scheduler.submit("mic", np.zeros(1600, dtype=np.float32)))
+        scheduler.start()
+        try:
+            for job in jobs:
+                job.wait(timeout=2)
+        finally:
+            scheduler.stop()
+        self.assertEqual(batches, [["mic"], ["watch", "watch"]])
+
+    def test_mismatched_options_not_batched(self):
+        scheduler, batches = self.make_scheduler(window=0.01)
+        for name in ("a", "b"):
+            scheduler.register(name)
+        jobs = [scheduler.submit("a", np.zeros(1600, dtype=np.float32), beam_size=1),
+                scheduler.submit("b", np.zeros(1600, dtype=np.float32), beam_size=5)]
+        scheduler.start()
+        try:
+            for job in jobs:
+                job.wait(timeout=2)
+        finally:
+            scheduler.stop()
+        self.assertEqual(batches, [["a"], ["b"]])
+
+    def test_unregister_fails_pending_jobs(self):
+        scheduler, _ = self.make_scheduler()
+        scheduler.register("replay")
+        job = scheduler.submit("replay", np.zeros(1600, dtype=np.float32))
+        scheduler.unregister("replay")
+        with self.assertRaises(RuntimeError):
+            job.wait(timeout=1)
+
+    def test_batched_segments_are_in_each_jobs_time(self):
+        from faster_whisper.transcribe import Segment
+        from daemon.batching import DecodeJob, decode_batched
+
+        class FakePipeline:
+            model = type("Model", (), {"frames_per_second": 100})()
+
+            def transcribe(self, audio, clip_timestamps, batch_size, **options):
+                # Times in the concatenated audio, as BatchedInferencePipeline reports them
+                return iter([Segment(n, int(int(c["start"] * 16000) / 16000 * 100), c["start"] + 0.25, c["end"],
+                                     f"clip {n}", [], 0.0, 1.0, 0.0, None, 0.0)
+                             for n, c in enumerate(clip_timestamps)]), None
+
+        jobs = [DecodeJob(f"s{n}", np.zeros(int(seconds * 16000), dtype=np.float32), {})
+                for n, seconds in enumerate([2.0, 3.0, 1.5])]
+        decode_batched(FakePipeline(), jobs)
+        self.assertEqual([j.text for j in jobs], ["clip 0", "clip 1", "clip 2"])
+        self.assertEqual([(j.segments[0].start, j.segments[0].end) for j in jobs],
+                         [(0.25, 2.0), (0.25, 3.0), (0.25, 1.5)])
+
+if __name__ == '__main__':
+    unittest.main()
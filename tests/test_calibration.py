@@ -0,0 +1,71 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon import calibration
+
+# Decode cost per audio second by (model size, compute type), at one thread
+COST = {("tiny.en", "int8"): 0.01, ("tiny.en", "float32"): 0.03,
+        ("base.en", "int8"): 0.02, ("base.en", "float32"): 0.08,
+        ("small.en", "int8"): 0.1}
+
+
+class TimedModel:
+    def __init__(self, model_size, compute_type, cpu_threads):
+        self.cost = COST[(model_size, compute_type)] / min(cpu_threads, 2)
+
+    def transcribe(self, audio, **options):
+        time.sleep(len(audio) / 16000 * self.cost)
+        return iter([]), None
+
+
+class TestCalibration(unittest.TestCase):
+    def setUp(self):
+        self.built = []
+
+    def factory(self, **settings):
+        self.built.append((settings["model_size"], settings["compute_type"]))
+        return TimedModel(**settings)
+
+    def test_picks_most_accurate_setup_under_target(self):
+        result = calibration.calibrate(self.factory, np.zeros(16000, dtype=np.float32), target_rtf=0.025,
+                                       threads=[1, 2])
+        choice = result["choice"]
+        self.assertEqual((choice["model_size"], choice["compute_type"], choice["cpu_threads"]), ("base.en", "int8", 2))
+        # small.en int8 misses the target, so its costlier compute types are never tried
+        self.assertNotIn(("small.en", "float32"), self.built)
+
+    def test_cache_is_keyed_by_cpu(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "calibration.json")
+            self.assertIsNone(calibration.cached_choice("cpu-a", path))
+            calibration.save({"choice": {"model_size": "base.en"}}, "cpu-a", path)
+            self.assertEqual(calibration.cached_choice("cpu-a", path), {"model_size": "base.en"})
+            self.assertIsNone(calibration.cached_choice("cpu-b", path))
+
+    def test_key_ignores_thread_pinning(self):
+        import threading
+        from daemon.scheduling import ALL_CORES, release
+        keys = []
+
+        def pinned():
+            # As first_run_calibration runs: on the decode cores only
+            os.sched_setaffinity(0, ALL_CORES[:1])
+            try:
+                keys.append(calibration.cpu_key())
+            finally:
+                release()
+
+        thread = threading.Thread(target=pinned)
+        thread.start()
+        thread.join()
+        self.assertEqual(keys, [calibration.cpu_key()])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import sys
+import os
+import time
+import numpy as np
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon import commands, metrics
+from daemon.batching import BatchScheduler
+
+
+class FakeTokenizer:
+    """One id per character; special tokens above them."""
+
+    def encode(self, text, add_special_tokens=False):
+        return type("Encoding", (), {"ids": [ord(c) for c in text]})()
+
+    def token_to_id(self, token):
+        return 60000 + len(token)
+
+
+class FakeAligner:
+    is_multilingual = False
+
+    def __init__(self, spoken):
+        self.spoken = spoken
+        self.calls = 0
+
+    def align(self, features, start, text_tokens, num_frames):
+        self.calls += 1
+        results = []
+        for ids in text_tokens:
+            text = "".join(chr(i) for i in ids if i < 60000).strip().rstrip(".").lower()
+            # Probable only for what was said, and a little for anything sharing its first word
+            p = 0.9 if text == self.spoken else 0.3 if text.split()[0] == self.spoken.split()[0] else 0.01
+            # Like align(), which scores the end of text it appends as well
+            results.append(type("Result", (), {"text_token_probs": [p] * (len(ids) + 1)})())
+        return results
+
+
+class FakeWhisper:
+    """Just enough of faster_whisper.WhisperModel for scoring, plus a scripted full decode."""
+
+    def __init__(self, spoken):
+        self.model = FakeAligner(spoken)
+        self.hf_tokenizer = FakeTokenizer()
+        self.spoken = spoken
+        self.decodes = 0
+
+    def feature_extractor(self, audio):
+        return np.zeros((80, len(audio) // 160 + 1), dtype=np.float32)
+
+    def encode(self, features):
+        return features
+
+    def transcribe(self, audio, **options):
+        self.decodes += 1
+        return iter([type("Segment", (), {"text": f" {self.spoken.capitalize()}.", "start": 0.0, "end": 1.0})()]), None
+
+
+MACROS = {"open terminal": "kitty", "open browser": "firefox", "save file": "xdotool key ctrl+s"}
+
+
+class TestCommands(unittest.TestCase):
+    def decode(self, spoken):
+        model = FakeWhisper(spoken)
+        spotter = commands.CommandSpotter(MACROS)
+        scheduler = BatchScheduler(lambda: model)
+        scheduler.register("mic")
+        scheduler.start()
+        try:
+            job = scheduler.submit("mic", np.ones(16000, dtype=np.float32), decode=spotter.decode, beam_size=5)
+            text = job.wait(timeout=2)
+        finally:
+            scheduler.stop()
+        return text, job, model
+
+    def test_trigger_spotted_without_a_full_decode(self):
+        spotted = metrics.COMMANDS.get("spotted")
+        text, job, model = self.decode("open terminal")
+        self.assertEqual(text, "open terminal")
+        self.assertEqual(job.command["trigger"], "open terminal")
+        self.assertAlmostEqual(job.command["confidence"], 0.9)
+        self.assertEqual((model.model.calls, model.decodes), (1, 0))
+        self.assertEqual(metrics.COMMANDS.get("spotted"), spotted + 1)
+
+    def test_low_confidence_falls_back_to_full_decode(self):
+        fallback = metrics.COMMANDS.get("fallback")
+        text, job, model = self.decode("open the garage door")
+        self.assertEqual(text, "Open the garage door.")
+        self.assertIsNone(job.command["trigger"])
+        self.assertEqual(model.decodes, 1)
+        self.assertEqual(metrics.COMMANDS.get("fallback"), fallback + 1)
+        self.assertEqual(commands.variants("save file"), [" Save file.", " Save file", " save file"])
+
+
+    @unittest.skipUnless(os.environ.get("DEX_WHISPER_MODEL"), "set DEX_WHISPER_MODEL to check against a real model")
+    def test_thresholds_against_a_real_model(self):
+        """
+        DEX_WHISPER_MODEL=tiny.en [DEX_COMMAND_CLIP="open_terminal.wav=open terminal"]:
+        noise must not be spotted, and the clip (16 kHz mono) must be.
+        """
+        from faster_whisper import WhisperModel
+        from daemon.backends import load_audio
+        model = WhisperModel(os.environ["DEX_WHISPER_MODEL"], device="cpu", compute_type="int8")
+        spotter = commands.CommandSpotter(MACROS)
+        noise = (np.random.default_rng(0).standard_normal(24000) * 0.05).astype(np.float32)
+        self.assertIsNone(spotter.spot(model, noise)[0])
+        if os.environ.get("DEX_COMMAND_CLIP"):
+            path, trigger = os.environ["DEX_COMMAND_CLIP"].split("=", 1)
+            audio = load_audio(path).astype(np.float32) / 32768.0
+            started = time.monotonic()
+            spotted, confidence = spotter.spot(model, audio)
+            print(f"{trigger!r}: spotted {spotted!r} at {confidence:.3f} in {(time.monotonic() - started) * 1000:.0f} ms")
+            self.assertEqual(spotted, trigger)
+
+if __name__ == '__main__':
+    unittest.main()
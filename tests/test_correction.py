@@ -0,0 +1,57 @@
+import unittest
+import sys
+import os
+import tempfile
+import numpy as np
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.correction import Corrector, phonetic_key
+
+
+class TestCorrection(unittest.TestCase):
+    def test_split_and_misspelled_terms_are_rewritten(self):
+        corrector = Corrector(["Starsilk", "Shard-God", "Star System", "Dexter"])
+        self.assertEqual(phonetic_key("Starsilk"), phonetic_key("star") + phonetic_key("silk"))
+        text, corrections = corrector.correct("The star silk and the shard god, said Dextor. Starsystem.")
+        self.assertEqual(text, "The Starsilk and the Shard-God, said Dexter. Star System.")
+        self.assertEqual([c["to"] for c in corrections], ["Starsilk", "Shard-God", "Dexter", "Star System"])
+        self.assertTrue(all(c["score"] >= corrector.threshold for c in corrections))
+
+    def test_weak_matches_and_punctuation_are_left_alone(self):
+        corrector = Corrector(["Niles", "Starsilk"])
+        self.assertEqual(corrector.correct("I need nails."), ("I need nails.", []))
+        # A comma between the words means they weren't one term
+        self.assertEqual(corrector.correct("a star, silk")[0], "a star, silk")
+
+    def test_punctuation_in_any_gap_splits_a_three_word_term(self):
+        corrector = Corrector(["Void-Weaver"])
+        self.assertEqual(corrector.correct("void we ever")[0], "Void-Weaver")
+        text = "into the void. We ever wanted more"
+        self.assertEqual(corrector.correct(text), (text, []))
+
+    def test_casing_alone_is_not_corrected(self):
+        corrector = Corrector(["open terminal", "Starsilk"])
+        self.assertEqual(corrector.correct("Open terminal and starsilk."), ("Open terminal and starsilk.", []))
+        self.assertEqual(corrector.correct("Open terminl")[0], "open terminal")
+
+    def test_daemon_corrects_before_macro_matching(self):
+        import dex_daemon
+        from daemon.clock import SimClock
+        with tempfile.TemporaryDirectory() as tmp, dex_daemon.runtime_paths(tmp):
+            daemon = dex_daemon.DexDaemon(simulate=True, clock=SimClock(),
+                                          sim_options={"transcripts": ["The star silk rises over the hyper lane."]})
+            try:
+                self.assertTrue(daemon.ready.wait(timeout=5))
+                daemon.set_mode("LISTENING")
+                daemon.rec_buffer.append((np.ones(16000) * 3000).astype(np.int16).reshape(-1, 1))
+                daemon.transcribe()
+            finally:
+                daemon.cleanup()
+        self.assertEqual(daemon.injector.typed, ["The Starsilk rises over the Hyperlane."])
+        self.assertEqual(len(daemon.traces.recent()[-1]["corrections"]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
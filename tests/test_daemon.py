@@ -1,14 +1,26 @@
 import unittest
 import sys
 import os
+import time
+import json
+import tempfile
+import threading
+import numpy as np
 
 # Add parent dir to path
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
-# Mocking external dependencies might be needed for full daemon test
-# For now, we test simple logic if we extract it.
-# Since daemon logic is mostly in a loop, we can't easily unit test it without refactoring daemon.
-# Let's create a placeholder test that ensures imports work.
+from daemon.clock import SimClock
+
+
+def speech(seconds, amplitude=0.2, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(int(seconds * 16000)) * amplitude * 32767).clip(-32768, 32767).astype(np.int16)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * 16000), dtype=np.int16)
+
 
 class TestDaemon(unittest.TestCase):
     def test_imports(self):
@@ -17,5 +29,145 @@ class TestDaemon(unittest.TestCase):
         except ImportError:
             self.fail("Failed to import dex_daemon")
 
+    def test_runtime_paths_are_restored(self):
+        import dex_daemon
+        before = dex_daemon.CONFIG_PATH, dex_daemon.SOCK_FILE, dex_daemon.LOCK_FILE
+        with tempfile.TemporaryDirectory() as tmp, dex_daemon.runtime_paths(tmp):
+            self.assertEqual(dex_daemon.CONFIG_PATH, os.path.join(tmp, "config.json"))
+        self.assertEqual((dex_daemon.CONFIG_PATH, dex_daemon.SOCK_FILE, dex_daemon.LOCK_FILE), before)
+
+    def make_daemon(self, tmp, **sim_options):
+        import dex_daemon
+        paths = dex_daemon.runtime_paths(tmp)
+        paths.__enter__()
+        self.addCleanup(paths.__exit__, None, None, None)
+        daemon = dex_daemon.DexDaemon(simulate=True, clock=SimClock(), sim_options=sim_options)
+        self.assertTrue(daemon.ready.wait(timeout=5))
+        return daemon
+
+    def test_simulated_dictation_runs_faster_than_real_time(self):
+        # 20 s of audio with two utterances; on a SimClock it should take well under that
+        audio = np.concatenate([silence(1), speech(1.0), silence(3), speech(2.0, seed=1), silence(13)])
+        with tempfile.TemporaryDirectory() as tmp:
+            daemon = self.make_daemon(tmp, audio=audio, wake_at=[0.5, 4.5], transcripts=["hello world", "second line"])
+            worker = threading.Thread(target=daemon.process_audio, daemon=True)
+            worker.start()
+            try:
+                self.assertTrue(daemon.audio_thread.finished.wait(timeout=10))
+                for _ in range(200):
+                    if len(daemon.injector.typed) == 2: break
+                    time.sleep(0.01)
+            finally:
+                daemon.cleanup()
+                worker.join(timeout=2)
+        self.assertEqual(daemon.injector.typed, ["hello world", "second line"])
+        self.assertIn("listening", daemon.sound.played)
+        self.assertEqual(daemon.mode, "WAKE")
+        self.assertGreaterEqual(daemon.clock.monotonic(), 20.0)
+
+    def test_decode_error_returns_to_configured_mode(self):
+        from daemon import metrics
+        errors = metrics.TRANSCRIBE_ERRORS.get()
+        with tempfile.TemporaryDirectory() as tmp:
+            daemon = self.make_daemon(tmp, error_rate=1.0)
+            try:
+                daemon.set_mode("LISTENING")
+                daemon.rec_buffer.append(speech(1.0).reshape(-1, 1))
+                daemon.transcribe()
+            finally:
+                daemon.cleanup()
+        self.assertEqual(daemon.mode, "WAKE")
+        self.assertEqual(len(daemon.rec_buffer), 0)
+        self.assertEqual(daemon.injector.typed, [])
+        self.assertEqual(metrics.TRANSCRIBE_ERRORS.get(), errors + 1)
+        self.assertIn("error", daemon.traces.recent()[-1])
+
+    def test_hot_path_helpers(self):
+        from dex_daemon import frame_energy, pcm_to_float, match_macro
+        self.assertEqual(frame_energy(silence(0.032)), 0.0)
+        audio = pcm_to_float([speech(0.032).reshape(-1, 1)] * 3)
+        self.assertEqual((audio.dtype, audio.shape), (np.float32, (1536,)))
+        self.assertEqual(match_macro(" Open Terminal.", {"open terminal": "kitty"}), "kitty")
+        self.assertIsNone(match_macro("open the terminal", {"open terminal": "kitty"}))
+
+    def test_loading_drops_frames_and_keeps_requested_mode(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            daemon = self.make_daemon(tmp)
+            try:
+                daemon.ready.clear()
+                daemon.mode = "LOADING"
+                daemon.process_frame(speech(0.032).reshape(-1, 1), 0.0)
+                daemon.set_mode("MANUAL")
+                self.assertEqual((daemon.mode, daemon.config_mode), ("LOADING", "MANUAL"))
+                self.assertEqual(daemon.sound.played, [])
+                daemon.ready.set()
+                daemon.set_mode(daemon.config_mode)
+            finally:
+                daemon.cleanup()
+        self.assertEqual(daemon.mode, "MANUAL")
+
+    def test_set_model_swaps_in_background(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            daemon = self.make_daemon(tmp)
+            try:
+                old = daemon.models.get()
+                self.assertEqual(daemon.set_model("base.en"), {"ok": True, "loading": "base.en"})
+                for _ in range(200):
+                    if daemon.asr_settings["model_size"] == "base.en": break
+                    time.sleep(0.01)
+                status = json.loads(daemon.status_message())
+            finally:
+                daemon.cleanup()
+        self.assertEqual(status["model"], "base.en")
+        self.assertIsNot(daemon.models.get(), old)
+        self.assertEqual(daemon.asr_settings["model_size"], "base.en")
+
+    def test_set_model_retries_a_failed_startup_load(self):
+        import dex_daemon
+        with tempfile.TemporaryDirectory() as tmp, dex_daemon.runtime_paths(tmp):
+            daemon = dex_daemon.DexDaemon(simulate=True, clock=SimClock(), backends_override={"asr": "missing"})
+            try:
+                for _ in range(200):
+                    if daemon.mode == "ERROR": break
+                    time.sleep(0.01)
+                self.assertEqual(json.loads(daemon.status_message())["status"], "ERROR")
+                daemon.backend_names["asr"] = "sim"
+                self.assertEqual(daemon.set_model("base.en"), {"ok": True, "loading": "base.en"})
+                self.assertTrue(daemon.ready.wait(timeout=5))
+                status = json.loads(daemon.status_message())
+            finally:
+                daemon.cleanup()
+        self.assertEqual((status["status"], status["model"], status["model_error"]), ("WAKE", "base.en", None))
+
+    def test_set_model_refuses_a_second_swap_while_loading(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            daemon = self.make_daemon(tmp)
+            release = threading.Event()
+            factory = daemon.models.factory
+            daemon.models.factory = lambda size: release.wait(5) and factory(size)
+            try:
+                self.assertEqual(daemon.set_model("base.en"), {"ok": True, "loading": "base.en"})
+                self.assertEqual(daemon.set_model("small.en"), {"ok": False, "error": "Already loading base.en"})
+                release.set()
+                for _ in range(200):
+                    if daemon.asr_settings["model_size"] == "base.en": break
+                    time.sleep(0.01)
+            finally:
+                daemon.cleanup()
+        self.assertEqual((daemon.models.size, daemon.asr_settings["model_size"]), ("base.en", "base.en"))
+
+    def test_profile_selection(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            daemon = self.make_daemon(tmp)
+            daemon.cleanup()
+        daemon.app_profiles = {"kitty": "instant"}
+        self.assertEqual(daemon.decode_options(12.0)[0], "accurate")
+        daemon.focused_app = "kitty"
+        self.assertEqual(daemon.decode_options(12.0)[0], "instant")
+        self.assertFalse(daemon.set_profile("turbo")["ok"])
+        daemon.focused_app = None
+        daemon.set_profile("balanced")
+        self.assertEqual(daemon.decode_options(0.5)[0], "balanced")
+
 if __name__ == '__main__':
     unittest.main()
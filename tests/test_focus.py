@@ -0,0 +1,76 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+import threading
+import numpy as np
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.clock import SimClock
+
+
+class GatedModel:
+    """Holds every decode until the gate opens."""
+
+    def __init__(self, model, gate):
+        self.model, self.gate = model, gate
+
+    def transcribe(self, audio, **options):
+        self.gate.wait(timeout=10)
+        return self.model.transcribe(audio, **options)
+
+
+def feed(daemon, audio):
+    for start in range(0, len(audio), 512):
+        daemon.process_frame(audio[start:start + 512].reshape(-1, 1), daemon.clock.monotonic())
+        daemon.clock.advance(512 / 16000)
+
+
+class TestFocusMode(unittest.TestCase):
+    def test_segments_decode_while_capture_continues(self):
+        import dex_daemon
+        rng = np.random.default_rng(0)
+        speech = lambda s: (rng.standard_normal(int(s * 16000)) * 6000).astype(np.int16)
+        pause = lambda s: np.zeros(int(s * 16000), dtype=np.int16)
+        with tempfile.TemporaryDirectory() as tmp, dex_daemon.runtime_paths(tmp):
+            daemon = dex_daemon.DexDaemon(simulate=True, clock=SimClock(),
+                                          sim_options={"transcripts": ["first segment", "second segment", "third segment"]})
+            try:
+                self.assertTrue(daemon.ready.wait(timeout=5))
+                gate = threading.Event()
+                daemon.models.model = GatedModel(daemon.models.model, gate)
+                daemon.set_mode("FOCUS")
+                daemon.focus_serial += 1
+                daemon.handle_focus("GAINED")
+                self.assertEqual(daemon.mode, "LISTENING")
+
+                # Two segments end while the first is still decoding; capture never waits
+                feed(daemon, np.concatenate([speech(1.0), pause(1.0), speech(1.0), pause(1.0)]))
+                self.assertEqual(daemon.mode, "LISTENING")
+                self.assertEqual(daemon.injector.typed, [])
+                gate.set()
+                for _ in range(300):
+                    if len(daemon.injector.typed) == 2: break
+                    time.sleep(0.01)
+                self.assertEqual(daemon.injector.typed, ["first segment", "second segment"])
+
+                # Focus moves mid-segment: it is still decoded, but not typed into the new field
+                feed(daemon, speech(0.5))
+                daemon.focus_serial += 1
+                daemon.handle_focus("LOST")
+                feed(daemon, pause(0.1))
+                for _ in range(300):
+                    if len(daemon.traces.recent()) == 3: break
+                    time.sleep(0.01)
+            finally:
+                daemon.cleanup()
+        self.assertEqual(daemon.mode, "FOCUS")
+        self.assertEqual(daemon.injector.typed, ["first segment", "second segment"])
+        self.assertEqual(daemon.traces.recent()[-1]["action"], "unfocused")
+
+
+if __name__ == '__main__':
+    unittest.main()
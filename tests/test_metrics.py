@@ -0,0 +1,51 @@
+import unittest
+import sys
+import os
+import socket
+import tempfile
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.metrics import Registry, start_metrics_server
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        hist = registry.histogram("rtf", "help", [0.5, 1.0])
+        for value in (0.2, 0.5, 0.7, 3.0):
+            hist.observe(value)
+        text = registry.render()
+        self.assertIn('rtf_bucket{le="0.5"} 2', text)
+        self.assertIn('rtf_bucket{le="1.0"} 3', text)
+        self.assertIn('rtf_bucket{le="+Inf"} 4', text)
+        self.assertIn("rtf_count 4", text)
+
+    def test_labeled_counter(self):
+        registry = Registry()
+        counter = registry.counter("ipc_total", "help", label="cmd")
+        counter.inc(1, "GET_STATUS")
+        counter.inc(2, "GET_STATUS")
+        self.assertIn('ipc_total{cmd="GET_STATUS"} 3', registry.render())
+
+    def test_serves_over_unix_socket(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "metrics.sock")
+            server = start_metrics_server(sock_path=path)
+            try:
+                client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                client.connect(path)
+                client.sendall(b"GET /metrics HTTP/1.0\r\n\r\n")
+                data = b""
+                while chunk := client.recv(4096):
+                    data += chunk
+                client.close()
+            finally:
+                server.shutdown()
+                server.server_close()
+        self.assertTrue(data.startswith(b"HTTP/1.0 200"))
+        self.assertIn(b"dex_frames_processed_total", data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+import sys
+import os
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.micro import run_benchmarks, compare
+
+
+class TestMicro(unittest.TestCase):
+    def test_selected_benchmarks_run(self):
+        results = run_benchmarks(["frame_energy", "match_macro", "ipc_round_trip"], repeat=1)
+        self.assertEqual([r["name"] for r in results], ["frame_energy", "match_macro", "ipc_round_trip"])
+        for r in results:
+            self.assertNotIn("error", r)
+            self.assertGreater(r["best_us"], 0)
+        self.assertIn("frame_budget_pct", results[0])
+
+    def test_compare_flags_slowdowns(self):
+        history = [{"results": {"a": {"best_us": 10.0}, "b": {"best_us": 10.0}}}]
+        regressions = compare([{"name": "a", "best_us": 14.0}, {"name": "b", "best_us": 10.3}], history)
+        self.assertEqual([r["name"] for r in regressions], ["a"])
+
+if __name__ == '__main__':
+    unittest.main()
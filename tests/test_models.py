@@ -0,0 +1,103 @@
+import unittest
+import sys
+import os
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.backends import SimWhisper
+from daemon.clock import SimClock
+from daemon.models import ModelManager
+
+
+def factory(size):
+    if size == "missing.en":
+        raise RuntimeError("model not found")
+    model = SimWhisper(transcripts=[size], repeat=True)
+    model.size = size
+    return model
+
+
+class TestModelManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = ModelManager(factory, "tiny.en")
+        self.manager.load()
+        self.released = []
+        self.manager.on_release.append(lambda: self.released.append(True))
+
+    def test_swap_replaces_model_and_releases_old(self):
+        self.assertTrue(self.manager.swap("base.en"))
+        self.assertEqual(self.manager.get().size, "base.en")
+        self.assertEqual(self.manager.status()["model"], "base.en")
+        self.assertEqual(self.released, [True])
+
+    def test_failed_swap_keeps_old_model(self):
+        old = self.manager.get()
+        self.assertFalse(self.manager.swap("missing.en"))
+        self.assertIs(self.manager.get(), old)
+        status = self.manager.status()
+        self.assertEqual((status["model"], status["model_pending"]), ("tiny.en", None))
+        self.assertIn("model not found", status["model_error"])
+        self.assertEqual(self.released, [])
+
+    def test_reserved_swap_refuses_a_second_load(self):
+        self.assertTrue(self.manager.reserve("base.en"))
+        self.assertFalse(self.manager.reserve("small.en"))
+        with self.assertRaises(RuntimeError):
+            self.manager.swap("small.en")
+        self.assertTrue(self.manager.swap("base.en", reserved=True))
+        self.assertEqual((self.manager.size, self.manager.pending), ("base.en", None))
+
+
+class Weights:
+    """Stands in for the CTranslate2 model inside a WhisperModel."""
+
+    def __init__(self):
+        self.loaded = True
+
+    def unload_model(self):
+        self.loaded = False
+
+    def load_model(self):
+        self.loaded = True
+
+
+class TestIdleUnload(unittest.TestCase):
+    def make(self, busy=False, weights=None):
+        def build(size):
+            model = factory(size)
+            if weights: model.model = weights
+            return model
+        clock = SimClock()
+        manager = ModelManager(build, "tiny.en", clock=clock, idle_timeout=600, busy=lambda: busy)
+        manager.load()
+        return manager, clock
+
+    def test_unloads_when_idle_and_reloads_on_use(self):
+        manager, clock = self.make()
+        clock.advance(599)
+        self.assertFalse(manager.check_idle())
+        clock.advance(2)
+        self.assertTrue(manager.check_idle())
+        self.assertEqual(manager.status()["model_state"], "cold")
+        self.assertIsNone(manager.model)
+        self.assertEqual(manager.get().size, "tiny.en")
+        self.assertEqual(manager.status()["model_state"], "ready")
+
+    def test_busy_model_is_not_unloaded(self):
+        manager, clock = self.make(busy=True)
+        clock.advance(3600)
+        self.assertFalse(manager.check_idle())
+
+    def test_ctranslate2_weights_are_unloaded_in_place(self):
+        weights = Weights()
+        manager, clock = self.make(weights=weights)
+        model = manager.get()
+        clock.advance(601)
+        self.assertTrue(manager.check_idle())
+        self.assertFalse(weights.loaded)
+        self.assertIs(manager.get(), model)
+        self.assertTrue(weights.loaded)
+
+if __name__ == '__main__':
+    unittest.main()
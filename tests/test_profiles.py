@@ -0,0 +1,29 @@
+import unittest
+import sys
+import os
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon import profiles
+
+
+class TestProfiles(unittest.TestCase):
+    def test_auto_goes_by_utterance_length(self):
+        self.assertEqual(profiles.resolve("auto", 0.8)[0], "instant")
+        self.assertEqual(profiles.resolve("auto", 5.0)[0], "balanced")
+        name, options = profiles.resolve("auto", 20.0)
+        self.assertEqual((name, options["beam_size"]), ("accurate", 5))
+
+    def test_named_profile_ignores_length(self):
+        name, options = profiles.resolve("instant", 30.0)
+        self.assertEqual((name, options["beam_size"], options["temperature"]), ("instant", 1, 0.0))
+
+    def test_config_profiles_merge_over_builtins(self):
+        available = profiles.available({"instant": {"beam_size": 2}, "notes": {"beam_size": 4}})
+        self.assertEqual(available["instant"]["beam_size"], 2)
+        self.assertTrue(available["instant"]["without_timestamps"])
+        self.assertEqual(profiles.resolve("notes", 1.0, available), ("notes", {"beam_size": 4}))
+
+if __name__ == '__main__':
+    unittest.main()
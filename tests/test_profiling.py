@@ -0,0 +1,40 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+import tracemalloc
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.profiling import Profilers
+
+
+class TestProfilers(unittest.TestCase):
+    def test_sampling_writes_collapsed_stacks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            profilers = Profilers(tmp)
+            profilers.start_sampling(rate=200)
+            self.assertIn("error", profilers.start_sampling())
+            time.sleep(0.2)
+            result = profilers.stop_sampling()
+            self.assertGreater(result["samples"], 0)
+            with open(result["path"]) as f:
+                line = f.readline()
+        stack, count = line.rsplit(" ", 1)
+        self.assertIn(";", stack)
+        self.assertGreater(int(count), 0)
+
+    def test_memory_diff_stops_tracing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            profilers = Profilers(tmp)
+            profilers.start_memory()
+            blob = [bytearray(1024) for _ in range(100)]
+            result = profilers.stop_memory()
+            self.assertTrue(os.path.exists(result["path"]))
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertIn("error", profilers.stop_memory())
+
+if __name__ == '__main__':
+    unittest.main()
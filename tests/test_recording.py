@@ -0,0 +1,132 @@
+import unittest
+import sys
+import os
+import tempfile
+import wave
+import numpy as np
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.clock import SimClock
+from daemon.recording import Recording, WindowedJob, stitch
+from daemon.trim import TimeMap
+
+SR = 16000
+
+
+class FakeJob:
+    def __init__(self, text, seconds, late=False):
+        self.text, self.started, self.first_segment = text, 0.0, 0.0
+        self.segments = [type("Segment", (), {"text": text, "start": 0.0, "end": seconds})()]
+        self.late = late
+
+    def wait(self, timeout=None):
+        if self.late and timeout is not None:
+            raise TimeoutError("still decoding")
+        return self.text
+
+
+class TestRecording(unittest.TestCase):
+    def frames(self, seconds, seed=0):
+        audio = (np.random.default_rng(seed).standard_normal(int(seconds * SR)) * 3000).astype(np.int16)
+        return [audio[i:i + 512].reshape(-1, 1) for i in range(0, len(audio), 512)]
+
+    def test_spills_past_the_memory_cap_and_reads_back_exactly(self):
+        frames = self.frames(10.0)
+        with tempfile.TemporaryDirectory() as tmp:
+            recording = Recording(memory_seconds=2.0, directory=tmp)
+            for frame in frames:
+                recording.append(frame)
+            self.assertLessEqual(recording.in_memory, 2.0 * SR)
+            self.assertGreater(recording.spilled, 0)
+            expected = np.concatenate(frames).reshape(-1)
+            np.testing.assert_array_equal(recording.read(0, len(recording)), expected)
+            np.testing.assert_array_equal(recording.read(SR, 9 * SR), expected[SR:9 * SR])
+            recording.clear()
+            self.assertEqual(len(recording), 0)
+
+            # A whole file in one chunk
+            recording.append(expected)
+            self.assertEqual(recording.in_memory, 0)
+            np.testing.assert_array_equal(recording.read(SR, 9 * SR), expected[SR:9 * SR])
+            recording.clear()
+
+    def test_files_stream_in_without_being_held_whole(self):
+        from daemon.backends import load_audio, stream_audio
+        audio = np.concatenate(self.frames(10.0)).reshape(-1)
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, rate in (("direct.wav", SR), ("resampled.wav", 8000)):
+                path = os.path.join(tmp, name)
+                with wave.open(path, 'wb') as f:
+                    f.setnchannels(1)
+                    f.setsampwidth(2)
+                    f.setframerate(rate)
+                    f.writeframes(audio[:int(10.0 * rate)].tobytes())
+                recording, peak = Recording(memory_seconds=2.0, directory=tmp), 0
+                for chunk in stream_audio(path):
+                    recording.append(chunk)
+                    peak = max(peak, recording.in_memory)
+                self.assertLessEqual(peak, 3.0 * SR)
+                self.assertAlmostEqual(recording.seconds, 10.0, delta=0.05)
+                if rate == SR:
+                    np.testing.assert_array_equal(recording.read(0, len(recording)), load_audio(path))
+                recording.clear()
+
+    def test_windows_cover_the_recording_and_end_in_pauses(self):
+        frames = self.frames(20.0)
+        for i in range(200, 220):  # a pause around 6.6 s
+            frames[i] = np.zeros_like(frames[i])
+        recording = Recording(memory_seconds=5.0)
+        for frame in frames:
+            recording.append(frame)
+        windows = list(recording.windows(seconds=8.0, search=3.0, overlap=1.0))
+        # Cut in the pause: no overlap. Later cuts land in speech and repeat a second
+        self.assertAlmostEqual(windows[1][0], 6.7, delta=0.4)
+        self.assertEqual(windows[1][2], 0.0)
+        self.assertTrue(all(overlap > 0.9 for _, _, overlap in windows[2:]))
+        covered = sum(len(w) for _, w, _ in windows) - sum(int(round(o * SR)) for _, _, o in windows)
+        self.assertEqual(covered, len(recording))
+        recording.clear()
+
+    def test_stitch_drops_words_repeated_in_the_overlap(self):
+        self.assertEqual(stitch("we went to the old".split(), "the old harbour at dawn"), ["harbour", "at", "dawn"])
+        self.assertEqual(stitch("we went".split(), "Went, quietly"), ["quietly"])
+        self.assertEqual(stitch("we went".split(), "nothing shared"), ["nothing", "shared"])
+
+    def test_windowed_job_joins_text_in_recording_time(self):
+        recording = Recording()
+        for frame in self.frames(70.0):
+            recording.append(frame)
+        submitted = []
+        def submit(audios):
+            submitted.append([len(a) for a in audios])
+            return [(FakeJob(f"part {n}", len(a) / SR), TimeMap([])) for n, a in enumerate(audios, 1)]
+        job = WindowedJob(recording, submit, SimClock(), parallel=2)
+        self.assertEqual(job.wait(), "part 1 part 2 part 1")
+        # Two windows per submit, none longer than Whisper's 30 s
+        self.assertEqual([len(group) for group in submitted], [2, 1])
+        self.assertLessEqual(max(max(group) for group in submitted), 30 * SR)
+        self.assertAlmostEqual(job.segments[-1].end, 70.0, delta=0.05)
+        self.assertEqual(len(recording), 0)
+
+    def test_windowed_job_resumes_after_a_timeout(self):
+        recording = Recording()
+        for frame in self.frames(70.0):
+            recording.append(frame)
+        submitted = []
+        def submit(audios):
+            submitted.append(len(audios))
+            # The second window is still decoding when the deadline passes
+            return [(FakeJob(f"part {n}", len(a) / SR, late=n == 2), TimeMap([])) for n, a in enumerate(audios, 1)]
+        job = WindowedJob(recording, submit, SimClock(), parallel=2)
+        with self.assertRaises(TimeoutError):
+            job.wait(timeout=0.1)
+        self.assertGreater(len(recording), 0)
+        self.assertEqual(job.wait(), "part 1 part 2 part 1")
+        self.assertEqual(submitted, [2, 1])  # nothing submitted twice
+        self.assertEqual(len(recording), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import sys
+import os
+import json
+import time
+import tempfile
+import numpy as np
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.clock import SimClock
+from daemon.history import History
+from daemon.models import ModelManager
+from daemon.refine import Refiner
+from daemon.backends import SimWhisper
+
+
+def speech(seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(int(seconds * 16000)) * 0.2).astype(np.float32)
+
+
+class TestRefine(unittest.TestCase):
+    def test_history_keeps_draft_when_updated(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            history = History(os.path.join(tmp, "history.json"), limit=2)
+            history.add("first", id=1)
+            history.add("helo world", id=2)
+            history.add("third", id=3)
+            self.assertTrue(history.update(2, "hello world"))
+            self.assertFalse(history.update(1, "gone"))
+            with open(history.path) as f:
+                entries = json.load(f)
+        self.assertEqual([e["text"] for e in entries], ["third", "hello world"])
+        self.assertEqual(entries[1]["draft"], "helo world")
+
+    def test_refines_only_when_idle_and_changed(self):
+        clock = SimClock()
+        models = ModelManager(lambda size: SimWhisper(clock, ["hello world", "same"]), "small.en", clock=clock)
+        refined, busy = [], [True]
+        refiner = Refiner(models, lambda item, text: refined.append((item["id"], text)),
+                          busy=lambda: busy[0], busy_load=float("inf"), clock=clock)
+        refiner.refine({"id": 1, "audio": speech(1.0), "draft": "helo world"})
+        self.assertEqual(refined, [])
+        self.assertEqual(models.model, None)  # skipped before loading anything
+        busy[0] = False
+        refiner.refine({"id": 2, "audio": speech(1.0), "draft": "helo world"})
+        refiner.refine({"id": 3, "audio": speech(1.0), "draft": "same"})
+        self.assertEqual(refined, [(2, "hello world")])
+        self.assertFalse(refiner.submit({"id": 4, "audio": speech(20.0), "draft": "long"}))
+
+    def test_daemon_fixes_typed_text(self):
+        import dex_daemon
+        with tempfile.TemporaryDirectory() as tmp, dex_daemon.runtime_paths(tmp):
+            with open(dex_daemon.CONFIG_PATH, 'w') as f:
+                json.dump({"refine": {"fix_typed": True, "busy_load": 1e9},
+                           "profiles": {"accurate": {"vocabulary": "hotwords"}}}, f)
+            daemon = dex_daemon.DexDaemon(simulate=True, clock=SimClock(), sim_options={"transcripts": ["helo world"]})
+            try:
+                self.assertTrue(daemon.ready.wait(timeout=5))
+                daemon.refiner.models.factory = lambda size: SimWhisper(daemon.clock, ["hello world"])
+                daemon.set_mode("LISTENING")
+                daemon.rec_buffer.append((speech(1.0) * 32767).astype(np.int16).reshape(-1, 1))
+                daemon.transcribe()
+                for _ in range(300):
+                    if daemon.refined_id is not None and len(daemon.injector.typed) == 2: break
+                    time.sleep(0.01)
+                history = daemon.history._load()
+                options = daemon.refine_options(daemon.refiner.models.model)
+            finally:
+                daemon.cleanup()
+        # Biased like the first pass; the profile's "vocabulary" choice never reaches transcribe()
+        self.assertNotIn("vocabulary", options)
+        self.assertIn("Hyperlane", options["hotwords"])
+        self.assertEqual(options["beam_size"], 5)
+        self.assertEqual(daemon.injector.typed, ["helo world", "hello world"])
+        self.assertEqual(daemon.injector.erased, [len("helo world") + 1])
+        self.assertEqual(history[0]["text"], "hello world")
+        self.assertEqual(history[0]["draft"], "helo world")
+        self.assertEqual(json.loads(daemon.status_message())["last_text"], "hello world")
+
+
+    def test_uinput_reports_only_the_characters_it_typed(self):
+        from daemon.backends import UInputInjector
+        injector = UInputInjector(clock=SimClock())
+        if injector.e is None:
+            self.skipTest("evdev not installed")
+        writes = []
+        injector.ui = type("FakeUInput", (), {"write": lambda self, *event: writes.append(event),
+                                              "syn": lambda self: None})()
+        # The keymap has no digits or apostrophes, and erasing must not go past what was typed
+        typed = injector.type_text("it's 5 o'clock")
+        self.assertEqual(typed, len("its  oclock "))
+        self.assertEqual(typed, len([w for w in writes if w[2] == 1 and w[1] != injector.e.KEY_LEFTSHIFT]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+import sys
+import os
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.replay import synthetic_scenarios, run_isolated, compare
+
+
+class TestReplay(unittest.TestCase):
+    def test_synthetic_commands_end_to_end(self):
+        scenario = synthetic_scenarios()[0]
+        result = run_isolated(scenario, stub_rtf=0.01)
+        self.assertNotIn("error", result)
+        self.assertEqual(result["utterances"], 5)
+        # Endpointing waits out SILENCE_LIMIT, so e2e can't be faster than that
+        self.assertGreater(result["e2e_p50_ms"], 1500)
+        self.assertGreater(result["speedup"], 1.0)
+
+    def test_compare_flags_regressions(self):
+        history = [{"results": {"s": {"scenario": "s", "post_endpoint_p50_ms": 100.0, "peak_rss_mb": 40.0}}}]
+        current = [{"scenario": "s", "post_endpoint_p50_ms": 180.0, "peak_rss_mb": 40.5}]
+        regressions = compare(current, history)
+        self.assertEqual([r["metric"] for r in regressions], ["post_endpoint_p50_ms"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import sys
+import os
+import threading
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.scheduling import CpuPlan, usable_cores
+
+
+class TestCpuPlan(unittest.TestCase):
+    def test_default_split_reserves_last_core_for_audio(self):
+        plan = CpuPlan({}, cores=[0, 1, 2, 3])
+        self.assertEqual(plan.roles["audio"]["cores"], [3])
+        self.assertEqual(plan.roles["decode"]["cores"], [0, 1, 2])
+
+    def test_configured_cores_outside_the_machine_are_ignored(self):
+        plan = CpuPlan({"audio_cores": [0, 9], "decode_cores": [9]}, cores=[0, 1])
+        self.assertEqual(plan.roles["audio"]["cores"], [0])
+        self.assertEqual(plan.roles["decode"]["cores"], [0, 1])
+
+    def test_disabled_without_config(self):
+        self.assertIsNone(CpuPlan(None).apply("audio"))
+
+    def test_apply_affects_only_the_calling_thread(self):
+        plan = CpuPlan({"decode_nice": 3})
+        results = []
+        worker = threading.Thread(target=lambda: results.append(plan.apply("decode")))
+        worker.start()
+        worker.join()
+        self.assertEqual(results[0]["cores"], plan.roles["decode"]["cores"])
+        self.assertEqual((results[0]["policy"], results[0]["nice"]), ("nice", 3))
+        self.assertEqual(os.getpriority(os.PRIO_PROCESS, threading.get_native_id()), os.getpriority(os.PRIO_PROCESS, 0))
+        self.assertEqual(sorted(os.sched_getaffinity(0)), usable_cores())
+        self.assertIn("decode", plan.status()["applied"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+import sys
+import os
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.soak import run_soak, check
+
+
+class TestSoak(unittest.TestCase):
+    def test_check_flags_growth_only(self):
+        samples = [{"utterances": n * 10, "rss_mb": 50.0 + 0.5 * n, "fds": 6} for n in range(40)]
+        verdicts = check(samples)
+        self.assertFalse(verdicts["rss_mb"]["ok"])
+        self.assertTrue(verdicts["fds"]["ok"])
+
+    def test_short_soak_survives_decode_errors(self):
+        samples, stats = run_soak(hours=0.05, every=5, stub_rtf=0.01, error_rate=0.2)
+        self.assertGreater(stats["utterances"], 10)
+        self.assertGreater(stats["transcribe_errors"], 0)
+        self.assertEqual(stats["frames_dropped"], 0)
+        self.assertNotEqual(stats["final_mode"], "PROCESSING")
+        self.assertTrue(all(s["zombies"] <= 1 for s in samples))
+
+if __name__ == '__main__':
+    unittest.main()
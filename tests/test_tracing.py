@@ -0,0 +1,46 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.tracing import UtteranceTrace, TraceStore
+
+
+class TestTracing(unittest.TestCase):
+    def make_trace(self):
+        trace = UtteranceTrace()
+        for offset, stage in enumerate(["speech_onset", "speech_end", "endpoint", "queued",
+                                        "whisper_start", "decode_end", "macro_match", "injection_end"]):
+            trace.mark(stage, 100.0 + offset * 0.1)
+        return trace
+
+    def test_durations_relative_to_onset(self):
+        record = self.make_trace().to_dict()
+        self.assertEqual(record["stages"]["speech_onset"], 0.0)
+        self.assertEqual(record["durations"]["queue_wait"], 100.0)
+        self.assertEqual(record["durations"]["total"], 600.0)
+
+    def test_store_is_bounded(self):
+        store = TraceStore(capacity=3)
+        for _ in range(5):
+            store.add(self.make_trace())
+        self.assertEqual(len(store.recent()), 3)
+        self.assertEqual(len(store.recent(2)), 2)
+
+    def test_jsonl_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "traces.jsonl")
+            store = TraceStore(path=path)
+            store.add(self.make_trace())
+            store.add(self.make_trace())
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual(len(lines), 2)
+        self.assertIn("durations", lines[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import sys
+import os
+import numpy as np
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon import trim
+
+SR = 16000
+
+
+def speech(seconds, seed=0):
+    return (np.random.default_rng(seed).standard_normal(int(seconds * SR)) * 0.1).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * SR), dtype=np.float32)
+
+
+class TestTrim(unittest.TestCase):
+    def test_edges_cut_and_long_pauses_shortened(self):
+        audio = np.concatenate([silence(1.0), speech(1.0), silence(0.2), speech(0.5, 1), silence(2.0), speech(1.0, 2), silence(1.5)])
+        trimmed, time_map = trim.trim(audio)
+        # 2.5 s of speech, the short pause kept whole, the long one cut to MAX_GAP, plus padding
+        expected = 2.5 + 0.2 + trim.MAX_GAP + 2 * trim.PADDING
+        self.assertAlmostEqual(len(trimmed) / SR, expected, delta=3 * trim.FRAME / SR)
+        self.assertEqual(len(time_map.spans), 2)
+
+    def test_time_map_points_back_into_the_recording(self):
+        audio = np.concatenate([silence(1.0), speech(1.0), silence(3.0), speech(1.0, 1)])
+        trimmed, time_map = trim.trim(audio)
+        second_start = time_map.spans[1][0]
+        self.assertAlmostEqual(time_map.to_original(second_start + 0.5), time_map.spans[1][1] + 0.5)
+        self.assertAlmostEqual(time_map.to_original(0.0), time_map.spans[0][1])
+        self.assertLess(abs(time_map.spans[0][1] - (1.0 - trim.PADDING)), trim.FRAME / SR)
+
+    def test_silence_is_returned_unchanged(self):
+        audio = silence(1.0)
+        trimmed, time_map = trim.trim(audio)
+        self.assertIs(trimmed, audio)
+        self.assertEqual(time_map.to_original(0.5), 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.vocabulary import Vocabulary, build_prompt
+
+
+class WordTokenizer:
+    """One token per word, counting how often it's asked."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text, add_special_tokens=False):
+        self.calls += 1
+        return type("Encoding", (), {"ids": [hash(w) % 50000 for w in text.split()]})()
+
+
+class TestVocabulary(unittest.TestCase):
+    def test_prompt_fits_budget_in_priority_order(self):
+        count = lambda text: len(text.split())
+        prompt = build_prompt(["Starsilk", "Shard-God", "Hyperlane"], "Sci-Fi", budget=3, count=count)
+        self.assertEqual(prompt, "Sci-Fi. Starsilk, Shard-God.")
+        self.assertEqual(build_prompt(["Starsilk"], "", budget=0, count=count), "")
+
+    def test_reloads_on_change_and_caches_tokens(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "vocabulary.json")
+            with open(path, 'w') as f:
+                json.dump({"terms": ["Starsilk", "Hyperlane"], "style": "Sci-Fi"}, f)
+            vocabulary, tokenizer = Vocabulary(path), WordTokenizer()
+            self.assertTrue(vocabulary.refresh())
+            first = vocabulary.prompt(tokenizer)
+            calls = tokenizer.calls
+            self.assertFalse(vocabulary.refresh())
+            self.assertEqual(vocabulary.prompt(tokenizer), first)
+            self.assertEqual(tokenizer.calls, calls)
+            self.assertEqual(len(first), 3)
+
+            with open(path, 'w') as f:
+                json.dump({"terms": ["Void-Weaver"]}, f)
+            os.utime(path, ns=(0, 10**18))
+            self.assertTrue(vocabulary.refresh())
+            self.assertEqual(vocabulary.prompt(), "Void-Weaver.")
+
+    def test_profile_switch(self):
+        import dex_daemon
+        from daemon.clock import SimClock
+        with tempfile.TemporaryDirectory() as tmp, dex_daemon.runtime_paths(tmp):
+            with open(os.path.join(tmp, "vocabulary.json"), 'w') as f:
+                json.dump({"terms": ["Starsilk"]}, f)
+            with open(dex_daemon.CONFIG_PATH, 'w') as f:
+                json.dump({"profiles": {"instant": {"vocabulary": False}, "balanced": {"vocabulary": "hotwords"}}}, f)
+            daemon = dex_daemon.DexDaemon(simulate=True, clock=SimClock())
+            try:
+                instant, balanced, accurate = (daemon.decode_options(d)[1] for d in (0.5, 5.0, 20.0))
+            finally:
+                daemon.cleanup()
+        self.assertNotIn("initial_prompt", instant)
+        self.assertNotIn("vocabulary", instant)
+        self.assertEqual(balanced["hotwords"], "Starsilk.")
+        self.assertEqual(accurate["initial_prompt"], "Starsilk.")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import sys
+import os
+import json
+import time
+import wave
+import shutil
+import tempfile
+import threading
+import numpy as np
+
+# Add parent dir to path
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from daemon.watch import FolderWatcher
+
+
+def write_wav(path, seconds, seed=0, pause=None):
+    pcm = (np.random.default_rng(seed).standard_normal(int(seconds * 16000)) * 3000).astype(np.int16)
+    if pause is not None:
+        pcm[int(pause * 16000):int((pause + 1) * 16000)] = 0
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(pcm.tobytes())
+
+
+class TestWatchFolder(unittest.TestCase):
+    def test_new_files_transcribed_once_by_content(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            folder, ledger = os.path.join(tmp, "memos"), os.path.join(tmp, "watched.json")
+            os.makedirs(folder)
+            write_wav(os.path.join(folder, "before.wav"), 0.5)
+            seen, stop = [], threading.Event()
+            transcribe = lambda path: f"memo {os.path.basename(path)}"
+            watcher = FolderWatcher(folder, transcribe, lambda path, text, digest: seen.append(text),
+                                    ledger=ledger, shutdown_event=stop)
+            watcher.start()
+            try:
+                # Written elsewhere and moved in, as a finished upload would be
+                write_wav(os.path.join(tmp, "new.wav"), 0.5, seed=1)
+                shutil.move(os.path.join(tmp, "new.wav"), os.path.join(folder, "new.wav"))
+                for _ in range(300):
+                    if len(seen) == 2: break
+                    time.sleep(0.01)
+            finally:
+                stop.set()
+                watcher.join(timeout=2)
+            with open(os.path.join(folder, "new.txt")) as f:
+                self.assertEqual(f.read().strip(), "memo new.wav")
+
+            # After a restart, a renamed copy of a done file is not redone
+            shutil.copy(os.path.join(folder, "new.wav"), os.path.join(folder, "copy.wav"))
+            again = FolderWatcher(folder, transcribe, ledger=ledger)
+            again.scan()
+            with open(ledger) as f:
+                done = json.load(f)
+        self.assertEqual(seen, ["memo before.wav", "memo new.wav"])
+        self.assertEqual(again.processed, 0)
+        self.assertEqual(len(done), 2)
+
+    def test_daemon_decodes_files_below_the_mic(self):
+        import dex_daemon
+        from daemon.clock import SimClock
+        with tempfile.TemporaryDirectory() as tmp, dex_daemon.runtime_paths(tmp):
+            # The file is longer than what a recording keeps in memory
+            with open(dex_daemon.CONFIG_PATH, 'w') as f:
+                json.dump({"record_memory_seconds": 5}, f)
+            daemon = dex_daemon.DexDaemon(simulate=True, clock=SimClock(),
+                                          sim_options={"transcripts": ["the hyper lane", "is open"]})
+            try:
+                self.assertTrue(daemon.ready.wait(timeout=5))
+                path = os.path.join(tmp, "memo.wav")
+                write_wav(path, 14.0, pause=8.0)
+                text = daemon.transcribe_file(path)
+                stats = daemon.scheduler.stats()
+            finally:
+                daemon.cleanup()
+        # Two windows, split at the pause, through the low-priority session, corrected like dictation
+        self.assertEqual(text, "the Hyperlane is open")
+        self.assertEqual(stats["jobs"], 2)
+        self.assertEqual(daemon.scheduler.priorities["watch"], -1)
+
+    def test_focus_session_does_not_hold_up_files(self):
+        import dex_daemon
+        from daemon.clock import SimClock
+        with tempfile.TemporaryDirectory() as tmp, dex_daemon.runtime_paths(tmp):
+            daemon = dex_daemon.DexDaemon(simulate=True, clock=SimClock(), sim_options={"transcripts": ["a memo"]})
+            try:
+                self.assertTrue(daemon.ready.wait(timeout=5))
+                daemon.set_mode("FOCUS")
+                daemon.focused_app = "kitty"
+                daemon.handle_focus("GAINED")
+                self.assertEqual(daemon.mode, "LISTENING")
+                path = os.path.join(tmp, "memo.wav")
+                write_wav(path, 2.0)
+                result = []
+                worker = threading.Thread(target=lambda: result.append(daemon.transcribe_file(path)), daemon=True)
+                worker.start()
+                worker.join(timeout=5)
+                mode = daemon.mode
+            finally:
+                daemon.cleanup()
+        # Still listening for dictation, and the file was decoded anyway
+        self.assertEqual((mode, result), ("LISTENING", ["a memo"]))
+
+
+if __name__ == '__main__':
+    unittest.main()